@@ -1,20 +1,138 @@
 """FastAPI service for book recommendations."""
-from fastapi import FastAPI, HTTPException
+
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel, Field
 
 from src.pipelines import prediction_pipeline
+from src.pipelines.micro_batcher import (
+    MicroBatcher,
+    QueueFullError,
+    ScoringCancelledError,
+)
+from src.pipelines.recommendation_cache import RecommendationCache
+from src.pipelines.request_metrics import RequestMetricsMiddleware, request_metrics
+
+
+def build_scoring_batcher():
+    """
+    Bounded pool of scoring threads; concurrent /recommend calls are merged
+    into one vectorized recommend_books call.
+    """
+    return MicroBatcher(
+        lambda titles, n: prediction_pipeline.recommend_books(
+            titles, n_recommendations=n
+        ),
+        max_workers=int(os.environ.get("SCORING_WORKERS", str(os.cpu_count() or 1))),
+        max_queue_size=int(os.environ.get("SCORING_QUEUE_SIZE", "256")),
+        max_batch_size=int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.environ.get("MICRO_BATCH_WAIT_MS", "2")),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Every startup gets its own scoring pool, shut down with the app
+    app.state.scoring_batcher = build_scoring_batcher()
+    # Load artifacts in the background so /health answers immediately
+    prediction_pipeline.service.start_loading()
+    # Optionally poll for newly published artifact versions and hot-swap them
+    watch_interval = float(os.environ.get("ARTIFACT_WATCH_INTERVAL", "0"))
+    if watch_interval > 0:
+        prediction_pipeline.service.start_watching(watch_interval)
+    yield
+    prediction_pipeline.service.stop_watching()
+    app.state.scoring_batcher.shutdown()
+
+
+app = FastAPI(title="Book Recommendation API", version="0.1.0", lifespan=lifespan)
+# Latency histogram and status code counter of every request, for /metrics
+app.add_middleware(RequestMetricsMiddleware, metrics=request_metrics)
+
+# Popular titles dominate traffic; cache (title, k) results per artifact version
+recommendation_cache = RecommendationCache(
+    max_size=int(os.environ.get("RECOMMENDATION_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.environ.get("RECOMMENDATION_CACHE_TTL", "3600")),
+    version_fn=lambda: prediction_pipeline.service.artifact_version,
+)
 
-app = FastAPI(title="Book Recommendation API", version="0.1.0")
+# (stats key, Prometheus type, help) of the cache metrics
+CACHE_METRICS = (
+    ("hits", "counter", "Cache lookups served from the cache."),
+    ("misses", "counter", "Cache lookups that computed recommendations."),
+    ("evictions", "counter", "Entries evicted to respect the size bound."),
+    ("expirations", "counter", "Entries dropped after their TTL."),
+    ("invalidations", "counter", "Cache flushes caused by an artifact version change."),
+    ("size", "gauge", "Entries currently cached."),
+    ("max_size", "gauge", "Maximum number of cached entries."),
+    ("hit_ratio", "gauge", "Hits over all cache lookups."),
+)
+
+# (stats key, Prometheus type, help) of the scoring executor metrics
+SCORING_METRICS = (
+    ("batches", "counter", "Batched recommend_books calls."),
+    ("batched_requests", "counter", "Requests answered through batched calls."),
+    ("rejected", "counter", "Requests rejected with 503 because the queue was full."),
+    ("in_flight", "gauge", "Requests waiting for or running on the scoring executor."),
+    ("max_queue_size", "gauge", "Maximum number of requests waiting or running."),
+)
 
 
 class RecommendationRequest(BaseModel):
-    book: str = Field(..., description="Exact book title to query.")
+    book: str = Field(
+        ...,
+        description="Book title to query; a near miss resolves to the closest "
+        "catalog title.",
+    )
 
 
 class RecommendationResponse(BaseModel):
     book: str
     recommendations: list[str]
     poster_urls: list[str]
+    resolved_book: str | None = Field(
+        None, description="Catalog title the recommendations are for, if not `book`."
+    )
+
+
+class BatchRecommendationRequest(BaseModel):
+    books: list[str] = Field(
+        ..., min_length=1, max_length=1000, description="Exact book titles to query."
+    )
+    n_recommendations: int = Field(
+        5, ge=1, le=50, description="Number of recommendations per title."
+    )
+
+
+class BatchRecommendationItem(BaseModel):
+    book: str
+    recommendations: list[str] = []
+    poster_urls: list[str] = []
+    error: str | None = None
+
+
+class BatchRecommendationResponse(BaseModel):
+    results: list[BatchRecommendationItem]
+
+
+class UserRecommendationResponse(BaseModel):
+    user_id: int
+    recommendations: list[str]
+    poster_urls: list[str]
+
+
+class TitleMatch(BaseModel):
+    title: str
+    match: str = Field(..., description='"prefix" or "fuzzy".')
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: list[TitleMatch]
 
 
 @app.get("/health")
@@ -22,12 +140,139 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Readiness: 200 once the artifacts are loaded, 503 while loading or failed."""
+    status = prediction_pipeline.service.status()
+    return JSONResponse(
+        status_code=200 if status["status"] == "ready" else 503, content=status
+    )
+
+
+@app.post("/admin/reload")
+def admin_reload(x_admin_token: str | None = Header(default=None)) -> dict:
+    """Load, validate and swap in the latest artifact version without a restart.
+
+    Fails closed: without an ``ADMIN_TOKEN``, reloads are refused unless
+    ``ALLOW_UNAUTHENTICATED_RELOAD=1`` is set.
+    """
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token:
+        if os.environ.get("ALLOW_UNAUTHENTICATED_RELOAD", "0") != "1":
+            raise HTTPException(
+                status_code=403,
+                detail="Reloads are disabled: set ADMIN_TOKEN (or "
+                "ALLOW_UNAUTHENTICATED_RELOAD=1).",
+            )
+    elif x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    try:
+        reloaded = prediction_pipeline.service.reload()
+    except Exception as exc:  # the current version keeps serving
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to load the new artifact version: {exc}",
+        ) from exc
+    return {"reloaded": reloaded, **prediction_pipeline.service.status()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(request: Request) -> str:
+    """Prometheus text exposition of request, phase, cache and scoring metrics."""
+    lines = request_metrics.render()
+    for prefix, stats, spec in (
+        ("recommendation_cache", recommendation_cache.stats(), CACHE_METRICS),
+        ("scoring", request.app.state.scoring_batcher.stats(), SCORING_METRICS),
+    ):
+        for key, kind, help_text in spec:
+            name = f"{prefix}_{key}"
+            if kind == "counter":
+                name += "_total"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {stats[key]}")
+
+    version = prediction_pipeline.service.artifact_version
+    lines += [
+        "# HELP recommender_ready Whether an artifact version is loaded.",
+        "# TYPE recommender_ready gauge",
+        f"recommender_ready {int(version is not None)}",
+        "# HELP recommender_artifact_info Artifact version currently served.",
+        "# TYPE recommender_artifact_info gauge",
+    ]
+    if version is not None:
+        version = version.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'recommender_artifact_info{{version="{version}"}} 1')
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/users/{user_id}/recommendations", response_model=UserRecommendationResponse)
+def recommend_for_user(
+    user_id: int, k: int = Query(5, ge=1, le=50)
+) -> UserRecommendationResponse:
+    """Personalized feed: unread books similar to the books the user rated."""
+    try:
+        recs, posters = prediction_pipeline.recommend_for_user(
+            user_id, n_recommendations=k
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except Exception as exc:  # broad to surface errors cleanly
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate recommendations: {exc}",
+        ) from exc
+    if not recs:
+        raise HTTPException(
+            status_code=404, detail=f"No recommendations found for user '{user_id}'."
+        )
+    return UserRecommendationResponse(
+        user_id=user_id, recommendations=recs, poster_urls=posters
+    )
+
+
+@app.get("/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Partial title."),
+    limit: int = Query(10, ge=1, le=50),
+) -> SearchResponse:
+    """Typeahead: titles starting with the query, then typo-tolerant matches."""
+    try:
+        results = prediction_pipeline.search_titles(q, limit=limit)
+    except Exception as exc:  # broad to surface errors cleanly
+        raise HTTPException(
+            status_code=500, detail=f"Failed to search titles: {exc}"
+        ) from exc
+    return SearchResponse(query=q, results=results)
+
+
 @app.post("/recommend", response_model=RecommendationResponse)
-def recommend(payload: RecommendationRequest) -> RecommendationResponse:
+async def recommend(payload: RecommendationRequest, request: Request) -> Response:
     if not payload.book:
         raise HTTPException(status_code=400, detail="Book title must be provided.")
+    scoring_batcher = request.app.state.scoring_batcher
+    key = (payload.book, 5)
     try:
-        recs, posters = prediction_pipeline.recommend_book(payload.book)
+        result = recommendation_cache.get(key)
+        if result is None:
+            version = prediction_pipeline.service.artifact_version
+            try:
+                book = payload.book
+                recs, posters = await scoring_batcher.submit(book, 5)
+            except ValueError:
+                # Resolve near-miss titles to their closest catalog title, on
+                # the same bounded executor as scoring
+                book = await scoring_batcher.run(
+                    prediction_pipeline.resolve_title, payload.book
+                )
+                if book is None or book == payload.book:
+                    raise
+                recs, posters = await scoring_batcher.submit(book, 5)
+            result = (book, recs, posters)
+            recommendation_cache.put(key, result, version=version)
+        book, recs, posters = result
+    except (QueueFullError, ScoringCancelledError) as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     except Exception as exc:  # broad to surface errors cleanly
@@ -39,6 +284,44 @@ def recommend(payload: RecommendationRequest) -> RecommendationResponse:
         raise HTTPException(
             status_code=404, detail=f"No recommendations found for '{payload.book}'."
         )
-    return RecommendationResponse(
-        book=payload.book, recommendations=recs, poster_urls=posters
-    )
+    with request_metrics.phase("serialization"):
+        body = RecommendationResponse(
+            book=payload.book,
+            recommendations=recs,
+            poster_urls=posters,
+            resolved_book=book if book != payload.book else None,
+        ).model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/recommend/batch", response_model=BatchRecommendationResponse)
+def recommend_batch(payload: BatchRecommendationRequest) -> BatchRecommendationResponse:
+    try:
+        results = prediction_pipeline.recommend_books(
+            payload.books, n_recommendations=payload.n_recommendations
+        )
+    except Exception as exc:  # broad to surface errors cleanly
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate recommendations: {exc}",
+        ) from exc
+
+    items = []
+    for book, result in zip(payload.books, results):
+        if isinstance(result, Exception):
+            items.append(BatchRecommendationItem(book=book, error=str(result)))
+            continue
+        recs, posters = result
+        if not recs:
+            items.append(
+                BatchRecommendationItem(
+                    book=book, error=f"No recommendations found for '{book}'."
+                )
+            )
+            continue
+        items.append(
+            BatchRecommendationItem(
+                book=book, recommendations=recs, poster_urls=posters
+            )
+        )
+    return BatchRecommendationResponse(results=items)
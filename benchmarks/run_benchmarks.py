@@ -0,0 +1,456 @@
+"""
+End-to-end benchmark of the training pipeline and the serving path.
+
+Generates a synthetic dataset in a scratch directory, runs every training
+stage in a fresh child process (so its peak RSS is its own), then load-tests
+``recommend_book`` and the FastAPI app in-process. Results are written as JSON;
+with ``--baseline`` the run is compared against an earlier result file and the
+command exits with status 1 when a metric regressed beyond ``--tolerance``.
+
+Usage:
+    python -m benchmarks.run_benchmarks --workdir /tmp/bench --output results.json
+    python -m benchmarks.run_benchmarks --baseline results.json --output new.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.synthetic_data import generate_dataset  # noqa: E402
+
+# The src modules are imported inside the functions below, after the working
+# directory has moved to the scratch directory: the stages read Data/ and
+# write artifacts/ and logs/ relative to it.
+
+
+def _rss_mb():
+    """
+    Current resident set size of this process in MB.
+    """
+    with open("/proc/self/statm") as file_obj:
+        pages = int(file_obj.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _ingestion():
+    from src.components.data_ingestion import DataIngestion
+
+    return DataIngestion().initiate_data_ingestion()
+
+
+def _transformation(books_path, users_path, ratings_path):
+    from src.components.data_preprocessing import DataTransformation
+
+    return DataTransformation().initiate_data_transformation(
+        books_path, users_path, ratings_path
+    )
+
+
+def _training(user_book_matrix_path, user_rating_matrix_path):
+    from src.components.model_preparation import ModelTrainer
+
+    return ModelTrainer().initiate_model_training(
+        user_book_matrix_path, user_rating_matrix_path
+    )
+
+
+def _neighbors(model_path, user_book_matrix_path):
+    from src.components.neighbor_precomputation import NeighborPrecomputation
+
+    return NeighborPrecomputation().initiate_neighbor_precomputation(
+        model_path, user_book_matrix_path
+    )
+
+
+def _publication():
+    from src.components.artifact_registry import ArtifactRegistry
+
+    return ArtifactRegistry().initiate_artifact_publication()
+
+
+STAGES = {
+    "ingestion": _ingestion,
+    "transformation": _transformation,
+    "training": _training,
+    "neighbors": _neighbors,
+    "publication": _publication,
+}
+
+
+def _stage_worker(name, args, connection):
+    try:
+        start_rss_mb = _rss_mb()
+        started = time.perf_counter()
+        result = STAGES[name](*args)
+        seconds = time.perf_counter() - started
+        connection.send(
+            (
+                "ok",
+                result,
+                {
+                    "seconds": seconds,
+                    "start_rss_mb": start_rss_mb,
+                    "peak_rss_mb": _peak_rss_mb(),
+                },
+            )
+        )
+    except BaseException as e:
+        connection.send(("error", repr(e), None))
+    finally:
+        connection.close()
+
+
+def run_stage(name, *args):
+    """
+    Run one pipeline stage in a fresh spawned process.
+
+    Returns:
+        Tuple[object, dict]: The stage's return value and its seconds, RSS at
+        start (imports only) and peak RSS in MB.
+
+    Raises:
+        RuntimeError: If the stage failed.
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_stage_worker, args=(name, args, sender))
+    process.start()
+    sender.close()
+    try:
+        status, result, metrics = receiver.recv()
+    except EOFError:
+        status, result, metrics = "error", f"exit code {process.exitcode}", None
+    process.join()
+    if status != "ok":
+        raise RuntimeError(f"Stage '{name}' failed: {result}")
+    print(
+        f"  {name:<15} {metrics['seconds']:8.2f} s  "
+        f"peak RSS {metrics['peak_rss_mb']:8.1f} MB"
+    )
+    return result, metrics
+
+
+def latency_summary(latencies_s, wall_seconds):
+    """
+    p50/p95/p99/mean/max latency in milliseconds and throughput of a run.
+    """
+    latencies_ms = np.asarray(latencies_s) * 1e3
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "requests": int(len(latencies_ms)),
+        "wall_seconds": wall_seconds,
+        "qps": len(latencies_ms) / wall_seconds if wall_seconds else None,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(latencies_ms.mean()),
+        "max_ms": float(latencies_ms.max()),
+    }
+
+
+def sample_titles(titles, n_requests, seed):
+    """
+    Draw query titles with Zipf-like skew, the way real traffic favours
+    popular books.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / (np.arange(len(titles)) + 1)
+    order = rng.permutation(len(titles))
+    picks = rng.choice(len(titles), size=n_requests, p=weights / weights.sum())
+    return [str(titles[order[i]]) for i in picks]
+
+
+def bench_recommend_book(queries, n_recommendations):
+    """
+    Sequential in-process latency of ``recommend_book``.
+    """
+    from src.pipelines import prediction_pipeline
+
+    latencies = []
+    started = time.perf_counter()
+    for title in queries:
+        call_started = time.perf_counter()
+        prediction_pipeline.recommend_book(title, n_recommendations)
+        latencies.append(time.perf_counter() - call_started)
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+async def _bench_api(app, queries, concurrency):
+    import httpx
+
+    latencies = []
+    status_codes = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def query(title):
+            async with semaphore:
+                call_started = time.perf_counter()
+                response = await client.post("/recommend", json={"book": title})
+                latencies.append(time.perf_counter() - call_started)
+                key = str(response.status_code)
+                status_codes[key] = status_codes.get(key, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(query(title) for title in queries))
+        wall_seconds = time.perf_counter() - started
+    return {
+        **latency_summary(latencies, wall_seconds),
+        "concurrency": concurrency,
+        "status_codes": status_codes,
+    }
+
+
+def bench_api(queries, concurrency):
+    """
+    Concurrent ``POST /recommend`` latency through the ASGI app, cache included.
+    """
+    import app as api
+
+    async def run():
+        # The lifespan builds the scoring executor and shuts it down
+        async with api.lifespan(api.app):
+            result = await _bench_api(api.app, queries, concurrency)
+            result["scoring"] = api.app.state.scoring_batcher.stats()
+        return result
+
+    api.recommendation_cache.clear()
+    result = asyncio.run(run())
+    result["cache"] = api.recommendation_cache.stats()
+    return result
+
+
+def bench_serving(args):
+    """
+    Cold artifact load, then the ``recommend_book`` and API load tests.
+    """
+    from src.pipelines import prediction_pipeline
+
+    service = prediction_pipeline.service
+    started = time.perf_counter()
+    service.load()
+    load_seconds = time.perf_counter() - started
+    titles = service.artifacts.books_title
+
+    queries = sample_titles(titles, args.requests, args.seed)
+    recommend = bench_recommend_book(queries, args.recommendations)
+    print(
+        f"  recommend_book  p50 {recommend['p50_ms']:.2f} ms  "
+        f"p99 {recommend['p99_ms']:.2f} ms  {recommend['qps']:.0f} QPS"
+    )
+    api = bench_api(queries, args.concurrency)
+    print(
+        f"  POST /recommend p50 {api['p50_ms']:.2f} ms  "
+        f"p99 {api['p99_ms']:.2f} ms  {api['qps']:.0f} QPS  {api['status_codes']}"
+    )
+    return {
+        "load_seconds": load_seconds,
+        "load_timings": service.status().get("load_timings"),
+        "n_titles": len(titles),
+        "recommend_book": recommend,
+        "api": api,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# (metric path, label) compared against a baseline; higher is worse unless
+# listed in HIGHER_IS_BETTER
+COMPARED_METRICS = (
+    (("stages", "ingestion", "seconds"), "ingestion seconds"),
+    (("stages", "transformation", "seconds"), "transformation seconds"),
+    (("stages", "training", "seconds"), "training seconds"),
+    (("stages", "neighbors", "seconds"), "neighbors seconds"),
+    (("stages", "ingestion", "peak_rss_mb"), "ingestion peak RSS"),
+    (("stages", "transformation", "peak_rss_mb"), "transformation peak RSS"),
+    (("stages", "training", "peak_rss_mb"), "training peak RSS"),
+    (("stages", "neighbors", "peak_rss_mb"), "neighbors peak RSS"),
+    (("serving", "load_seconds"), "artifact load seconds"),
+    (("serving", "recommend_book", "p95_ms"), "recommend_book p95"),
+    (("serving", "recommend_book", "qps"), "recommend_book QPS"),
+    (("serving", "api", "p95_ms"), "API p95"),
+    (("serving", "api", "qps"), "API QPS"),
+)
+HIGHER_IS_BETTER = {"recommend_book QPS", "API QPS"}
+
+
+def _lookup(results, path):
+    for key in path:
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare_results(current, baseline, tolerance):
+    """
+    Compare a run against a baseline run.
+
+    Args:
+        current (dict): Results of this run.
+        baseline (dict): Results of the baseline run.
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20 %.
+
+    Returns:
+        list: One dict per compared metric with its baseline and current
+        values, the relative change and whether it is a regression.
+    """
+    comparison = []
+    for path, label in COMPARED_METRICS:
+        before, after = _lookup(baseline, path), _lookup(current, path)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if label in HIGHER_IS_BETTER else change
+        comparison.append(
+            {
+                "metric": label,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regression": worse > tolerance,
+            }
+        )
+    return comparison
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the training stages and the serving path."
+    )
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--books", type=int, default=20_000)
+    parser.add_argument("--ratings", type=int, default=400_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--workdir",
+        default=os.path.join("benchmarks", "workdir"),
+        help="Scratch directory for the synthetic data and artifacts.",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Result file (defaults to benchmark_<timestamp>.json in the workdir).",
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--recommendations", type=int, default=5)
+    parser.add_argument("--skip-serving", action="store_true")
+    parser.add_argument("--baseline", help="Earlier result file to compare against.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Relative slowdown counted as a regression (default 0.2).",
+    )
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir).resolve()
+    output = Path(
+        args.output
+        or workdir / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    ).resolve()
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+
+    print(f"Generating synthetic data in {workdir}")
+    started = time.perf_counter()
+    data_rows = generate_dataset(
+        workdir / "Data",
+        n_users=args.users,
+        n_books=args.books,
+        n_ratings=args.ratings,
+        seed=args.seed,
+    )
+    print(f"  {data_rows} in {time.perf_counter() - started:.1f} s")
+
+    os.chdir(workdir)
+    print("Running the training stages")
+    stages = {}
+    raw_paths, stages["ingestion"] = run_stage("ingestion")
+    transformation_paths, stages["transformation"] = run_stage(
+        "transformation", *raw_paths
+    )
+    _, user_book_matrix_path, _, user_rating_matrix_path = transformation_paths
+    model_path, stages["training"] = run_stage(
+        "training", user_book_matrix_path, user_rating_matrix_path
+    )
+    _, stages["neighbors"] = run_stage("neighbors", model_path, user_book_matrix_path)
+    _, stages["publication"] = run_stage("publication")
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "users": args.users,
+            "books": args.books,
+            "ratings": args.ratings,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "recommendations": args.recommendations,
+        },
+        "data_rows": data_rows,
+        "stages": stages,
+    }
+    if not args.skip_serving:
+        print("Load-testing the serving path")
+        results["serving"] = bench_serving(args)
+
+    regressions = []
+    if baseline is not None:
+        results["comparison"] = compare_results(results, baseline, args.tolerance)
+        print(f"Comparison against {args.baseline}")
+        for row in results["comparison"]:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"  {row['metric']:<25} {row['change']:+7.1%}  {flag}")
+        regressions = [row for row in results["comparison"] if row["regression"]]
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
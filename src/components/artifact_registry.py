@@ -0,0 +1,205 @@
+from src.logger import logging
+from src.exception import CustomException
+from src.components.content_index import CONTENT_INDEX_FILES
+from src.components.title_search import TITLE_SEARCH_FILES
+from src.instrumentation import instrumented
+from src.utils import save_json, load_numpy_array
+
+from dataclasses import dataclass
+from datetime import datetime
+
+import os
+import sys
+import shutil
+
+
+@dataclass
+class ArtifactRegistryConfig:
+    """
+    Configuration class for the versioned artifact registry.
+
+    Attributes:
+        artifacts_dir (str): Directory the training pipeline writes its artifacts to.
+        versions_dir (str): Directory holding one sub-directory per published version.
+        manifest_file_name (str): File name of the manifest of a version; it is
+            written last, so only complete versions have one.
+        serving_files (tuple): Training artifacts copied into a published version;
+            missing optional files (e.g. embeddings) are skipped.
+    """
+
+    artifacts_dir: str = "artifacts"
+    versions_dir: str = os.path.join("artifacts", "versions")
+    manifest_file_name: str = "manifest.json"
+    serving_files: tuple = (
+        (
+            "model.pkl",
+            "model_spec.pkl",
+            "model_info.json",
+            "index_report.json",
+            "book_matrix_data.npy",
+            "book_matrix_indices.npy",
+            "book_matrix_indptr.npy",
+            "book_matrix_shape.npy",
+            "user_matrix_data.npy",
+            "user_matrix_indices.npy",
+            "user_matrix_indptr.npy",
+            "user_matrix_shape.npy",
+            "user_book_matrix.pkl",
+            "books_title.pkl",
+            "books_title_blob.npy",
+            "books_title_offsets.npy",
+            "user_ids.pkl",
+            "title_index.pkl",
+            "books_title_lookup_keys.npy",
+            "books_title_lookup_rows.npy",
+            "books_poster_blob.npy",
+            "books_poster_offsets.npy",
+            "user_ids_lookup_keys.npy",
+            "user_ids_lookup_rows.npy",
+            "neighbor_indices.npy",
+            "neighbor_distances.npy",
+            "item_embeddings.npy",
+            "item_embedding_components.npy",
+            "incremental_state.pkl",
+        )
+        + CONTENT_INDEX_FILES
+        + TITLE_SEARCH_FILES
+    )
+
+
+def new_version_name():
+    """
+    Name of a new version; names sort in creation order.
+    """
+    return datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+
+def latest_version_dir(
+    artifacts_dir, versions_dir=None, manifest_file_name="manifest.json"
+):
+    """
+    Return the most recent complete version, or ``artifacts_dir`` itself when no
+    version has been published yet.
+
+    Args:
+        artifacts_dir (str): Directory of the unversioned artifacts.
+        versions_dir (str, optional): Directory of the versions; defaults to
+            ``<artifacts_dir>/versions``.
+        manifest_file_name (str): File name of the manifest of a version.
+
+    Returns:
+        str: Directory of the artifact set to serve or update.
+    """
+    versions_dir = versions_dir or os.path.join(artifacts_dir, "versions")
+    if os.path.isdir(versions_dir):
+        versions = sorted(
+            name
+            for name in os.listdir(versions_dir)
+            if not name.startswith(".")
+            and os.path.exists(os.path.join(versions_dir, name, manifest_file_name))
+        )
+        if versions:
+            return os.path.join(versions_dir, versions[-1])
+    return artifacts_dir
+
+
+class ArtifactRegistry:
+    """
+    Class for publishing artifact sets as immutable, versioned directories.
+
+    A version is written into a hidden staging directory and renamed into
+    ``versions_dir`` only once its manifest is written, so readers never see a
+    partially written version and can serve it while newer ones are published.
+    """
+
+    def __init__(self):
+        self.artifact_registry_config = ArtifactRegistryConfig()
+
+    def latest_version_dir(self):
+        """
+        Return the most recent complete version, or the training artifacts.
+        """
+        config = self.artifact_registry_config
+        return latest_version_dir(
+            config.artifacts_dir, config.versions_dir, config.manifest_file_name
+        )
+
+    def stage_version(self, version):
+        """
+        Create and return the staging directory of a new version.
+        """
+        staging_dir = os.path.join(
+            self.artifact_registry_config.versions_dir, f".{version}.tmp"
+        )
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+        return staging_dir
+
+    def commit_version(self, staging_dir, version, manifest):
+        """
+        Write the manifest of a staged version and move it into place.
+
+        Args:
+            staging_dir (str): Directory returned by ``stage_version``.
+            version (str): Name of the version.
+            manifest (dict): Version metadata; ``version`` and ``created_at``
+                are filled in.
+
+        Returns:
+            str: Directory of the published version.
+        """
+        config = self.artifact_registry_config
+        manifest = {
+            "version": version,
+            "created_at": datetime.now().isoformat(),
+            **manifest,
+        }
+        save_json(os.path.join(staging_dir, config.manifest_file_name), manifest)
+        version_dir = os.path.join(config.versions_dir, version)
+        os.rename(staging_dir, version_dir)
+        logging.info(f"Published artifact version {version_dir}")
+        return version_dir
+
+    @instrumented("artifact_publication")
+    def initiate_artifact_publication(self):
+        """
+        Publish the serving artifacts of a training run as a new version.
+
+        The files are copied rather than linked, so the next training run can
+        overwrite the training artifacts while this version is being served.
+
+        Returns:
+            str: Directory of the published version.
+
+        Raises:
+            CustomException: If an exception occurs while publishing.
+        """
+        try:
+            config = self.artifact_registry_config
+            version = new_version_name()
+            staging_dir = self.stage_version(version)
+
+            logging.info(f"Copying the serving artifacts into version {version}")
+            files = []
+            for file_name in config.serving_files:
+                source = os.path.join(config.artifacts_dir, file_name)
+                if os.path.exists(source):
+                    shutil.copy2(source, os.path.join(staging_dir, file_name))
+                    files.append(file_name)
+
+            shape = load_numpy_array(os.path.join(staging_dir, "book_matrix_shape.npy"))
+            return self.commit_version(
+                staging_dir,
+                version,
+                {
+                    "parent": None,
+                    "source": "training",
+                    "files": files,
+                    "n_titles": int(shape[0]),
+                    "n_users": int(shape[1]),
+                },
+            )
+
+        except Exception as e:
+            logging.error("Error occurred during Artifact Publication")
+            raise CustomException(e, sys)
@@ -0,0 +1,178 @@
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import csr_matrix, issparse
+
+import multiprocessing
+import os
+import time
+import tracemalloc
+import numpy as np
+
+from src.instrumentation import max_rss_mb
+
+# Set in every worker process by _init_worker
+_features = None
+_row_sq_norms = None
+_reset_peak = False
+
+
+def _prepare(features, metric):
+    """
+    Rows to compare and their squared norms; cosine compares L2-normalized rows.
+    """
+    if issparse(features):
+        features = csr_matrix(features, dtype=np.float64)
+        sq_norms = np.asarray(features.multiply(features).sum(axis=1)).ravel()
+    else:
+        features = np.asarray(features, dtype=np.float64)
+        sq_norms = np.einsum("ij,ij->i", features, features)
+
+    if metric == "cosine":
+        scale = 1 / np.sqrt(np.where(sq_norms > 0, sq_norms, 1))
+        if issparse(features):
+            features = csr_matrix(features.multiply(scale[:, None]))
+        else:
+            features = features * scale[:, None]
+        sq_norms = np.where(sq_norms > 0, 1.0, 0.0)
+    return features, sq_norms
+
+
+def _init_worker(features, sq_norms, reset_peak=True):
+    global _features, _row_sq_norms, _reset_peak
+    _features = features
+    _row_sq_norms = sq_norms
+    # Only a worker process owns its tracemalloc peak; in the calling process a
+    # reset would wipe the peak of the enclosing instrumented step
+    _reset_peak = reset_peak
+    tracemalloc.start()
+
+
+def _block_top_k(start, stop, n_neighbors, metric):
+    """
+    Top ``n_neighbors`` of rows ``start:stop`` against every row.
+
+    Only one (stop - start) x n_rows block of scores exists at a time; each
+    row keeps its best columns with argpartition before they are sorted. The
+    reported peak is measured above the memory live when the block started; in
+    the calling process (``n_jobs=1``) the peak is not reset, so it is an upper
+    bound that may include earlier blocks.
+    """
+    started = time.perf_counter()
+    if _reset_peak:
+        tracemalloc.reset_peak()
+    traced_start = tracemalloc.get_traced_memory()[0]
+
+    products = _features[start:stop] @ _features.T
+    products = products.toarray() if issparse(products) else np.asarray(products)
+    if metric == "cosine":
+        scores = 1 - products
+    else:
+        scores = _row_sq_norms[start:stop, None] + _row_sq_norms[None, :] - 2 * products
+        np.maximum(scores, 0, out=scores)
+    del products
+
+    top = np.argpartition(scores, n_neighbors - 1, axis=1)[:, :n_neighbors]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(top_scores, axis=1, kind="stable")
+    indices = np.take_along_axis(top, order, axis=1)
+    distances = np.take_along_axis(top_scores, order, axis=1)
+    if metric != "cosine":
+        distances = np.sqrt(distances)
+
+    report = {
+        "start": int(start),
+        "stop": int(stop),
+        "seconds": time.perf_counter() - started,
+        "peak_mb": (tracemalloc.get_traced_memory()[1] - traced_start) / 1e6,
+        "max_rss_mb": max_rss_mb(),
+        "pid": os.getpid(),
+    }
+    return indices.astype(np.int32), distances.astype(np.float32), report
+
+
+def block_rows_for_budget(n_rows, memory_budget_mb):
+    """
+    Rows per block so that a block's float64 score matrix and its temporaries
+    (about three n_rows-wide arrays per row) stay within the memory budget.
+    """
+    per_row = 3 * n_rows * np.dtype(np.float64).itemsize
+    return int(max(1, min(n_rows, memory_budget_mb * 1e6 // per_row)))
+
+
+def all_pairs_top_k(
+    features, n_neighbors, metric="euclidean", memory_budget_mb=256, n_jobs=None
+):
+    """
+    Exact top-K neighbors of every row, computed in blocks across processes.
+
+    The rows are split into blocks sized by ``memory_budget_mb`` (per process);
+    each block computes its scores against all rows and keeps only its top-K,
+    so the full n_rows x n_rows matrix is never materialized. Blocks run on a
+    fork-based process pool that inherits the features without copying them.
+
+    Args:
+        features (csr_matrix | np.ndarray): One row per title.
+        n_neighbors (int): Neighbors per row, the row itself included.
+        metric (str): ``"euclidean"`` or ``"cosine"`` (distance 1 - cosine).
+        memory_budget_mb (float): Memory budget of one block's scores.
+        n_jobs (int, optional): Worker processes; defaults to the CPU count.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, list]: int32 neighbor indices, float32
+        distances sorted per row, and one timing and memory report per block.
+
+    Raises:
+        ValueError: If the metric is unknown.
+    """
+    if metric not in ("euclidean", "cosine"):
+        raise ValueError(
+            f"Unknown metric '{metric}', expected 'euclidean' or 'cosine'."
+        )
+
+    features, sq_norms = _prepare(features, metric)
+    n_rows = features.shape[0]
+    n_neighbors = min(n_neighbors, n_rows)
+    block_rows = block_rows_for_budget(n_rows, memory_budget_mb)
+    blocks = [
+        (start, min(start + block_rows, n_rows))
+        for start in range(0, n_rows, block_rows)
+    ]
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(blocks)))
+
+    indices = np.empty((n_rows, n_neighbors), dtype=np.int32)
+    distances = np.empty((n_rows, n_neighbors), dtype=np.float32)
+    reports = []
+
+    def collect(results):
+        for block, (block_indices, block_distances, report) in enumerate(results):
+            start, stop = report["start"], report["stop"]
+            indices[start:stop] = block_indices
+            distances[start:stop] = block_distances
+            reports.append({"block": block, **report})
+
+    if n_jobs == 1:
+        # Leave tracing on if the caller was already tracing memory
+        was_tracing = tracemalloc.is_tracing()
+        _init_worker(features, sq_norms, reset_peak=False)
+        try:
+            collect(
+                _block_top_k(start, stop, n_neighbors, metric) for start, stop in blocks
+            )
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(features, sq_norms),
+        ) as executor:
+            collect(
+                executor.map(
+                    _block_top_k,
+                    *zip(*blocks),
+                    [n_neighbors] * len(blocks),
+                    [metric] * len(blocks),
+                )
+            )
+    return indices, distances, reports
@@ -0,0 +1,283 @@
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from src.instrumentation import instrument, instrumented
+from src.utils import (
+    load_columnar_frame,
+    load_csr_matrix,
+    load_object,
+    load_sorted_lookup,
+    load_string_array,
+    save_csr_matrix,
+    save_sorted_lookup,
+    save_string_array,
+)
+
+from src.logger import logging
+from src.exception import CustomException
+
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+_WORD = re.compile(r"\w\w+")
+
+# Files of a content index, relative to its artifact directory
+CONTENT_INDEX_FILES = tuple(
+    f"{prefix}_{part}.npy"
+    for prefix in ("content_matrix", "content_inverted")
+    for part in ("data", "indices", "indptr", "shape")
+) + (
+    "content_titles_blob.npy",
+    "content_titles_offsets.npy",
+    "content_posters_blob.npy",
+    "content_posters_offsets.npy",
+    "content_titles_lookup_keys.npy",
+    "content_titles_lookup_rows.npy",
+)
+
+
+def _normalize_field(value):
+    return " ".join(value.lower().split()) if isinstance(value, str) else ""
+
+
+def book_tokens(book):
+    """
+    Tokens describing one book: its title words, plus its whole author and
+    publisher as single field-prefixed tokens.
+
+    Args:
+        book (tuple): ``(title, author, publisher)``.
+
+    Returns:
+        list[str]: The book's tokens.
+    """
+    title, author, publisher = (_normalize_field(value) for value in book)
+    tokens = _WORD.findall(title)
+    if author:
+        tokens.append(f"author:{author}")
+    if publisher:
+        tokens.append(f"publisher:{publisher}")
+    return tokens
+
+
+def build_content_matrix(books, n_features=2**18, max_df=0.05):
+    """
+    Hashed TF-IDF vectors of books, one L2-normalized row per book.
+
+    Tokens are hashed into ``n_features`` columns, so no vocabulary is stored;
+    term frequencies are sublinear (1 + log tf) and weighted by the smoothed
+    IDF. Columns present in more than ``max_df`` of the books are dropped:
+    they carry little signal and their postings would dominate query time.
+
+    Args:
+        books (Iterable[tuple]): ``(title, author, publisher)`` of every book.
+        n_features (int): Number of hashed columns.
+        max_df (float): Maximum document frequency of a kept column.
+
+    Returns:
+        scipy.sparse.csr_matrix: float32 TF-IDF matrix of shape (n_books, n_features).
+    """
+    vectorizer = HashingVectorizer(
+        n_features=n_features,
+        analyzer=book_tokens,
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32,
+    )
+    counts = vectorizer.transform(books).tocsr()
+    n_books = counts.shape[0]
+
+    document_frequency = np.bincount(counts.indices, minlength=n_features)
+    idf = np.log((1 + n_books) / (1 + document_frequency)) + 1
+    idf[document_frequency > max(1, max_df * n_books)] = 0
+
+    counts.data = (1 + np.log(counts.data)) * idf[counts.indices]
+    counts.eliminate_zeros()
+    return normalize(counts).astype(np.float32)
+
+
+class ContentIndex:
+    """
+    Cosine neighbor search over the hashed TF-IDF vectors of the catalog.
+
+    The matrix transpose is kept as an inverted index (one posting list of
+    titles per hashed token), so a query only touches the postings of its own
+    tokens instead of every title.
+
+    Args:
+        matrix (csr_matrix): TF-IDF rows of the titles.
+        inverted (csr_matrix): ``matrix.T`` in CSR layout.
+        titles (Sequence[str]): Title of every row.
+        posters (Sequence[str]): Poster URL of every row ("" when unknown).
+        title_to_row (SortedLookup | dict): Title to row map.
+    """
+
+    def __init__(self, matrix, inverted, titles, posters, title_to_row):
+        self.matrix = matrix
+        self.inverted = inverted
+        self.titles = titles
+        self.posters = posters
+        self.title_to_row = title_to_row
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def kneighbors(self, rows, n_neighbors):
+        """
+        Most similar titles of the given rows, excluding the rows themselves.
+
+        Returns:
+            list[np.ndarray]: For every row, up to ``n_neighbors`` row ids by
+            decreasing cosine similarity (ties by row id); titles sharing no
+            kept token with the query are never returned.
+        """
+        scores = (self.matrix[np.asarray(rows)] @ self.inverted).tocsr()
+        neighbors = []
+        for position, row in enumerate(rows):
+            start, stop = scores.indptr[position], scores.indptr[position + 1]
+            candidates = scores.indices[start:stop]
+            similarities = scores.data[start:stop]
+            others = candidates != row
+            candidates, similarities = candidates[others], similarities[others]
+            if len(candidates) > n_neighbors:
+                top = np.argpartition(-similarities, n_neighbors - 1)[:n_neighbors]
+                candidates, similarities = candidates[top], similarities[top]
+            neighbors.append(candidates[np.lexsort((candidates, -similarities))])
+        return neighbors
+
+
+def load_content_index(artifact_dir, mmap_mode="r"):
+    """
+    Load the content index of an artifact directory.
+
+    Returns:
+        ContentIndex | None: The index, or None if it has not been built.
+    """
+    lookup_prefix = os.path.join(artifact_dir, "content_titles_lookup")
+    legacy_path = os.path.join(artifact_dir, "content_index.pkl")
+    if not os.path.exists(f"{lookup_prefix}_rows.npy") and not os.path.exists(
+        legacy_path
+    ):
+        logging.warning(f"Content index missing in {artifact_dir}, skipping")
+        return None
+    titles = load_string_array(
+        os.path.join(artifact_dir, "content_titles"), mmap_mode=mmap_mode
+    )
+    if os.path.exists(f"{lookup_prefix}_rows.npy"):
+        title_to_row = load_sorted_lookup(
+            lookup_prefix, strings=titles, mmap_mode=mmap_mode
+        )
+    else:
+        # Indexes built before the lookup arrays pickled a dict
+        title_to_row = load_object(legacy_path)
+    return ContentIndex(
+        matrix=load_csr_matrix(
+            os.path.join(artifact_dir, "content_matrix"), mmap_mode=mmap_mode
+        ),
+        inverted=load_csr_matrix(
+            os.path.join(artifact_dir, "content_inverted"), mmap_mode=mmap_mode
+        ),
+        titles=titles,
+        posters=load_string_array(
+            os.path.join(artifact_dir, "content_posters"), mmap_mode=mmap_mode
+        ),
+        title_to_row=title_to_row,
+    )
+
+
+@dataclass
+class ContentIndexConfig:
+    """
+    Configuration class for the content-based fallback index.
+
+    Attributes:
+        artifacts_dir (str): Directory the index files are written to.
+        n_features (int): Number of hashed TF-IDF columns.
+        max_df (float): Tokens present in more than this share of the titles
+            are dropped.
+    """
+
+    artifacts_dir: str = "artifacts"
+    n_features: int = 2**18
+    max_df: float = 0.05
+
+
+class ContentIndexTrainer:
+    """
+    Class for building the content-based index of every catalog title.
+    """
+
+    def __init__(self):
+        self.content_index_config = ContentIndexConfig()
+
+    @instrumented("content_index")
+    def initiate_content_index(self, books_data_path):
+        """
+        Build the hashed TF-IDF index of the whole catalog.
+
+        Unlike the collaborative matrix, which only keeps titles with enough
+        ratings from active users, this index covers every title of the books
+        data, described by its title words, author and publisher (of its first
+        edition), so titles without ratings still get recommendations.
+
+        Args:
+            books_data_path (str): Directory of the columnar books data.
+
+        Returns:
+            str: Directory the index was written to.
+
+        Raises:
+            CustomException: If an exception occurs while building the index.
+        """
+        try:
+            config = self.content_index_config
+            artifacts_dir = config.artifacts_dir
+
+            logging.info("Reading the books data for the content index")
+            with instrument("read_books") as step:
+                books_df = load_columnar_frame(
+                    books_data_path, columns=["title", "author", "publisher", "url"]
+                )
+                # One row per title, described by its first edition
+                books_df = books_df.dropna(subset=["title"]).drop_duplicates("title")
+                step.rows_out = len(books_df)
+
+            logging.info(f"Vectorizing {len(books_df)} titles with hashed TF-IDF")
+            with instrument("tfidf", rows_in=len(books_df)) as step:
+                matrix = build_content_matrix(
+                    books_df[["title", "author", "publisher"]].itertuples(
+                        index=False, name=None
+                    ),
+                    n_features=config.n_features,
+                    max_df=config.max_df,
+                )
+                inverted = matrix.T.tocsr()
+                step.rows_out = matrix.shape[0]
+                step.extra = {"nnz": int(matrix.nnz)}
+
+            logging.info("Saving the content index")
+            with instrument("save_artifacts"):
+                titles = books_df["title"].tolist()
+                save_csr_matrix(os.path.join(artifacts_dir, "content_matrix"), matrix)
+                save_csr_matrix(
+                    os.path.join(artifacts_dir, "content_inverted"), inverted
+                )
+                save_string_array(os.path.join(artifacts_dir, "content_titles"), titles)
+                save_string_array(
+                    os.path.join(artifacts_dir, "content_posters"),
+                    books_df["url"].tolist(),
+                )
+                save_sorted_lookup(
+                    os.path.join(artifacts_dir, "content_titles_lookup"),
+                    titles,
+                    strings=True,
+                )
+
+            return artifacts_dir
+
+        except Exception as e:
+            logging.error("Error occurred during Content Index building")
+            raise CustomException(e, sys)
@@ -2,6 +2,9 @@ import os
 import sys
 from src.logger import logging
 from src.exception import CustomException
+from src.instrumentation import instrument, instrumented
+from src.utils import CategoryEncoder, ColumnarWriter, save_string_array
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
 
@@ -11,11 +14,37 @@ from dataclasses import dataclass
 class DataIngestionConfig:
     """
     Configuration class for data ingestion.
+
+    Attributes:
+        raw_data_dir (str): Directory of the raw books, users and ratings CSV files.
+        books_raw_data_path (str): Directory of the columnar books data.
+        users_raw_data_path (str): Directory of the columnar users data.
+        ratings_raw_data_path (str): Directory of the columnar ratings data.
+        isbn_categories_file_prefix (str): Path prefix of the ISBN vocabulary
+            shared by the books and ratings ISBN codes.
+        chunk_size (int): Number of CSV rows parsed per chunk.
     """
 
-    books_raw_data_path: str = os.path.join("artifacts", "books.csv")
-    users_raw_data_path: str = os.path.join("artifacts", "users.csv")
-    ratings_raw_data_path: str = os.path.join("artifacts", "ratings.csv")
+    raw_data_dir: str = "Data"
+    books_raw_data_path: str = os.path.join("artifacts", "books")
+    users_raw_data_path: str = os.path.join("artifacts", "users")
+    ratings_raw_data_path: str = os.path.join("artifacts", "ratings")
+    isbn_categories_file_prefix: str = os.path.join("artifacts", "isbn_categories")
+    chunk_size: int = 100_000
+
+
+# Columns kept from each raw CSV with their parsed types; the books columns
+# dropped during EDA (year of publication, small and medium image URLs) are
+# never parsed
+BOOKS_DTYPES = {
+    "ISBN": str,
+    "Book-Title": str,
+    "Book-Author": str,
+    "Publisher": str,
+    "Image-URL-L": str,
+}
+USERS_DTYPES = {"User-ID": np.int32, "Location": str, "Age": np.float32}
+RATINGS_DTYPES = {"User-ID": np.int32, "ISBN": str, "Book-Rating": np.int8}
 
 
 class DataIngestion:
@@ -31,15 +60,69 @@ class DataIngestion:
             DataIngestionConfig()
         )  # Initializing the ingestion configuration
 
+    def _ingest_csv(
+        self, csv_path, dtypes, output_dir, columns=None, isbn_encoder=None
+    ):
+        """
+        Stream a raw CSV into a columnar directory chunk by chunk.
+
+        Args:
+            csv_path (str): Path of the raw ``;``-separated CSV file.
+            dtypes (dict): Columns to parse and their types.
+            output_dir (str): Directory of the columnar output.
+            columns (dict, optional): Column renames applied to every chunk.
+            isbn_encoder (CategoryEncoder, optional): Shared encoder turning the
+                ISBN column into int32 codes.
+
+        Returns:
+            int: Number of rows written.
+        """
+        writer = ColumnarWriter(
+            output_dir,
+            category_columns=(
+                {
+                    "ISBN": os.path.relpath(
+                        self.ingestion_config.isbn_categories_file_prefix, output_dir
+                    )
+                }
+                if isbn_encoder is not None
+                else None
+            ),
+        )
+        n_rows = 0
+        with instrument(os.path.basename(output_dir)) as step:
+            for chunk in pd.read_csv(
+                csv_path,
+                sep=";",
+                on_bad_lines="skip",
+                encoding="latin-1",
+                usecols=list(dtypes),
+                dtype=dtypes,
+                chunksize=self.ingestion_config.chunk_size,
+            ):
+                if isbn_encoder is not None:
+                    chunk["ISBN"] = isbn_encoder.encode(chunk["ISBN"])
+                if columns:
+                    chunk = chunk.rename(columns=columns)
+                writer.write(chunk)
+                n_rows += len(chunk)
+            writer.close()
+            step.rows_out = n_rows
+        return n_rows
+
+    @instrumented("data_ingestion")
     def initiate_data_ingestion(self):
         """
         Initiates the data ingestion process.
 
-        Reads the data from a CSV file
-        and saves the data as CSV files. Logs the progress and handles any exceptions.
+        Streams the books, users and ratings CSV files in chunks of
+        ``chunk_size`` rows with explicit column types, and writes each table as
+        a columnar directory of .npy arrays, so memory stays bounded by the chunk
+        size and the next stage never parses text again. ISBNs are stored as
+        int32 codes into one vocabulary shared by books and ratings.
 
         Returns:
-            Tuple[str, str]: Paths of the train and test data CSV files.
+            Tuple[str, str, str]: Directories of the books, users and ratings data.
 
         Raises:
             CustomException: If an exception occurs during the data ingestion process.
@@ -47,76 +130,47 @@ class DataIngestion:
         logging.info("Data Ingestion started")  # Logging info message
 
         try:
-            # Read the data from the CSV file
-            books_df = pd.read_csv(
-                os.path.join("Data", "books.csv"),
-                sep=";",
-                on_bad_lines="skip",
-                encoding="latin-1",
-                low_memory=False,
-            )
-            logging.info(
-                "Reading the Books data as Pandas DataFrame"
-            )  # Logging info message
+            isbn_encoder = CategoryEncoder()
 
-            users_df = pd.read_csv(
-                os.path.join("Data", "users.csv"),
-                sep=";",
-                on_bad_lines="skip",
-                encoding="latin-1",
-                low_memory=False,
-            )
-
-            logging.info(
-                "Reading the Users data as Pandas DataFrame"
-            )  # Logging info message
-
-            ratings_df = pd.read_csv(
-                os.path.join("Data", "ratings.csv"),
-                sep=";",
-                on_bad_lines="skip",
-                encoding="latin-1",
-                low_memory=False,
-            )
-
-            logging.info("Reading the Ratings data as Pandas DataFrame")
-
-            # Columns to drop from books data identified during EDA
-            books_drop_cols = ["Year-Of-Publication", "Image-URL-S", "Image-URL-M"]
-
-            logging.info("Droping the columns from books_df dataframe")
-            books_df.drop(books_drop_cols, axis=1, inplace=True)
-
-            logging.info("Renaming the columns name in books data for EASE OF USE")
-            # Renaming columns for better readability and consistency
-            books_df.rename(
+            # Books columns are renamed for better readability and consistency
+            n_books = self._ingest_csv(
+                os.path.join(self.ingestion_config.raw_data_dir, "books.csv"),
+                BOOKS_DTYPES,
+                self.ingestion_config.books_raw_data_path,
                 columns={
                     "Book-Title": "title",
                     "Book-Author": "author",
                     "Publisher": "publisher",
                     "Image-URL-L": "url",
                 },
-                inplace=True,
+                isbn_encoder=isbn_encoder,
             )
+            logging.info(f"Ingested {n_books} rows of Books data")
 
-            logging.info("Renaming columns in the ratings data for consistency")
-            # Renaming columns in the ratings data for consistency
-            ratings_df.rename(
-                columns={"User-ID": "user_id", "Book-Rating": "rating"}, inplace=True
+            n_users = self._ingest_csv(
+                os.path.join(self.ingestion_config.raw_data_dir, "users.csv"),
+                USERS_DTYPES,
+                self.ingestion_config.users_raw_data_path,
             )
+            logging.info(f"Ingested {n_users} rows of Users data")
 
-            # Create the directory if it doesn't exist
-            os.makedirs(
-                os.path.dirname(self.ingestion_config.books_raw_data_path),
-                exist_ok=True,
+            # Ratings columns are renamed for consistency
+            n_ratings = self._ingest_csv(
+                os.path.join(self.ingestion_config.raw_data_dir, "ratings.csv"),
+                RATINGS_DTYPES,
+                self.ingestion_config.ratings_raw_data_path,
+                columns={"User-ID": "user_id", "Book-Rating": "rating"},
+                isbn_encoder=isbn_encoder,
             )
+            logging.info(f"Ingested {n_ratings} rows of Ratings data")
 
-            # Save the raw data as CSV file
-            books_df.to_csv(self.ingestion_config.books_raw_data_path)
-            users_df.to_csv(self.ingestion_config.users_raw_data_path)
-            ratings_df.to_csv(self.ingestion_config.ratings_raw_data_path)
+            # Vocabulary of the ISBN codes of both books and ratings
+            save_string_array(
+                file_prefix=self.ingestion_config.isbn_categories_file_prefix,
+                strings=isbn_encoder.categories,
+            )
 
-            logging.info("Raw data stored as CSV file")
+            logging.info("Raw data stored as columnar arrays")
 
             logging.info("Data Ingestion completed")
 
@@ -1,27 +1,125 @@
 import numpy as np
 import pandas as pd
-from scipy.sparse import csr_matrix
+from scipy.sparse import coo_matrix
 
 from src.logger import logging
 from src.exception import CustomException
+from src.instrumentation import instrument, instrumented
 from dataclasses import dataclass
 
 import os
 import sys
 
 # Importing custom utility function for saving objects
-from src.utils import save_object
+from src.utils import (
+    load_columnar_frame,
+    save_object,
+    save_sorted_lookup,
+    save_string_array,
+)
 
 
 @dataclass
 class DataTransformationConfig:
     """
     Configuration class for data transformation.
+
+    Attributes:
+        ratings_object_file_path (str): The file path to save the final ratings.
+        user_book_matrix_object_file_path (str): The file path to save the sparse
+            title-by-user matrix.
+        user_rating_matrix_object_file_path (str): The file path to save the sparse
+            title-by-user matrix of the users' own ratings (see ``rating_weights``).
+        books_title_object_file_path (str): The file path to save the matrix row titles.
+        user_ids_object_file_path (str): The file path to save the matrix column user ids.
+        books_title_array_file_prefix (str): Path prefix of the memory-mappable titles.
+        title_index_object_file_path (str): The file path to save the title to row and
+            title to poster indexes.
+        title_lookup_file_prefix (str): Path prefix of the memory-mappable title to
+            row lookup.
+        books_poster_array_file_prefix (str): Path prefix of the memory-mappable
+            poster URL of every matrix row.
+        user_lookup_file_prefix (str): Path prefix of the memory-mappable user id
+            to column lookup.
+        min_user_ratings (int): Users need more than this many ratings to be active.
+        min_book_ratings (int): Titles need at least this many ratings from active users.
     """
 
     ratings_object_file_path: str = os.path.join("artifacts", "ratings.pkl")
-    pivot_table_object_file_path: str = os.path.join("artifacts", "book_pivot.pkl")
+    user_book_matrix_object_file_path: str = os.path.join(
+        "artifacts", "user_book_matrix.pkl"
+    )
+    user_rating_matrix_object_file_path: str = os.path.join(
+        "artifacts", "user_rating_matrix.pkl"
+    )
     books_title_object_file_path: str = os.path.join("artifacts", "books_title.pkl")
+    user_ids_object_file_path: str = os.path.join("artifacts", "user_ids.pkl")
+    books_title_array_file_prefix: str = os.path.join("artifacts", "books_title")
+    title_index_object_file_path: str = os.path.join("artifacts", "title_index.pkl")
+    title_lookup_file_prefix: str = os.path.join("artifacts", "books_title_lookup")
+    books_poster_array_file_prefix: str = os.path.join("artifacts", "books_poster")
+    user_lookup_file_prefix: str = os.path.join("artifacts", "user_ids_lookup")
+    min_user_ratings: int = 200
+    min_book_ratings: int = 50
+
+
+def rating_weights(ratings):
+    """
+    Weight of users' own ratings in personalized recommendations.
+
+    Explicit ratings (1-10) keep their value; implicit ones (0) only record
+    that the user read the title and weigh like the lowest explicit rating, so
+    every rated title keeps a nonzero entry.
+    """
+    return np.maximum(np.asarray(ratings, dtype=np.float64), 1)
+
+
+def _inner_join_codes(left_codes, left_rows, right_codes):
+    """
+    Inner join of rows on integer keys, in the order ``DataFrame.merge`` uses.
+
+    The keys are small dense codes, so the right rows are bucketed by key with
+    a counting sort and every left row finds its matches by direct indexing.
+
+    Args:
+        left_codes (np.ndarray): Key of every left row (-1 for missing).
+        left_rows (np.ndarray): Positions of the left rows taking part.
+        right_codes (np.ndarray): Key of every right row (-1 for missing).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Left and right positions of every joined
+        pair, following the left rows, then the right rows, in their order.
+    """
+    # Shifted by one so missing keys (-1) join each other, as in pandas
+    n_keys = max(left_codes.max(initial=-1), right_codes.max(initial=-1)) + 2
+    right_counts = np.bincount(right_codes + 1, minlength=n_keys)
+    right_starts = np.cumsum(right_counts) - right_counts
+    right_order = np.argsort(right_codes, kind="stable")
+
+    keys = left_codes[left_rows] + 1
+    starts = right_starts[keys]
+    n_matches = right_counts[keys]
+
+    # Position of every joined pair within its run of equal right keys
+    offsets = np.arange(n_matches.sum()) - np.repeat(
+        np.cumsum(n_matches) - n_matches, n_matches
+    )
+    return (
+        np.repeat(left_rows, n_matches),
+        right_order[np.repeat(starts, n_matches) + offsets],
+    )
+
+
+def _compact_codes(codes, n_codes):
+    """
+    Renumber codes to 0..k-1 over the codes present, keeping their order.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The renumbered codes and a boolean mask
+        of the original codes that are present.
+    """
+    present = np.bincount(codes, minlength=n_codes) > 0
+    return (np.cumsum(present) - 1)[codes], present
 
 
 class DataTransformation:
@@ -36,114 +134,288 @@ class DataTransformation:
         # Initializing the data transformation configuration
         self.data_transformation_config = DataTransformationConfig()
 
+    def _select_final_rows(self, ratings_df, books_df):
+        """
+        Select the rows of the final ratings data on integer codes.
+
+        Every key is factorized once and each filter is a mask over row
+        positions, so the frames are never copied or merged on strings; the
+        temporaries of the filters are freed when this method returns.
+
+        Args:
+            ratings_df (pd.DataFrame): Ratings with ISBN categoricals.
+            books_df (pd.DataFrame): Books with ISBN categoricals sharing the
+                ratings' vocabulary.
+
+        Returns:
+            dict: Ratings and books row positions of every final row, its
+            title rating count and row label, and its title and user codes
+            into the sorted ``title_labels`` and ``user_labels``.
+        """
+        # Every key is factorized once: ISBNs already are int32 codes into
+        # one vocabulary, titles and user ids get sorted codes, so the
+        # matrix rows and columns keep the order the pivot table used to have
+        config = self.data_transformation_config
+        logging.info("Factorizing book titles and user ids into integer codes")
+        with instrument("factorize", rows_in=len(ratings_df) + len(books_df)) as step:
+            user_codes, user_labels = pd.factorize(ratings_df["user_id"], sort=True)
+            title_codes, title_labels = pd.factorize(books_df["title"], sort=True)
+            rating_isbn_codes = ratings_df["ISBN"].cat.codes.to_numpy()
+            book_isbn_codes = books_df["ISBN"].cat.codes.to_numpy()
+            step.rows_out = len(user_labels) + len(title_labels)
+
+        # Filters are boolean masks over row positions; the frame itself is
+        # only gathered once, after every filter
+        logging.info(
+            "Filtering out users who have given at most "
+            f"{config.min_user_ratings} ratings"
+        )
+        with instrument("filter_active_users", rows_in=len(ratings_df)) as step:
+            user_rating_counts = np.bincount(user_codes, minlength=len(user_labels))
+            rating_rows = np.flatnonzero(
+                user_rating_counts[user_codes] > config.min_user_ratings
+            )
+            step.rows_out = len(rating_rows)
+
+        # Joining the ratings of active users with the books on ISBN codes
+        logging.info("Joining the ratings data with books data on ISBN codes")
+        with instrument("join_books", rows_in=len(rating_rows)) as step:
+            rating_rows, book_rows = _inner_join_codes(
+                rating_isbn_codes, rating_rows, book_isbn_codes
+            )
+            step.rows_out = len(rating_rows)
+
+        # Counting the ratings of every title and keeping the titles with
+        # at least min_book_ratings ratings; rows without a title never match
+        # a count
+        logging.info(
+            "Filtering the ratings data to include books with at least "
+            f"{config.min_book_ratings} ratings"
+        )
+        with instrument("filter_popular_titles", rows_in=len(rating_rows)) as step:
+            joined_title_codes = title_codes[book_rows]
+            has_title = joined_title_codes >= 0
+            title_rating_counts = np.bincount(
+                joined_title_codes[has_title], minlength=len(title_labels)
+            )
+            joined_counts = np.where(
+                has_title, title_rating_counts[joined_title_codes], 0
+            )
+            kept = np.flatnonzero(joined_counts >= config.min_book_ratings)
+            step.rows_out = len(kept)
+
+        # Dropping duplicate entries based on title and user_id, keeping the
+        # first rating of every (title, user) pair
+        logging.info("Dropping duplicate entries based on title and user_id")
+        with instrument("drop_duplicates", rows_in=len(kept)) as step:
+            pair_codes = (
+                joined_title_codes[kept].astype(np.int64) * len(user_labels)
+                + user_codes[rating_rows[kept]]
+            )
+            kept = kept[~pd.Series(pair_codes).duplicated().to_numpy()]
+            step.rows_out = len(kept)
+
+        return {
+            "rating_rows": rating_rows[kept],
+            "book_rows": book_rows[kept],
+            "title_rating_counts": joined_counts[kept],
+            # Row labels of the rows the merges used to return
+            "row_labels": (np.cumsum(has_title) - 1)[kept],
+            "title_codes": joined_title_codes[kept],
+            "user_codes": user_codes[rating_rows[kept]],
+            "title_labels": title_labels,
+            "user_labels": user_labels,
+        }
+
+    @instrumented("data_transformation")
     def initiate_data_transformation(
         self, books_data_path, users_data_path, ratings_data_path
     ):
         """
         Initiates the data transformation process.
 
-        Reads the books, users and ratings data, applies the data transformation pipeline,
+        Reads the books and ratings data, applies the data transformation pipeline,
         and saves the final data. Logs the progress and handles any exceptions.
 
+        The filters run as one pass over integer codes (see
+        ``_select_final_rows``) and the final rows are gathered once, so the
+        ratings are never merged on strings or copied per step.
+
         Args:
-            books_data_path (str): Path to the books data CSV file.
-            users_data_path (str): Path to the users data CSV file.
-            ratings_data_path (str): Path to the ratings data CSV file.
+            books_data_path (str): Directory of the columnar books data.
+            users_data_path (str): Directory of the columnar users data (unused
+                by the filters, kept for the pipeline interface).
+            ratings_data_path (str): Directory of the columnar ratings data.
 
         Returns:
-            Tuple[np.ndarray, np.ndarray, str]: Transformed train and test data arrays, and preprocessor object file path.
+            Tuple[str, str, str, str]: Paths of the final ratings, sparse user-book matrix,
+            book titles and sparse user rating matrix objects.
 
         Raises:
             CustomException: If an exception occurs during the data transformation process.
         """
         try:
-            # Read the books data from CSV
-            books_df = pd.read_csv(books_data_path)
-            # Read the users data from CSV
-            users_df = pd.read_csv(users_data_path)
-            # Read the ratings data from CSV
-            ratings_df = pd.read_csv(ratings_data_path)
+            # Read the typed columnar data written by the ingestion stage; ISBNs
+            # are categoricals sharing one vocabulary, so the join uses codes
+            # No filter uses the users data, so it is not read
+            with instrument("read_columnar") as step:
+                books_df = load_columnar_frame(books_data_path)
+                ratings_df = load_columnar_frame(ratings_data_path)
+                step.rows_out = len(ratings_df)
 
             # Logging info message
             logging.info("Reading Data completed")
 
             logging.info(f"Books Dataframe Head:\n{books_df.head().to_string()}")
-            logging.info(f"Users Dataframe Head:\n{users_df.head().to_string()}")
             logging.info(f"Ratings Dataframe Head:\n{ratings_df.head().to_string()}")
 
-            logging.info("Filtering out users who have given less than 200 ratings")
-            active_users_filter = ratings_df["user_id"].value_counts() > 200
-            active_users = active_users_filter[active_users_filter].index
-            ratings_df = ratings_df[ratings_df["user_id"].isin(active_users)]
+            selection = self._select_final_rows(ratings_df, books_df)
 
-            # Merging the ratings data with books data
-            logging.info("Merging the ratings data with books data")
-            merged_ratings_books_df = ratings_df.merge(books_df, on="ISBN")
+            # Gathering the final rows once, with the columns and row labels the
+            # merges used to produce
+            logging.info("Gathering the final ratings data")
+            with instrument(
+                "gather_final_ratings", rows_in=len(selection["rating_rows"])
+            ) as step:
+                final_ratings_df = pd.concat(
+                    [
+                        ratings_df.take(selection["rating_rows"])
+                        .reset_index(drop=True)
+                        .rename(columns={"rating": "rating_x"}),
+                        books_df.drop(columns="ISBN")
+                        .take(selection["book_rows"])
+                        .reset_index(drop=True),
+                    ],
+                    axis=1,
+                )
+                final_ratings_df["rating_y"] = selection["title_rating_counts"]
+                final_ratings_df.index = selection["row_labels"]
+                step.rows_out = len(final_ratings_df)
+            # The full frames are not needed anymore
+            del ratings_df, books_df
 
-            # Grouping the merged data by book title and counting the ratings
-            logging.info(
-                "Grouping the merged data by book title and counting the ratings"
-            )
-            book_rating_counts = (
-                merged_ratings_books_df.groupby("title").rating.count().reset_index()
-            )
+            # Building the sparse title x user matrix directly from the codes,
+            # so memory scales with the number of ratings
+            logging.info("Creating a sparse matrix for the user-book matrix")
+            with instrument(
+                "build_sparse_matrix", rows_in=len(final_ratings_df)
+            ) as step:
+                title_rows, matrix_titles = _compact_codes(
+                    selection["title_codes"], len(selection["title_labels"])
+                )
+                user_columns, matrix_users = _compact_codes(
+                    selection["user_codes"], len(selection["user_labels"])
+                )
+                title_labels = selection["title_labels"][matrix_titles]
+                user_labels = selection["user_labels"][matrix_users]
+                user_book_matrix = coo_matrix(
+                    (
+                        final_ratings_df["rating_y"].to_numpy(dtype=np.float64),
+                        (title_rows, user_columns),
+                    ),
+                    shape=(len(title_labels), len(user_labels)),
+                ).tocsr()
+                # Same entries holding the users' own ratings (rating_x) instead
+                # of the title rating counts, for personalized recommendations
+                user_rating_matrix = coo_matrix(
+                    (
+                        rating_weights(final_ratings_df["rating_x"]),
+                        (title_rows, user_columns),
+                    ),
+                    shape=(len(title_labels), len(user_labels)),
+                ).tocsr()
+                step.rows_out = user_book_matrix.shape[0]
+                step.extra = {
+                    "shape": list(user_book_matrix.shape),
+                    "nnz": int(user_book_matrix.nnz),
+                }
 
-            # Merging the rating counts with the merged ratings and books data
-            logging.info(
-                "Merging the rating counts with the merged ratings and books data"
-            )
-            final_ratings_df = merged_ratings_books_df.merge(
-                book_rating_counts, on="title"
-            )
+            # Extracting the code-to-label maps of the matrix rows and columns
+            logging.info("Extracting book titles and user ids of the user-book matrix")
+            book_titles = pd.Index(title_labels, name="title")
+            user_ids = np.asarray(user_labels)
 
-            # Filtering the final ratings data to include books with at least 50 ratings
-            logging.info(
-                "Filtering the final ratings data to include books with at least 50 ratings"
-            )
-            final_ratings_df = final_ratings_df[final_ratings_df["rating_y"] >= 50]
-
-            # Dropping duplicate entries based on title and user_id
-            logging.info("Dropping duplicate entries based on title and user_id")
-            final_ratings_df.drop_duplicates(["title", "user_id"], inplace=True)
+            # Hash indexes from title to matrix row and to its first poster URL,
+            # so serving never scans the titles or the ratings per request
+            logging.info("Building the title to row and title to poster indexes")
+            with instrument("build_title_index", rows_in=len(final_ratings_df)) as step:
+                poster_urls = (
+                    final_ratings_df.drop_duplicates("title")
+                    .set_index("title")["url"]
+                    .reindex(book_titles)
+                    .dropna()
+                )
+                title_index = {
+                    "title_to_row": {
+                        title: row for row, title in enumerate(book_titles)
+                    },
+                    "title_to_poster": poster_urls.to_dict(),
+                }
+                step.rows_out = len(book_titles)
 
-            # Creating a pivot table for the user-book matrix
-            logging.info("Creating a pivot table for the user-book matrix")
-            user_book_matrix = final_ratings_df.pivot_table(
-                columns="user_id", index="title", values="rating_y"
-            )
-
-            # Filling missing values in the pivot table with 0
-            logging.info("Filling missing values in the pivot table with 0")
-            user_book_matrix.fillna(0, inplace=True)
+            # Logging info message
+            logging.info("Saving the Final Ratings and User-Book Matrix objects")
 
-            # Extracting book titles from the user-book matrix
-            logging.info("Extracting book titles from the user-book matrix")
-            book_titles = user_book_matrix.index
+            with instrument("save_artifacts"):
+                save_object(
+                    # Save the final rating objects
+                    file_path=self.data_transformation_config.ratings_object_file_path,
+                    obj=final_ratings_df,
+                )
+                save_object(
+                    # Save the sparse user-book matrix
+                    file_path=self.data_transformation_config.user_book_matrix_object_file_path,
+                    obj=user_book_matrix,
+                )
+                save_object(
+                    # Save the sparse user rating matrix
+                    file_path=self.data_transformation_config.user_rating_matrix_object_file_path,
+                    obj=user_rating_matrix,
+                )
 
-            # Logging info message
-            logging.info("Saving the Final Ratings and Pivot Table objects")
+                save_object(
+                    # Save the row code to title map
+                    file_path=self.data_transformation_config.books_title_object_file_path,
+                    obj=book_titles,
+                )
+                save_object(
+                    # Save the column code to user id map
+                    file_path=self.data_transformation_config.user_ids_object_file_path,
+                    obj=user_ids,
+                )
 
-            save_object(
-                # Save the final rating objects
-                file_path=self.data_transformation_config.ratings_object_file_path,
-                obj=final_ratings_df,
-            )
-            save_object(
-                # Save the pivot table objects
-                file_path=self.data_transformation_config.pivot_table_object_file_path,
-                obj=user_book_matrix,
-            )
+                save_object(
+                    # Save the title to row and title to poster indexes
+                    file_path=self.data_transformation_config.title_index_object_file_path,
+                    obj=title_index,
+                )
 
-            save_object(
-                # Save the pivot table objects
-                file_path=self.data_transformation_config.books_title_object_file_path,
-                obj=book_titles,
-            )
+                # Memory-mappable copy of the titles and lookups for serving, so
+                # every worker maps them instead of unpickling its own dicts
+                logging.info("Saving the book titles and lookups as arrays")
+                save_string_array(
+                    file_prefix=self.data_transformation_config.books_title_array_file_prefix,
+                    strings=book_titles,
+                )
+                save_sorted_lookup(
+                    file_prefix=self.data_transformation_config.title_lookup_file_prefix,
+                    values=book_titles,
+                    strings=True,
+                )
+                save_string_array(
+                    file_prefix=self.data_transformation_config.books_poster_array_file_prefix,
+                    strings=poster_urls.reindex(book_titles),
+                )
+                save_sorted_lookup(
+                    file_prefix=self.data_transformation_config.user_lookup_file_prefix,
+                    values=user_ids,
+                )
 
             return (
                 self.data_transformation_config.ratings_object_file_path,
-                self.data_transformation_config.pivot_table_object_file_path,
+                self.data_transformation_config.user_book_matrix_object_file_path,
                 self.data_transformation_config.books_title_object_file_path,
+                self.data_transformation_config.user_rating_matrix_object_file_path,
             )
 
         except Exception as e:
@@ -0,0 +1,87 @@
+from src.components.neighbor_index import truncated_svd
+from src.utils import load_object, save_numpy_array
+
+from src.logger import logging
+from src.instrumentation import instrument, instrumented
+from src.exception import CustomException
+
+import os
+import sys
+from dataclasses import dataclass
+
+
+@dataclass
+class EmbeddingTrainerConfig:
+    """
+    Configuration class for the EmbeddingTrainer.
+
+    Attributes:
+        item_embeddings_file_path (str): The file path to save the title embeddings.
+        components_file_path (str): The file path to save the right singular vectors,
+            used to project new user-book rows into the embedding space.
+        rank (int): Number of dimensions of the embeddings.
+    """
+
+    item_embeddings_file_path: str = os.path.join("artifacts", "item_embeddings.npy")
+    components_file_path: str = os.path.join(
+        "artifacts", "item_embedding_components.npy"
+    )
+    rank: int = 64
+
+
+class EmbeddingTrainer:
+    """
+    Class for factorizing the user-book matrix into dense title embeddings.
+    """
+
+    def __init__(self):
+        self.embedding_training_config = EmbeddingTrainerConfig()
+
+    @instrumented("embedding_training")
+    def initiate_embedding_training(self, user_book_matrix):
+        """
+        Factorize the user-book matrix with a truncated SVD.
+
+        Each title becomes a dense float32 vector of ``rank`` dimensions
+        (``U * S``), so neighbor search can run on titles x rank values instead
+        of the full sparse matrix.
+
+        Args:
+            user_book_matrix (str): Path to the sparse user-book matrix.
+
+        Returns:
+            str: Path of the saved title embeddings file.
+
+        Raises:
+            CustomException: If an exception occurs during the factorization.
+        """
+        try:
+            logging.info("Load the sparse matrix")
+            user_book_matrix = load_object(user_book_matrix)
+
+            logging.info(
+                "Factorizing the user-book matrix with a truncated SVD of rank "
+                f"{self.embedding_training_config.rank}"
+            )
+            with instrument("truncated_svd", rows_in=user_book_matrix.shape[0]) as step:
+                item_embeddings, components = truncated_svd(
+                    user_book_matrix, self.embedding_training_config.rank
+                )
+                step.rows_out = item_embeddings.shape[0]
+            logging.info(f"Title embeddings shape: {item_embeddings.shape}")
+
+            logging.info("Saving the title embeddings and SVD components")
+            save_numpy_array(
+                file_path=self.embedding_training_config.item_embeddings_file_path,
+                array=item_embeddings,
+            )
+            save_numpy_array(
+                file_path=self.embedding_training_config.components_file_path,
+                array=components,
+            )
+
+            return self.embedding_training_config.item_embeddings_file_path
+
+        except Exception as e:
+            logging.error("Error occurred during Embedding Training")
+            raise CustomException(e, sys)
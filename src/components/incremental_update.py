@@ -0,0 +1,642 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, diags
+
+from src.components.artifact_registry import (
+    ArtifactRegistry,
+    latest_version_dir,
+    new_version_name,
+)
+from src.components.content_index import CONTENT_INDEX_FILES
+from src.components.data_preprocessing import rating_weights
+from src.components.neighbor_index import (
+    detach_index,
+    index_distances,
+    refresh_index,
+)
+from src.components.title_search import TITLE_SEARCH_FILES
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import instrument, instrumented
+from src.utils import (
+    load_columnar_frame,
+    load_csr_matrix,
+    load_json,
+    load_numpy_array,
+    load_object,
+    save_csr_matrix,
+    save_json,
+    save_numpy_array,
+    save_object,
+    save_sorted_lookup,
+    save_string_array,
+)
+from dataclasses import dataclass
+
+import os
+import shutil
+import sys
+
+# Waiting ratings of the incremental state: the catalog ratings of an inactive
+# user and the active users' ratings of a title below the threshold
+_INACTIVE_DTYPE = [("ISBN", object), ("rating", np.int8)]
+_UNLISTED_DTYPE = [("user_id", np.int64), ("rating", np.int8)]
+
+
+def _group_arrays(keys, values):
+    """
+    ``{key: array of its values}``, values kept in their order within a key.
+    """
+    keys, values = np.asarray(keys), np.asarray(values)
+    order = np.argsort(keys, kind="stable")
+    unique_keys, starts = np.unique(keys[order], return_index=True)
+    return dict(zip(unique_keys.tolist(), np.split(values[order], starts[1:])))
+
+
+def _records(dtype, *columns):
+    """
+    Structured array of ``dtype`` with one field per column.
+    """
+    records = np.empty(len(columns[0]), dtype=dtype)
+    for name, column in zip(records.dtype.names, columns):
+        records[name] = column
+    return records
+
+
+def _append_arrays(groups, keys, values):
+    """
+    Append values to the arrays of their keys in a dict built by ``_group_arrays``.
+    """
+    for key, new_values in _group_arrays(keys, values).items():
+        previous = groups.get(key)
+        groups[key] = (
+            new_values if previous is None else np.concatenate([previous, new_values])
+        )
+
+
+@dataclass
+class IncrementalUpdateConfig:
+    """
+    Configuration class for incremental model updates.
+
+    Attributes:
+        artifacts_dir (str): Directory of the full training artifacts.
+        versions_dir (str): Directory where versioned artifact sets are written.
+        state_file_path (str): The file path the training run saves the incremental
+            state to; it is published with every version.
+        state_file_name (str): File name of the incremental state inside an artifact set.
+        manifest_file_name (str): File name of the manifest inside a versioned artifact set.
+        batch_size (int): Number of titles per block when recomputing neighbors.
+    """
+
+    artifacts_dir: str = "artifacts"
+    versions_dir: str = os.path.join("artifacts", "versions")
+    state_file_path: str = os.path.join("artifacts", "incremental_state.pkl")
+    state_file_name: str = "incremental_state.pkl"
+    manifest_file_name: str = "manifest.json"
+    batch_size: int = 256
+
+
+class IncrementalUpdate:
+    """
+    Class for refreshing trained artifacts from a file of new ratings.
+
+    The training run saves a compact incremental state next to the artifacts:
+    the rating thresholds of the transformation, per-user rating counts, per-title counts from active users, the catalog
+    ratings of users not active yet and the active users' ratings of titles not
+    in the matrix yet. A delta only updates these counts, rebuilds the matrix
+    rows of the titles it touched and recomputes neighbors for those titles;
+    every other title merges its cached neighbor list with fresh distances to
+    the touched titles. The cost of an update follows the size of the delta, not
+    of the rating history.
+    """
+
+    def __init__(self):
+        self.incremental_update_config = IncrementalUpdateConfig()
+
+    def latest_version_dir(self):
+        """
+        Return the most recent versioned artifact set, or the full training
+        artifacts when no version has been published yet.
+        """
+        config = self.incremental_update_config
+        return latest_version_dir(
+            config.artifacts_dir, config.versions_dir, config.manifest_file_name
+        )
+
+    def _read_ratings(self, ratings_path):
+        """
+        Read a ratings file in the raw dataset format and rename its columns.
+        """
+        ratings_df = pd.read_csv(
+            ratings_path,
+            sep=";",
+            on_bad_lines="skip",
+            encoding="latin-1",
+            dtype={"ISBN": str},
+        )
+        return ratings_df.rename(
+            columns={"User-ID": "user_id", "Book-Rating": "rating"}
+        )[["user_id", "ISBN", "rating"]]
+
+    def _build_state(self, ratings_df, books_df, min_user_ratings, min_book_ratings):
+        """
+        Build the incremental state from the ingested ratings and books.
+        """
+        books = books_df[["ISBN", "title", "url"]]
+        user_counts = ratings_df["user_id"].value_counts()
+        rated_books = ratings_df[["user_id", "ISBN", "rating"]].merge(books, on="ISBN")
+
+        active = (rated_books["user_id"].map(user_counts) > min_user_ratings).to_numpy()
+        title_counts = rated_books[active].groupby("title").size()
+        listed = title_counts.index[title_counts >= min_book_ratings]
+        unlisted = (
+            active
+            & rated_books["title"].notna().to_numpy()
+            & ~rated_books["title"].isin(listed).to_numpy()
+        )
+        return {
+            # Thresholds of the transformation the matrix was built with
+            "min_user_ratings": min_user_ratings,
+            "min_book_ratings": min_book_ratings,
+            "books": books,
+            "user_counts": user_counts,
+            "title_counts": title_counts,
+            # Catalog ratings that count once their user becomes active
+            "inactive_ratings": _group_arrays(
+                rated_books["user_id"].to_numpy()[~active],
+                _records(
+                    _INACTIVE_DTYPE,
+                    rated_books["ISBN"].to_numpy()[~active],
+                    rated_books["rating"].to_numpy()[~active],
+                ),
+            ),
+            # Active users' ratings of the titles that have not reached
+            # min_book_ratings
+            "unlisted_ratings": _group_arrays(
+                rated_books["title"].to_numpy()[unlisted],
+                _records(
+                    _UNLISTED_DTYPE,
+                    rated_books["user_id"].to_numpy()[unlisted],
+                    rated_books["rating"].to_numpy()[unlisted],
+                ),
+            ),
+        }
+
+    @instrumented("incremental_state")
+    def initiate_incremental_state(
+        self, books_data_path, ratings_data_path, min_user_ratings, min_book_ratings
+    ):
+        """
+        Save the incremental state of a training run.
+
+        Args:
+            books_data_path (str): Directory of the columnar books data.
+            ratings_data_path (str): Directory of the columnar ratings data.
+            min_user_ratings (int): The transformation's activity threshold: users
+                need more than this many ratings to be active.
+            min_book_ratings (int): The transformation's popularity threshold:
+                titles need at least this many ratings from active users.
+
+        Returns:
+            str: Path of the saved incremental state.
+
+        Raises:
+            CustomException: If an exception occurs while building the state.
+        """
+        try:
+            config = self.incremental_update_config
+            logging.info("Building the incremental state from the ingested data")
+            with instrument("read_columnar") as step:
+                ratings_df = load_columnar_frame(
+                    ratings_data_path, columns=["user_id", "ISBN", "rating"]
+                )
+                books_df = load_columnar_frame(
+                    books_data_path, columns=["ISBN", "title", "url"]
+                )
+                step.rows_out = len(ratings_df)
+            # Deltas carry ISBNs as plain strings
+            ratings_df["ISBN"] = ratings_df["ISBN"].astype(str)
+            books_df["ISBN"] = books_df["ISBN"].astype(str)
+
+            with instrument("build_state", rows_in=len(ratings_df)) as step:
+                state = self._build_state(
+                    ratings_df, books_df, min_user_ratings, min_book_ratings
+                )
+                step.rows_out = len(state["user_counts"])
+                step.extra = {
+                    "inactive_users": len(state["inactive_ratings"]),
+                    "unlisted_titles": len(state["unlisted_ratings"]),
+                }
+            save_object(file_path=config.state_file_path, obj=state)
+            return config.state_file_path
+        except Exception as e:
+            logging.error("Error occurred while building the incremental state")
+            raise CustomException(e, sys)
+
+    def _update_state(self, state, delta_df):
+        """
+        Fold a delta into the state.
+
+        Returns:
+            Tuple[pd.DataFrame, int]: The catalog ratings that started counting
+            toward title counts, with their rating, title and poster URL, and
+            the number of users that became active.
+        """
+        min_user_ratings = state["min_user_ratings"]
+
+        # Updating user activity with the delta only
+        delta_user_counts = delta_df["user_id"].value_counts()
+        previous_counts = state["user_counts"].reindex(
+            delta_user_counts.index, fill_value=0
+        )
+        user_counts = state["user_counts"].add(delta_user_counts, fill_value=0)
+        user_counts = user_counts.astype(np.int64)
+        current_counts = user_counts[delta_user_counts.index]
+        is_active = current_counts > min_user_ratings
+        newly_active = current_counts.index[
+            is_active & (previous_counts <= min_user_ratings)
+        ]
+
+        # Ratings that start counting toward title counts: the waiting ratings
+        # of users that just became active plus the delta ratings of all
+        # active users
+        inactive_ratings = state["inactive_ratings"]
+        empty = np.empty(0, dtype=_INACTIVE_DTYPE)
+        waiting = [inactive_ratings.pop(user_id, empty) for user_id in newly_active]
+        waiting_records = np.concatenate(waiting or [empty])
+        delta_active = delta_df["user_id"].map(is_active).to_numpy()
+        counted = pd.concat(
+            [
+                pd.DataFrame(
+                    {
+                        "user_id": np.repeat(
+                            newly_active.to_numpy(),
+                            [len(ratings) for ratings in waiting],
+                        ),
+                        "ISBN": waiting_records["ISBN"],
+                        "rating": waiting_records["rating"],
+                    }
+                ),
+                delta_df.loc[delta_active, ["user_id", "ISBN", "rating"]],
+            ],
+            ignore_index=True,
+        ).merge(state["books"], on="ISBN")
+
+        # Catalog ratings of users still inactive wait for them
+        inactive_delta = delta_df[~delta_active].merge(state["books"], on="ISBN")
+        _append_arrays(
+            inactive_ratings,
+            inactive_delta["user_id"].to_numpy(),
+            _records(
+                _INACTIVE_DTYPE,
+                inactive_delta["ISBN"].to_numpy(),
+                inactive_delta["rating"].to_numpy(),
+            ),
+        )
+
+        title_counts = state["title_counts"].add(
+            counted.groupby("title").size(), fill_value=0
+        )
+        state["user_counts"] = user_counts
+        state["title_counts"] = title_counts.astype(np.int64)
+        return counted, len(newly_active)
+
+    def _update_neighbors(
+        self, model, features, neighbor_indices, neighbor_distances, rows
+    ):
+        """
+        Recompute neighbors of changed rows and merge them into every other list.
+        """
+        batch_size = self.incremental_update_config.batch_size
+        n_titles = features.shape[0]
+        width = min(neighbor_indices.shape[1], n_titles)
+
+        indices = np.zeros((n_titles, width), dtype=np.int32)
+        distances = np.zeros((n_titles, width), dtype=np.float32)
+        old_rows = len(neighbor_indices)
+        indices[:old_rows] = neighbor_indices[:, :width]
+        distances[:old_rows] = neighbor_distances[:, :width]
+
+        def recompute(recompute_rows):
+            for start in range(0, len(recompute_rows), batch_size):
+                block = recompute_rows[start : start + batch_size]
+                block_distances, block_indices = model.kneighbors(
+                    features[block], n_neighbors=width
+                )
+                indices[block] = block_indices
+                distances[block] = block_distances
+
+        # Full neighbor lists for the titles the delta touched
+        recompute(rows)
+
+        # Every other title only needs its distances to the touched titles
+        changed = np.zeros(n_titles, dtype=bool)
+        changed[rows] = True
+        untouched = np.flatnonzero(~changed)
+        stale = []
+        for start in range(0, len(untouched), batch_size):
+            block = untouched[start : start + batch_size]
+            fresh = index_distances(model, features[block], features[rows])
+            cached_changed = changed[indices[block]]
+            cached_distances = np.where(cached_changed, np.inf, distances[block])
+            cached_last = distances[block, -1].copy()
+
+            candidate_ids = np.hstack(
+                [indices[block], np.broadcast_to(rows, fresh.shape)]
+            )
+            candidate_distances = np.hstack([cached_distances, fresh])
+            order = np.argsort(candidate_distances, axis=1, kind="stable")[:, :width]
+            indices[block] = np.take_along_axis(candidate_ids, order, axis=1)
+            distances[block] = np.take_along_axis(candidate_distances, order, axis=1)
+
+            # A touched title that moved away leaves a gap that an uncached title
+            # may fill; only those lists need a full recomputation
+            stale.append(block[distances[block, -1] > cached_last])
+
+        stale = np.concatenate(stale) if stale else np.array([], dtype=np.intp)
+        logging.info(f"Recomputing {len(stale)} neighbor lists left with gaps")
+        recompute(stale)
+
+        return indices, distances
+
+    def initiate_incremental_update(self, delta_ratings_path, base_dir=None):
+        """
+        Refresh the artifacts with a delta ratings file.
+
+        Args:
+            delta_ratings_path (str): Ratings file in the raw dataset format
+                (``User-ID;ISBN;Book-Rating``).
+            base_dir (str, optional): Artifact set to update; defaults to the
+                latest version, or the full training artifacts.
+
+        Returns:
+            str: Directory of the new versioned artifact set.
+
+        Raises:
+            CustomException: If an exception occurs during the update.
+        """
+        try:
+            config = self.incremental_update_config
+            base_dir = base_dir or self.latest_version_dir()
+            logging.info(f"Incremental update of {base_dir} with {delta_ratings_path}")
+
+            state_path = os.path.join(base_dir, config.state_file_name)
+            if not os.path.exists(state_path):
+                raise FileNotFoundError(
+                    f"{base_dir} has no incremental state ({config.state_file_name}); "
+                    "rerun the training pipeline to create one."
+                )
+            state = load_object(state_path)
+            if "min_book_ratings" not in state:
+                raise ValueError(
+                    f"The incremental state of {base_dir} does not record the "
+                    "rating thresholds; rerun the training pipeline to create one."
+                )
+
+            logging.info("Loading the base artifacts")
+            matrix = load_csr_matrix(
+                os.path.join(base_dir, "book_matrix"), mmap_mode=None
+            )
+            # The users' own ratings, with the entries of the book matrix
+            rating_matrix = load_csr_matrix(
+                os.path.join(base_dir, "user_matrix"), mmap_mode=None
+            ).T.tocsr()
+            book_titles = list(load_object(os.path.join(base_dir, "books_title.pkl")))
+            user_ids = load_object(os.path.join(base_dir, "user_ids.pkl"))
+            user_id_dtype, user_ids = user_ids.dtype, list(user_ids)
+            title_index = load_object(os.path.join(base_dir, "title_index.pkl"))
+            model_info = load_json(os.path.join(base_dir, "model_info.json"))
+            model = load_object(os.path.join(base_dir, "model_spec.pkl"))
+            neighbor_indices = load_numpy_array(
+                os.path.join(base_dir, "neighbor_indices.npy")
+            )
+            neighbor_distances = load_numpy_array(
+                os.path.join(base_dir, "neighbor_distances.npy")
+            )
+
+            logging.info("Reading the delta ratings")
+            delta_df = self._read_ratings(delta_ratings_path)
+            counted, n_newly_active = self._update_state(state, delta_df)
+
+            # Titles whose counts changed and that pass the rating threshold
+            title_counts = state["title_counts"]
+            touched_titles = counted["title"].dropna().unique()
+            rebuild_titles = [
+                title
+                for title in touched_titles
+                if title_counts.get(title, 0) >= state["min_book_ratings"]
+            ]
+            title_to_row = title_index["title_to_row"]
+            title_to_poster = title_index["title_to_poster"]
+            listed_titles = [t for t in rebuild_titles if t in title_to_row]
+            new_titles = [t for t in rebuild_titles if t not in title_to_row]
+            logging.info(
+                f"Delta of {len(delta_df)} ratings touched {len(rebuild_titles)} titles "
+                f"({len(new_titles)} new), {n_newly_active} users became active"
+            )
+
+            # Active users of touched titles still below the threshold wait for it
+            unlisted_ratings = state["unlisted_ratings"]
+            waiting = counted[
+                counted["title"].notna() & ~counted["title"].isin(rebuild_titles)
+            ]
+            _append_arrays(
+                unlisted_ratings,
+                waiting["title"].to_numpy(),
+                _records(
+                    _UNLISTED_DTYPE,
+                    waiting["user_id"].to_numpy(),
+                    waiting["rating"].to_numpy(),
+                ),
+            )
+
+            # (title, user) pairs of the rebuilt rows with the weight of the
+            # user's rating: the users already in a listed title's row, the
+            # waiting users of new titles and the ratings that started counting;
+            # the first rating of a pair wins, as in the full transformation
+            listed_rows = rating_matrix[[title_to_row[t] for t in listed_titles]]
+            empty = np.empty(0, dtype=_UNLISTED_DTYPE)
+            new_waiting = [unlisted_ratings.pop(t, empty) for t in new_titles]
+            new_records = np.concatenate(new_waiting or [empty])
+            rebuilt = counted[counted["title"].isin(rebuild_titles)]
+            pairs = pd.concat(
+                [
+                    pd.DataFrame(
+                        {
+                            "title": np.repeat(
+                                np.asarray(listed_titles, dtype=object),
+                                np.diff(listed_rows.indptr),
+                            ),
+                            "user_id": np.asarray(user_ids)[listed_rows.indices],
+                            "weight": listed_rows.data,
+                        }
+                    ),
+                    pd.DataFrame(
+                        {
+                            "title": np.repeat(
+                                np.asarray(new_titles, dtype=object),
+                                [len(ratings) for ratings in new_waiting],
+                            ),
+                            "user_id": new_records["user_id"],
+                            "weight": rating_weights(new_records["rating"]),
+                        }
+                    ),
+                    pd.DataFrame(
+                        {
+                            "title": rebuilt["title"].to_numpy(),
+                            "user_id": rebuilt["user_id"].to_numpy(),
+                            "weight": rating_weights(rebuilt["rating"]),
+                        }
+                    ),
+                ],
+                ignore_index=True,
+            ).drop_duplicates(["title", "user_id"])
+
+            for title in new_titles:
+                title_to_row[title] = len(book_titles)
+                book_titles.append(title)
+            # Poster of a new title: the first of its ratings that started counting
+            posters = counted.drop_duplicates("title").set_index("title")["url"]
+            for title in new_titles:
+                if isinstance(posters.get(title), str):
+                    title_to_poster[title] = posters[title]
+
+            user_to_col = {user_id: col for col, user_id in enumerate(user_ids)}
+            new_users = [u for u in pairs["user_id"].unique() if u not in user_to_col]
+            for user_id in new_users:
+                user_to_col[user_id] = len(user_ids)
+                user_ids.append(user_id)
+
+            logging.info("Rebuilding the matrix rows of the touched titles")
+            rows = np.array(
+                sorted(title_to_row[title] for title in rebuild_titles), dtype=np.intp
+            )
+            shape = (len(book_titles), len(user_ids))
+            keep = np.ones(shape[0])
+            keep[rows] = 0
+            pair_rows = pairs["title"].map(title_to_row).to_numpy()
+            pair_columns = pairs["user_id"].map(user_to_col).to_numpy()
+
+            def rebuild(base_matrix, values):
+                base_matrix.resize(shape)
+                new_entries = coo_matrix(
+                    (values, (pair_rows, pair_columns)), shape=shape
+                )
+                rebuilt_matrix = (diags(keep) @ base_matrix + new_entries).tocsr()
+                rebuilt_matrix.eliminate_zeros()
+                return rebuilt_matrix
+
+            matrix = rebuild(
+                matrix, pairs["title"].map(title_counts).to_numpy(dtype=np.float64)
+            )
+            rating_matrix = rebuild(
+                rating_matrix, pairs["weight"].to_numpy(dtype=np.float64)
+            )
+
+            if model_info["feature_space"] == "embeddings":
+                # Folding the rebuilt rows into the existing SVD basis
+                logging.info("Folding the touched titles into the title embeddings")
+                components = load_numpy_array(
+                    os.path.join(base_dir, "item_embedding_components.npy")
+                )
+                embeddings = np.zeros((shape[0], components.shape[0]), dtype=np.float32)
+                base_embeddings = load_numpy_array(
+                    os.path.join(base_dir, "item_embeddings.npy")
+                )
+                embeddings[: len(base_embeddings)] = base_embeddings
+                embeddings[rows] = matrix[rows][:, : components.shape[1]] @ components.T
+                features = embeddings
+            else:
+                features = matrix
+
+            logging.info("Refreshing the index and the touched neighbor lists")
+            model = refresh_index(model, features, rows)
+            neighbor_indices, neighbor_distances = self._update_neighbors(
+                model, features, neighbor_indices, neighbor_distances, rows
+            )
+
+            # Writing into a staging directory that is renamed into place once
+            # complete, so servers never pick up a partial version
+            registry = ArtifactRegistry()
+            registry.artifact_registry_config.versions_dir = config.versions_dir
+            registry.artifact_registry_config.manifest_file_name = (
+                config.manifest_file_name
+            )
+            version = new_version_name()
+            version_dir = registry.stage_version(version)
+            logging.info(f"Saving the versioned artifact set {version}")
+
+            save_csr_matrix(os.path.join(version_dir, "book_matrix"), matrix)
+            save_csr_matrix(
+                os.path.join(version_dir, "user_matrix"), rating_matrix.T.tocsr()
+            )
+            save_object(os.path.join(version_dir, "user_book_matrix.pkl"), matrix)
+            save_object(
+                os.path.join(version_dir, "books_title.pkl"),
+                pd.Index(book_titles, name="title"),
+            )
+            save_string_array(os.path.join(version_dir, "books_title"), book_titles)
+            save_object(
+                os.path.join(version_dir, "user_ids.pkl"),
+                np.asarray(user_ids, dtype=user_id_dtype),
+            )
+            save_object(os.path.join(version_dir, "title_index.pkl"), title_index)
+            save_sorted_lookup(
+                os.path.join(version_dir, "books_title_lookup"),
+                book_titles,
+                strings=True,
+            )
+            save_string_array(
+                os.path.join(version_dir, "books_poster"),
+                [title_to_poster.get(title) for title in book_titles],
+            )
+            save_sorted_lookup(
+                os.path.join(version_dir, "user_ids_lookup"),
+                np.asarray(user_ids, dtype=user_id_dtype),
+            )
+            if model_info["feature_space"] == "embeddings":
+                save_numpy_array(
+                    os.path.join(version_dir, "item_embeddings.npy"), features
+                )
+                save_numpy_array(
+                    os.path.join(version_dir, "item_embedding_components.npy"),
+                    components,
+                )
+            save_object(os.path.join(version_dir, "model.pkl"), model)
+            save_object(
+                os.path.join(version_dir, "model_spec.pkl"), detach_index(model)
+            )
+            save_json(os.path.join(version_dir, "model_info.json"), model_info)
+            save_numpy_array(
+                os.path.join(version_dir, "neighbor_indices.npy"), neighbor_indices
+            )
+            save_numpy_array(
+                os.path.join(version_dir, "neighbor_distances.npy"), neighbor_distances
+            )
+            save_object(os.path.join(version_dir, config.state_file_name), state)
+            # The content and search indexes only depend on the books, so they
+            # carry over
+            for file_name in CONTENT_INDEX_FILES + TITLE_SEARCH_FILES:
+                source = os.path.join(base_dir, file_name)
+                if os.path.exists(source):
+                    shutil.copy2(source, os.path.join(version_dir, file_name))
+            return registry.commit_version(
+                version_dir,
+                version,
+                {
+                    "parent": os.path.abspath(base_dir),
+                    "source": "incremental",
+                    "delta_file": os.path.abspath(delta_ratings_path),
+                    "delta_ratings": int(len(delta_df)),
+                    "touched_titles": int(len(rebuild_titles)),
+                    "new_titles": int(len(new_titles)),
+                    "new_users": int(len(new_users)),
+                    "n_titles": int(shape[0]),
+                    "n_users": int(shape[1]),
+                },
+            )
+
+        except Exception as e:
+            logging.error("Error occurred during Incremental Update")
+            raise CustomException(e, sys)
@@ -0,0 +1,409 @@
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import csr_matrix
+from src.components.blocked_neighbors import all_pairs_top_k
+from src.components.embedding_preparation import EmbeddingTrainer
+from src.components.model_preparation import ModelTrainer
+from src.components.neighbor_index import truncated_svd
+from src.components.neighbor_precomputation import NeighborPrecomputation
+from src.utils import load_object, save_json
+
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import instrument, instrumented
+
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+from dataclasses import dataclass
+
+# Inherited by the forked workers of _map_batches
+_state = {}
+
+
+def _map_batches(function, batches, n_jobs, **state):
+    """
+    Run ``function(start, stop)`` over row batches on a fork-based process pool.
+
+    The workers inherit ``state`` (the fitted model, the matrices) from the
+    parent's memory instead of receiving a pickled copy per batch.
+    """
+    _state.clear()
+    _state.update(state)
+    try:
+        n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(batches)))
+        if n_jobs == 1:
+            return [function(start, stop) for start, stop in batches]
+        with ProcessPoolExecutor(
+            max_workers=n_jobs, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            return list(executor.map(function, *zip(*batches)))
+    finally:
+        _state.clear()
+
+
+def _batches(n_rows, batch_size):
+    return [
+        (start, min(start + batch_size, n_rows))
+        for start in range(0, n_rows, batch_size)
+    ]
+
+
+def _neighbor_batch(start, stop):
+    """
+    Most similar titles of titles ``start:stop`` with one kneighbors call.
+    """
+    distances, indices = _state["model"].kneighbors(
+        _state["features"][start:stop], n_neighbors=_state["n_neighbors"]
+    )
+    return indices.astype(np.int32), distances.astype(np.float32)
+
+
+def _score_batch(start, stop):
+    """
+    Top-K titles and ranking metrics of users ``start:stop``.
+
+    Users are scored like ``recommend_for_user``: every training title votes for
+    its neighbors with the user's own rating times their similarity, training
+    titles are excluded and ties are broken by title row.
+    """
+    k = _state["k"]
+    train = _state["train"][start:stop]
+    test = _state["test"][start:stop]
+    scores = (train @ _state["similar"]).tocsr()
+    # Never recommend a title the user rated in the training split
+    scores = (scores - scores.multiply(train.astype(bool))).tocsr()
+    scores.eliminate_zeros()
+
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    recall, ndcg, recommended = [], [], []
+    for row in range(stop - start):
+        candidates = scores.indices[scores.indptr[row] : scores.indptr[row + 1]]
+        values = scores.data[scores.indptr[row] : scores.indptr[row + 1]]
+        keep = values > 0
+        candidates, values = candidates[keep], values[keep]
+        if len(candidates) > k:
+            # Keep every tie of the last kept score so ties are broken by row
+            top = values >= np.partition(values, len(values) - k)[len(values) - k]
+            candidates, values = candidates[top], values[top]
+        top_k = candidates[np.lexsort((candidates, -values))[:k]]
+
+        relevant = test.indices[test.indptr[row] : test.indptr[row + 1]]
+        hits = np.isin(top_k, relevant)
+        recall.append(hits.sum() / len(relevant))
+        ideal = discounts[: min(k, len(relevant))].sum()
+        ndcg.append(discounts[: len(top_k)][hits].sum() / ideal)
+        recommended.append(top_k)
+
+    return (
+        np.asarray(recall),
+        np.asarray(ndcg),
+        np.concatenate(recommended or [np.empty(0, dtype=np.int32)]),
+    )
+
+
+def holdout_split(user_matrix, holdout_fraction, min_user_ratings, max_users, seed):
+    """
+    Hold out a random share of the ratings of a sample of users.
+
+    Users with at least ``min_user_ratings`` ratings are eligible; up to
+    ``max_users`` of them are evaluated, each losing ``holdout_fraction`` of
+    their ratings (at least one) to the test split. Every other rating, of
+    evaluated users or not, stays in the training split.
+
+    Args:
+        user_matrix (csr_matrix): Ratings, one row per user.
+        holdout_fraction (float): Share of an evaluated user's ratings to hold out.
+        min_user_ratings (int): Ratings a user needs to be evaluated.
+        max_users (int | None): Maximum number of evaluated users; None for all.
+        seed (int): Seed of the user sample and of the held-out ratings.
+
+    Returns:
+        Tuple[csr_matrix, csr_matrix, np.ndarray]: Training and test ratings with
+        the shape of ``user_matrix``, and the sorted rows of the evaluated users.
+    """
+    rng = np.random.default_rng(seed)
+    counts = np.diff(user_matrix.indptr)
+    eligible = np.flatnonzero(counts >= min_user_ratings)
+    if max_users is not None and len(eligible) > max_users:
+        eligible = np.sort(rng.choice(eligible, size=max_users, replace=False))
+
+    n_test = np.zeros(user_matrix.shape[0], dtype=np.int64)
+    n_test[eligible] = np.maximum(
+        1, np.floor(holdout_fraction * counts[eligible]).astype(np.int64)
+    )
+
+    # Rank the ratings of every row in a random order; the first n_test are held out
+    rows = np.repeat(np.arange(user_matrix.shape[0]), counts)
+    order = np.lexsort((rng.random(user_matrix.nnz), rows))
+    ranks = np.empty(user_matrix.nnz, dtype=np.int64)
+    ranks[order] = np.arange(user_matrix.nnz) - user_matrix.indptr[rows[order]]
+    held_out = ranks < n_test[rows]
+
+    def subset(mask):
+        return csr_matrix(
+            (user_matrix.data[mask], (rows[mask], user_matrix.indices[mask])),
+            shape=user_matrix.shape,
+        )
+
+    return subset(~held_out), subset(held_out), eligible
+
+
+def title_count_matrix(train):
+    """
+    Title-by-user matrix of the training ratings holding the title rating counts.
+
+    This is the user-book matrix the transformation would build from the
+    training ratings alone: every entry holds the number of training ratings
+    of its title, so held-out ratings never reach the features.
+
+    Args:
+        train (csr_matrix): Training ratings, one row per user.
+
+    Returns:
+        csr_matrix: The ``(n_titles, n_users)`` title rating counts.
+    """
+    counts = np.bincount(train.indices, minlength=train.shape[1])
+    return csr_matrix(
+        (counts[train.indices].astype(np.float64), train.indices, train.indptr),
+        shape=train.shape,
+    ).T.tocsr()
+
+
+@dataclass
+class ModelEvaluationConfig:
+    """
+    Configuration class for the offline evaluation stage.
+
+    Attributes:
+        report_file_path (str): The file path to save the evaluation report, next
+            to the trained model.
+        k (int): Length of the recommendation lists scored by Recall@K and NDCG@K.
+        similar_titles (int): Neighbors each rated title votes for, like
+            ``USER_SIMILAR_TITLES`` when serving.
+        holdout_fraction (float): Share of an evaluated user's ratings held out.
+        min_user_ratings (int): Ratings a user needs to be evaluated.
+        max_users (int | None): Maximum number of evaluated users; None for all.
+        n_jobs (int | None): Worker processes; defaults to the CPU count.
+        query_batch_size (int): Titles per kneighbors call of the index engine.
+        user_batch_size (int): Users scored per batch.
+        seed (int): Seed of the held-out ratings.
+    """
+
+    report_file_path: str = os.path.join("artifacts", "evaluation_report.json")
+    k: int = 10
+    similar_titles: int = 20
+    holdout_fraction: float = 0.2
+    min_user_ratings: int = 5
+    max_users: int | None = 5000
+    n_jobs: int | None = None
+    query_batch_size: int = 256
+    user_batch_size: int = 256
+    seed: int = 42
+
+
+class ModelEvaluation:
+    """
+    Class for measuring the ranking quality and speed of the configured model.
+
+    The model settings are those of ``model_trainer`` and ``embedding_trainer``,
+    so backends, feature spaces and embedding ranks are compared by changing
+    their configurations before calling ``initiate_model_evaluation``. The
+    neighbor table is computed like the served one, with the engine and metric
+    ``neighbor_precomputation`` resolves for the model.
+    """
+
+    def __init__(self):
+        self.model_evaluation_config = ModelEvaluationConfig()
+        self.model_trainer = ModelTrainer()
+        self.embedding_trainer = EmbeddingTrainer()
+        self.neighbor_precomputation = NeighborPrecomputation()
+
+    def neighbor_table(self, model, features, n_neighbors):
+        """
+        Neighbor table of a fitted model, computed by its precomputation engine.
+
+        The blocked engine runs on ``n_jobs`` processes; the index engine's
+        kneighbors batches are spread over ``n_jobs`` processes instead of being
+        queried one after the other, with the same results.
+
+        Args:
+            model: The fitted neighbor index.
+            features (csr_matrix | np.ndarray): The rows the model was fitted on.
+            n_neighbors (int): Neighbors per title, the title itself included.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, str]: int32 neighbor indices, float32
+            distances (nearest first) and the engine that computed them.
+        """
+        config = self.model_evaluation_config
+        precomputation_config = (
+            self.neighbor_precomputation.neighbor_precomputation_config
+        )
+        engine, metric = self.neighbor_precomputation.resolve_engine(model)
+        if engine == "blocked":
+            neighbors, distances, _ = all_pairs_top_k(
+                features,
+                n_neighbors,
+                metric=metric,
+                memory_budget_mb=precomputation_config.memory_budget_mb,
+                n_jobs=config.n_jobs,
+            )
+            return neighbors, distances, engine
+
+        results = _map_batches(
+            _neighbor_batch,
+            _batches(features.shape[0], config.query_batch_size),
+            config.n_jobs,
+            model=model,
+            features=features,
+            n_neighbors=n_neighbors,
+        )
+        neighbors = np.concatenate([indices for indices, _ in results])
+        distances = np.concatenate([distances for _, distances in results])
+        return neighbors, distances, engine
+
+    @instrumented("model_evaluation")
+    def initiate_model_evaluation(self, user_rating_matrix):
+        """
+        Evaluate personalized recommendations on held-out ratings.
+
+        A per-user sample of the final ratings is held out, the configured index
+        is refitted on the title rating counts of the remaining ones only, the
+        neighbor table is computed like the served one, and every evaluated
+        user is recommended ``k`` titles from their own ratings of the titles
+        they kept. Neighbor computation and user scoring run on a process pool.
+
+        Args:
+            user_rating_matrix (str): Path to the sparse title-by-user matrix of
+                the users' own ratings.
+
+        Returns:
+            str: Path of the saved evaluation report.
+
+        Raises:
+            CustomException: If an exception occurs during the evaluation.
+        """
+        try:
+            config = self.model_evaluation_config
+            training_config = self.model_trainer.model_training_config
+
+            logging.info("Load the sparse matrix")
+            with instrument("load_matrix") as step:
+                user_matrix = csr_matrix(load_object(user_rating_matrix)).T.tocsr()
+                n_titles = user_matrix.shape[1]
+                step.rows_out = user_matrix.shape[0]
+
+            logging.info("Holding out a per-user sample of the ratings")
+            with instrument("holdout_split", rows_in=user_matrix.nnz) as step:
+                train, test, users = holdout_split(
+                    user_matrix,
+                    config.holdout_fraction,
+                    config.min_user_ratings,
+                    config.max_users,
+                    config.seed,
+                )
+                step.rows_out = test.nnz
+                step.extra = {"n_users": int(len(users))}
+            if len(users) == 0:
+                raise ValueError(
+                    f"No user has the {config.min_user_ratings} ratings "
+                    "needed to be evaluated."
+                )
+
+            # Same feature space and backend as the trained model, on the title
+            # rating counts of the training ratings only
+            train_book_matrix = title_count_matrix(train)
+            if training_config.feature_space == "embeddings":
+                logging.info("Factorizing the training ratings into title embeddings")
+                with instrument("embeddings", rows_in=n_titles):
+                    features = truncated_svd(
+                        train_book_matrix,
+                        self.embedding_trainer.embedding_training_config.rank,
+                    )[0]
+            else:
+                features = train_book_matrix
+            model = self.model_trainer._build_model()
+            logging.info(
+                f"Fitting the '{training_config.index_backend}' index "
+                "on the training ratings"
+            )
+            with instrument("fit", rows_in=n_titles):
+                model.fit(features)
+
+            logging.info("Computing the neighbor table of every title")
+            n_neighbors = min(config.similar_titles, n_titles)
+            with instrument("neighbor_queries", rows_in=n_titles) as step:
+                started = time.perf_counter()
+                neighbors, distances, engine = self.neighbor_table(
+                    model, features, n_neighbors
+                )
+                query_seconds = time.perf_counter() - started
+                step.rows_out = n_titles
+                step.extra = {"engine": engine}
+
+            # Votes of every title for its neighbors, 1 / (1 + distance) as served
+            similar = csr_matrix(
+                (
+                    (1 / (1 + distances)).ravel(),
+                    neighbors.ravel(),
+                    np.arange(0, n_titles * n_neighbors + 1, n_neighbors),
+                ),
+                shape=(n_titles, n_titles),
+            )
+
+            logging.info(f"Scoring {len(users)} users on their held-out ratings")
+            with instrument("score_users", rows_in=len(users)) as step:
+                started = time.perf_counter()
+                results = _map_batches(
+                    _score_batch,
+                    _batches(len(users), config.user_batch_size),
+                    config.n_jobs,
+                    train=train[users],
+                    test=test[users],
+                    similar=similar,
+                    k=config.k,
+                )
+                scoring_seconds = time.perf_counter() - started
+                recall = np.concatenate([result[0] for result in results])
+                ndcg = np.concatenate([result[1] for result in results])
+                recommended = np.concatenate([result[2] for result in results])
+                step.rows_out = len(recall)
+
+            report = {
+                "index_backend": training_config.index_backend,
+                "feature_space": training_config.feature_space,
+                "model": repr(model),
+                "neighbor_engine": engine,
+                "k": config.k,
+                "similar_titles": int(n_neighbors),
+                "holdout_fraction": config.holdout_fraction,
+                "min_user_ratings": config.min_user_ratings,
+                "seed": config.seed,
+                "n_users": int(len(users)),
+                "n_titles": int(n_titles),
+                "n_train_ratings": int(train.nnz),
+                "n_test_ratings": int(test.nnz),
+                "recall_at_k": float(recall.mean()),
+                "ndcg_at_k": float(ndcg.mean()),
+                "catalog_coverage": len(np.unique(recommended)) / n_titles,
+                "neighbor_queries_per_second": n_titles / query_seconds,
+                "users_per_second": len(users) / scoring_seconds,
+                "query_seconds": query_seconds,
+                "scoring_seconds": scoring_seconds,
+            }
+            if training_config.feature_space == "embeddings":
+                report["embedding_rank"] = int(features.shape[1])
+            logging.info(
+                f"Recall@{config.k}: {report['recall_at_k']:.4f}, "
+                f"NDCG@{config.k}: {report['ndcg_at_k']:.4f}, "
+                f"coverage: {report['catalog_coverage']:.4f}, "
+                f"{report['neighbor_queries_per_second']:.0f} queries/s"
+            )
+            save_json(file_path=config.report_file_path, obj=report)
+
+            return config.report_file_path
+        except Exception as e:
+            logging.error("Error occurred during Model Evaluation")
+            raise CustomException(e, sys)
@@ -1,12 +1,19 @@
 from sklearn.neighbors import NearestNeighbors
 from scipy.sparse import csr_matrix
-from src.utils import save_object, load_object
+from src.components.neighbor_index import (
+    build_index,
+    detach_index,
+    load_index_features,
+)
+from src.utils import save_object, load_object, save_csr_matrix, save_json
 
 from src.logger import logging
 from src.exception import CustomException
+from src.instrumentation import instrument, instrumented
 
 import os
 import sys
+import time
 import numpy as np
 import pandas as pd
 from dataclasses import dataclass
@@ -19,9 +26,35 @@ class ModelTrainerConfig:
 
     Attributes:
         train_model_file_path (str): The file path to save the trained model.
+        model_spec_file_path (str): The file path to save the model without its matrix.
+        book_matrix_file_prefix (str): Path prefix of the memory-mappable CSR matrix arrays.
+        user_matrix_file_prefix (str): Path prefix of the user-by-title CSR arrays of
+            the users' own ratings, used for personalized recommendations.
+        index_report_file_path (str): The file path to save the index recall report.
+        model_info_file_path (str): The file path to save the feature space and backend of the model.
+        feature_space (str): Rows the index searches, "sparse" (user-book matrix) or
+            "embeddings" (truncated-SVD title embeddings).
+        index_backend (str): Neighbor index engine, "brute" (exact) or "ivf" (approximate).
+        ivf_n_lists (int | None): Number of IVF inverted lists; defaults to sqrt(n_titles).
+        ivf_n_probe (int): Number of IVF lists scanned per query.
+        ivf_rank (int): Rank of the truncated-SVD embeddings the IVF lists are built on.
+        recall_k (int): K used for the Recall@K of the index against brute force.
+        recall_sample_size (int): Number of titles queried to estimate recall.
     """
 
     train_model_file_path: str = os.path.join("artifacts", "model.pkl")
+    model_spec_file_path: str = os.path.join("artifacts", "model_spec.pkl")
+    book_matrix_file_prefix: str = os.path.join("artifacts", "book_matrix")
+    user_matrix_file_prefix: str = os.path.join("artifacts", "user_matrix")
+    index_report_file_path: str = os.path.join("artifacts", "index_report.json")
+    model_info_file_path: str = os.path.join("artifacts", "model_info.json")
+    feature_space: str = "sparse"
+    index_backend: str = "brute"
+    ivf_n_lists: int | None = None
+    ivf_n_probe: int = 8
+    ivf_rank: int = 32
+    recall_k: int = 10
+    recall_sample_size: int = 1000
 
 
 class ModelTrainer:
@@ -35,12 +68,84 @@ class ModelTrainer:
     def __init__(self):
         self.model_training_config = ModelTrainerConfig()
 
-    def initiate_model_training(self, user_book_matrix):
+    def _build_model(self):
+        """
+        Create the unfitted neighbor index selected in the configuration.
+        """
+        config = self.model_training_config
+        if config.index_backend == "ivf":
+            return build_index(
+                "ivf",
+                n_lists=config.ivf_n_lists,
+                n_probe=config.ivf_n_probe,
+                rank=config.ivf_rank,
+            )
+        return build_index(config.index_backend)
+
+    def evaluate_recall(self, model, features):
+        """
+        Measure Recall@K and query speed of an index against brute force.
+
+        Args:
+            model: The fitted neighbor index to evaluate.
+            features (csr_matrix | np.ndarray): The rows the index was fitted on.
+
+        Returns:
+            dict: Backend name, Recall@K and per-query latency of both engines.
+        """
+        config = self.model_training_config
+        n_titles = features.shape[0]
+        k = min(config.recall_k, n_titles - 1)
+        rng = np.random.default_rng(42)
+        sample = rng.choice(
+            n_titles, size=min(config.recall_sample_size, n_titles), replace=False
+        )
+        queries = features[sample]
+
+        def timed_kneighbors(index):
+            start = time.perf_counter()
+            indices = index.kneighbors(queries, n_neighbors=k + 1)[1]
+            return indices, (time.perf_counter() - start) / len(sample)
+
+        exact_model = NearestNeighbors(algorithm="brute").fit(features)
+        exact, exact_latency = timed_kneighbors(exact_model)
+        if config.index_backend == "brute":
+            approximate, latency = exact, exact_latency
+        else:
+            approximate, latency = timed_kneighbors(model)
+
+        # Neighbors exclude the queried title itself
+        hits = [
+            len(np.intersect1d(found[found != row], truth[truth != row][:k]))
+            for row, found, truth in zip(sample, approximate, exact)
+        ]
+        return {
+            "index_backend": config.index_backend,
+            "feature_space": config.feature_space,
+            "model": repr(model),
+            "k": int(k),
+            "n_queries": int(len(sample)),
+            "recall_at_k": float(np.mean(hits) / k) if k else 1.0,
+            "query_latency_ms": latency * 1000,
+            "brute_query_latency_ms": exact_latency * 1000,
+        }
+
+    @instrumented("model_training")
+    def initiate_model_training(
+        self, user_book_matrix, user_rating_matrix, item_embeddings=None
+    ):
         """
         Train Nearest Neighbors models to find the best performing model.
 
         Args:
-            user_book_matrix (pkl): pivot table data array with features variable.
+            user_book_matrix (pkl): sparse user-book matrix with features variable.
+            user_rating_matrix (str): Path to the sparse title-by-user matrix of the
+                users' own ratings, saved transposed for personalized recommendations.
+            item_embeddings (str, optional): Path to the title embeddings, required
+                when the configured feature space is "embeddings".
+
+        Returns:
+            str: Path of the saved model file.
 
         Raises:
             CustomException: If an exception occurs during model training and evaluation.
@@ -48,28 +153,89 @@ class ModelTrainer:
         try:
             # Load the sparse matrix
             logging.info("Load the sparse matrix")
-            user_book_matrix = load_object(user_book_matrix)
+            with instrument("load_matrix") as step:
+                user_book_matrix = load_object(user_book_matrix)
+                step.rows_out = user_book_matrix.shape[0]
 
             logging.info("Creating a sparse matrix from the user-book matrix")
             # Creating a sparse matrix from the user-book matrix
-            sparse_user_book_matrix = csr_matrix(user_book_matrix)
+            with instrument("csr_matrix", rows_in=user_book_matrix.shape[0]) as step:
+                sparse_user_book_matrix = csr_matrix(user_book_matrix)
+                step.rows_out = sparse_user_book_matrix.shape[0]
+
+            # Selecting the rows the index searches over
+            if self.model_training_config.feature_space == "embeddings":
+                if item_embeddings is None:
+                    raise ValueError(
+                        "Feature space 'embeddings' requires the item embeddings path."
+                    )
+                logging.info("Loading the title embeddings as index features")
+                features = load_index_features(item_embeddings)
+            else:
+                features = sparse_user_book_matrix
 
             logging.info(
-                "Initializing the NearestNeighbors model with 'brute' algorithm"
+                "Initializing the neighbor index with the "
+                f"'{self.model_training_config.index_backend}' backend"
             )
-            # Initializing the NearestNeighbors model with 'brute' algorithm
-            nearest_neighbors_model = NearestNeighbors(algorithm="brute")
+            # Initializing the neighbor index selected in the configuration
+            nearest_neighbors_model = self._build_model()
 
-            # Fitting the model to the sparse user-book matrix
-            logging.info("Fitting the model to the sparse user-book matrix")
-            nearest_neighbors_model.fit(sparse_user_book_matrix)
+            # Fitting the model to the selected features
+            logging.info(
+                f"Fitting the model to the {self.model_training_config.feature_space} features"
+            )
+            with instrument("fit", rows_in=features.shape[0]):
+                nearest_neighbors_model.fit(features)
 
             logging.info(f"Best Model Found: {nearest_neighbors_model}")
 
-            # Save the best model
-            save_object(
-                file_path=self.model_training_config.train_model_file_path,
-                obj=nearest_neighbors_model,
+            # Reporting how well the index matches exact brute-force search
+            logging.info("Evaluating the index recall against brute force")
+            with instrument("evaluate_recall") as step:
+                index_report = self.evaluate_recall(nearest_neighbors_model, features)
+                step.rows_in = index_report["n_queries"]
+            logging.info(
+                f"Recall@{index_report['k']}: {index_report['recall_at_k']:.4f}, "
+                f"{index_report['query_latency_ms']:.3f} ms/query "
+                f"(brute force {index_report['brute_query_latency_ms']:.3f} ms/query)"
+            )
+            save_json(
+                file_path=self.model_training_config.index_report_file_path,
+                obj=index_report,
             )
+
+            with instrument("save_artifacts"):
+                # Save the best model
+                save_object(
+                    file_path=self.model_training_config.train_model_file_path,
+                    obj=nearest_neighbors_model,
+                )
+
+                # Memory-mappable serving format: the CSR arrays plus the model
+                # without its matrix, which is attached to the mapped arrays at load time
+                logging.info("Saving the sparse matrix arrays and the detached model")
+                save_csr_matrix(
+                    file_prefix=self.model_training_config.book_matrix_file_prefix,
+                    matrix=sparse_user_book_matrix,
+                )
+                # Ratings of every user, one contiguous row per user
+                save_csr_matrix(
+                    file_prefix=self.model_training_config.user_matrix_file_prefix,
+                    matrix=csr_matrix(load_object(user_rating_matrix)).T.tocsr(),
+                )
+                save_object(
+                    file_path=self.model_training_config.model_spec_file_path,
+                    obj=detach_index(nearest_neighbors_model),
+                )
+                save_json(
+                    file_path=self.model_training_config.model_info_file_path,
+                    obj={
+                        "feature_space": self.model_training_config.feature_space,
+                        "index_backend": self.model_training_config.index_backend,
+                    },
+                )
+
+            return self.model_training_config.train_model_file_path
         except Exception as e:
             raise CustomException(e, sys)
@@ -0,0 +1,438 @@
+from sklearn.base import clone
+from sklearn.metrics import pairwise_distances
+from sklearn.neighbors import NearestNeighbors
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import svds
+from src.utils import load_object, load_numpy_array
+
+import copy
+import numpy as np
+
+
+def truncated_svd(matrix, rank, random_state=42):
+    """
+    Factorize a sparse matrix into its top ``rank`` singular triplets.
+
+    Args:
+        matrix (scipy.sparse matrix): The matrix to factorize.
+        rank (int): Number of singular values to keep; clipped below the
+            smaller matrix dimension, as ``svds`` requires. Matrices with a
+            single row or column (or none) are factorized with a dense SVD
+            instead, keeping ``min(matrix.shape)`` singular values.
+        random_state (int): Seed of the solver's starting vector.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Row embeddings ``U * S`` of shape
+        (n_rows, rank) and the right singular vectors ``Vt`` of shape
+        (rank, n_columns), both float32 and ordered by decreasing singular value.
+    """
+    matrix = csr_matrix(matrix, dtype=np.float64)
+    rank = min(max(1, rank), min(matrix.shape) - 1)
+    if rank < 1:
+        u, s, vt = np.linalg.svd(matrix.toarray(), full_matrices=False)
+    else:
+        v0 = np.random.default_rng(random_state).uniform(-1, 1, min(matrix.shape))
+        u, s, vt = svds(matrix, k=rank, v0=v0)
+    order = np.argsort(s)[::-1]
+    embeddings = (u[:, order] * s[order]).astype(np.float32)
+    return embeddings, vt[order].astype(np.float32)
+
+
+def _squared_distances(points, centroids):
+    """
+    Squared Euclidean distances between two sets of dense vectors.
+    """
+    distances = (
+        np.einsum("ij,ij->i", points, points)[:, None]
+        - 2 * points @ centroids.T
+        + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    )
+    return np.maximum(distances, 0)
+
+
+def _kmeans(points, n_clusters, n_iter, rng):
+    """
+    Plain Lloyd's k-means; empty clusters keep their previous centroid.
+    """
+    centroids = points[rng.choice(len(points), size=n_clusters, replace=False)]
+    for _ in range(n_iter):
+        assignments = _squared_distances(points, centroids).argmin(axis=1)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, points)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+    return centroids
+
+
+class IVFIndex:
+    """
+    Approximate nearest neighbors with an inverted-file (IVF) coarse quantizer.
+
+    Titles are embedded with a truncated SVD of the user-book matrix and
+    clustered with k-means into ``n_lists`` inverted lists. A query only scans
+    the titles of its ``n_probe`` closest lists and ranks them by their exact
+    Euclidean distance in the original sparse space, so the distances match
+    the brute-force engine and only recall is traded for speed.
+
+    Exposes the ``fit`` / ``kneighbors`` interface of
+    ``sklearn.neighbors.NearestNeighbors``.
+    """
+
+    # Fixed cost of one more product, in scored (query, title) pairs: a batch
+    # is only scored list by list when that saves more pairs per list
+    list_overhead = 8192
+    # Values of the dense copy of a batch of query rows
+    max_dense_values = 1 << 22
+
+    def __init__(self, n_lists=None, n_probe=8, rank=32, n_iter=20, random_state=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.rank = rank
+        self.n_iter = n_iter
+        self.random_state = random_state
+
+    def __repr__(self):
+        return (
+            f"IVFIndex(n_lists={self.n_lists}, n_probe={self.n_probe}, "
+            f"rank={self.rank})"
+        )
+
+    def fit(self, X):
+        X = csr_matrix(X, dtype=np.float64)
+        rng = np.random.default_rng(self.random_state)
+        n_samples = X.shape[0]
+
+        embeddings, self.components_ = truncated_svd(
+            X, self.rank, random_state=self.random_state
+        )
+        n_lists = self.n_lists or int(np.sqrt(n_samples))
+        n_lists = max(1, min(n_lists, n_samples))
+        self.centroids_ = _kmeans(embeddings, n_lists, self.n_iter, rng)
+
+        assignments = _squared_distances(embeddings, self.centroids_).argmin(axis=1)
+        self._build_lists(assignments)
+        return self.attach(X)
+
+    def _build_lists(self, assignments):
+        """
+        Store the inverted lists as one array of title ids sorted by list, with
+        list_offsets_[i]:list_offsets_[i + 1] delimiting list i.
+        """
+        self.list_items_ = np.argsort(assignments, kind="stable").astype(np.int32)
+        self.list_offsets_ = np.concatenate(
+            ([0], np.cumsum(np.bincount(assignments, minlength=len(self.centroids_))))
+        )
+
+    def _project(self, X):
+        """
+        Embed rows with the fitted SVD components; columns added after fitting
+        (for example users that became active later) are ignored.
+        """
+        n_components = self.components_.shape[1]
+        return np.asarray(X[:, :n_components] @ self.components_.T, dtype=np.float32)
+
+    def reassign(self, rows):
+        """
+        Re-assign changed or appended rows of the attached matrix to their lists.
+
+        Args:
+            rows (array-like): Row ids whose vectors changed or were appended.
+
+        Returns:
+            IVFIndex: The updated index.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        assignments = np.full(self.n_samples_fit_, -1, dtype=np.intp)
+        assignments[self.list_items_] = np.repeat(
+            np.arange(len(self.centroids_)), np.diff(self.list_offsets_)
+        )
+        if len(rows):
+            assignments[rows] = _squared_distances(
+                self._project(self._fit_X[rows]), self.centroids_
+            ).argmin(axis=1)
+        self._build_lists(assignments)
+        return self
+
+    def attach(self, X):
+        """
+        Point the fitted index at the matrix it searches, without refitting.
+        """
+        self._fit_X = csr_matrix(X)
+        self._fit_sq_norms = np.asarray(
+            self._fit_X.multiply(self._fit_X).sum(axis=1)
+        ).ravel()
+        self.n_samples_fit_ = self._fit_X.shape[0]
+        return self
+
+    def _probe_counts(self, list_orders, n_neighbors):
+        """
+        Number of closest lists every query scans: ``n_probe``, or more until
+        they hold ``n_neighbors`` titles.
+        """
+        sizes = np.diff(self.list_offsets_)[list_orders]
+        enough = np.cumsum(sizes, axis=1) >= n_neighbors
+        needed = np.where(
+            enough.any(axis=1), enough.argmax(axis=1) + 1, list_orders.shape[1]
+        )
+        return np.maximum(needed, min(self.n_probe, list_orders.shape[1]))
+
+    def _score_pairs(
+        self,
+        queries_dense,
+        query_sq_norms,
+        queries,
+        lists,
+        columns,
+        distances,
+        candidates,
+    ):
+        """
+        Score (query, list) pairs with one product of the queries and the
+        titles of the lists, writing every list's distances to its query's row
+        of ``distances`` and ``candidates`` from the pair's column on.
+        """
+        block_queries, query_positions = np.unique(queries, return_inverse=True)
+        block_lists, list_positions = np.unique(lists, return_inverse=True)
+        starts = self.list_offsets_[block_lists]
+        lengths = self.list_offsets_[block_lists + 1] - starts
+        if lengths.sum() == 0:
+            return
+        block_starts = np.cumsum(lengths) - lengths
+        items = self.list_items_[
+            np.repeat(starts - block_starts, lengths) + np.arange(lengths.sum())
+        ]
+        products = (self._fit_X[items] @ queries_dense[block_queries].T).T
+        block_distances = np.maximum(
+            query_sq_norms[block_queries][:, None]
+            + self._fit_sq_norms[items][None, :]
+            - 2 * products,
+            0,
+        )
+
+        # One cell per pair and title of its list
+        pair_lengths = lengths[list_positions]
+        offsets = np.arange(pair_lengths.sum()) - np.repeat(
+            np.cumsum(pair_lengths) - pair_lengths, pair_lengths
+        )
+        rows = np.repeat(queries, pair_lengths)
+        cells = (rows, np.repeat(columns, pair_lengths) + offsets)
+        positions = np.repeat(block_starts[list_positions], pair_lengths) + offsets
+        distances[cells] = block_distances[
+            np.repeat(query_positions, pair_lengths), positions
+        ]
+        candidates[cells] = items[positions]
+
+    def _kneighbors_batch(self, X, n_neighbors):
+        """
+        Sorted distances and ids of the ``n_neighbors`` nearest titles of a
+        batch of query rows, scored against a dense copy of the batch.
+        """
+        n_queries = X.shape[0]
+        query_embeddings = self._project(X)
+        query_sq_norms = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+        list_orders = _squared_distances(query_embeddings, self.centroids_).argsort(
+            axis=1
+        )
+
+        # Column of the first title of every probed list in its query's row
+        probed = (
+            np.arange(list_orders.shape[1])[None, :]
+            < self._probe_counts(list_orders, n_neighbors)[:, None]
+        )
+        list_sizes = np.diff(self.list_offsets_)
+        sizes = np.where(probed, list_sizes[list_orders], 0)
+        columns = np.cumsum(sizes, axis=1) - sizes
+        width = max(int(sizes.sum(axis=1).max(initial=0)), n_neighbors)
+
+        pair_queries, pair_ranks = np.nonzero(probed)
+        pair_lists = list_orders[pair_queries, pair_ranks]
+        pair_columns = columns[pair_queries, pair_ranks]
+        probed_lists = np.unique(pair_lists)
+        union_cost = n_queries * list_sizes[probed_lists].sum()
+        per_list_cost = sizes.sum() + len(probed_lists) * self.list_overhead
+        if union_cost <= per_list_cost:
+            blocks = [np.arange(len(pair_lists))]
+        else:
+            order = np.argsort(pair_lists, kind="stable")
+            blocks = np.split(order, np.flatnonzero(np.diff(pair_lists[order])) + 1)
+
+        queries_dense = X.toarray()
+        candidate_distances = np.full((n_queries, width), np.inf)
+        candidates = np.zeros((n_queries, width), dtype=np.intp)
+        for block in blocks:
+            self._score_pairs(
+                queries_dense,
+                query_sq_norms,
+                pair_queries[block],
+                pair_lists[block],
+                pair_columns[block],
+                candidate_distances,
+                candidates,
+            )
+
+        top = np.argpartition(candidate_distances, n_neighbors - 1, axis=1)[
+            :, :n_neighbors
+        ]
+        top_distances = np.take_along_axis(candidate_distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind="stable")
+        indices = np.take_along_axis(
+            candidates, np.take_along_axis(top, order, axis=1), axis=1
+        )
+        return np.sqrt(np.take_along_axis(top_distances, order, axis=1)), indices
+
+    def kneighbors(self, X, n_neighbors=5, return_distance=True):
+        """
+        Nearest titles of query rows, scored in batches.
+
+        Every query's candidates fill one row of its batch, in the order its
+        lists are probed. A batch is scored with one product over the union of
+        its probed lists, or, when most of that product would be wasted, as
+        for large batches spread over most lists, with one product per list
+        against all the queries probing it. The top ``n_neighbors`` of all rows
+        of a batch are selected at once.
+        """
+        X = csr_matrix(X, dtype=np.float64)
+        n_neighbors = min(n_neighbors, self.n_samples_fit_)
+        batch_size = max(1, self.max_dense_values // max(X.shape[1], 1))
+        results = [
+            self._kneighbors_batch(X[start : start + batch_size], n_neighbors)
+            for start in range(0, max(X.shape[0], 1), batch_size)
+        ]
+        distances = np.vstack([batch_distances for batch_distances, _ in results])
+        indices = np.vstack([batch_indices for _, batch_indices in results])
+
+        if return_distance:
+            return distances, indices
+        return indices
+
+
+def build_index(backend, **params):
+    """
+    Create an unfitted neighbor index for a backend name.
+
+    Args:
+        backend (str): ``"brute"`` for exact sklearn brute-force search or
+            ``"ivf"`` for the approximate IVFIndex.
+        **params: Keyword arguments of the IVFIndex constructor.
+
+    Returns:
+        An object with the ``fit`` / ``kneighbors`` interface of NearestNeighbors.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend == "brute":
+        return NearestNeighbors(algorithm="brute")
+    if backend == "ivf":
+        return IVFIndex(**params)
+    raise ValueError(f"Unknown index backend '{backend}', expected 'brute' or 'ivf'.")
+
+
+def detach_index(model):
+    """
+    Return a copy of a fitted index without the matrix it searches.
+
+    The copy is small enough to pickle next to a memory-mapped matrix and is
+    turned back into a working index with ``attach_index``.
+    """
+    if isinstance(model, NearestNeighbors):
+        return clone(model)
+
+    detached = copy.copy(model)
+    for attribute in ("_fit_X", "_fit_sq_norms"):
+        detached.__dict__.pop(attribute, None)
+    return detached
+
+
+def attach_index(model, matrix):
+    """
+    Make a detached index search ``matrix`` without copying it.
+
+    Args:
+        model: An index returned by ``detach_index``.
+        matrix (scipy.sparse.csr_matrix): The matrix the index was fitted on.
+
+    Returns:
+        The ready-to-query index.
+    """
+    if isinstance(model, NearestNeighbors):
+        model.fit(matrix)
+        # Brute-force fit copies sparse input; point the model back at the
+        # given arrays so memory-mapped matrices stay shared between workers
+        model._fit_X = matrix
+        return model
+    return model.attach(matrix)
+
+
+def refresh_index(model, features, rows):
+    """
+    Point a fitted index at updated features, re-indexing only changed rows.
+
+    Args:
+        model: A fitted (or detached) neighbor index.
+        features (csr_matrix | np.ndarray): The updated rows to search over.
+        rows (array-like): Row ids that changed or were appended.
+
+    Returns:
+        The refreshed index, without refitting its learned parameters.
+    """
+    model = attach_index(detach_index(model), features)
+    if isinstance(model, IVFIndex):
+        model.reassign(rows)
+    return model
+
+
+def index_metric(model):
+    """
+    Name of the distance a fitted index ranks its neighbors by.
+
+    Args:
+        model: A fitted neighbor index.
+
+    Returns:
+        str: The metric name, e.g. "euclidean".
+    """
+    if isinstance(model, NearestNeighbors):
+        return model.effective_metric_
+    # IVFIndex ranks its candidates by exact Euclidean distance
+    return "euclidean"
+
+
+def index_distances(model, X, Y):
+    """
+    Distances between two sets of rows under the metric an index ranks by.
+
+    Args:
+        model: A fitted neighbor index.
+        X, Y (csr_matrix | np.ndarray): The rows to compare.
+
+    Returns:
+        np.ndarray: The ``(len(X), len(Y))`` distances.
+    """
+    if isinstance(model, NearestNeighbors):
+        return pairwise_distances(
+            X,
+            Y,
+            metric=model.effective_metric_,
+            **(model.effective_metric_params_ or {}),
+        )
+    # IVFIndex ranks its candidates by exact Euclidean distance
+    return pairwise_distances(X, Y, metric="euclidean")
+
+
+def load_index_features(file_path, mmap_mode=None):
+    """
+    Load the rows a neighbor index searches over.
+
+    Args:
+        file_path (str): A pickled user-book matrix (.pkl) or dense title
+            embeddings (.npy).
+        mmap_mode (str, optional): Memory-map mode for .npy embeddings.
+
+    Returns:
+        scipy.sparse.csr_matrix | np.ndarray: The index features.
+    """
+    if str(file_path).endswith(".npy"):
+        return load_numpy_array(file_path, mmap_mode=mmap_mode)
+    return csr_matrix(load_object(file_path))
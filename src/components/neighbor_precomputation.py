@@ -0,0 +1,221 @@
+from src.components.blocked_neighbors import all_pairs_top_k
+from src.components.neighbor_index import IVFIndex, index_metric, load_index_features
+from src.utils import load_object, save_json, save_numpy_array
+
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import instrument, instrumented
+
+import os
+import sys
+import time
+import numpy as np
+from dataclasses import dataclass
+
+
+@dataclass
+class NeighborPrecomputationConfig:
+    """
+    Configuration class for the neighbor precomputation stage.
+
+    Attributes:
+        neighbor_indices_file_path (str): The file path to save the neighbor row indices.
+        neighbor_distances_file_path (str): The file path to save the neighbor distances.
+        report_file_path (str): The file path to save the per-block time and
+            memory report.
+        top_k (int): Number of neighbors to keep per title, excluding the title itself.
+        engine (str | None): "blocked" for the exact parallel all-pairs engine, or
+            "index" to query the trained model (mirrors approximate backends such
+            as IVF). None follows the model: "index" for approximate backends,
+            "blocked" for exact ones.
+        metric (str | None): Distance of the table; must be the metric the model
+            ranks by, which None stands for. Serving, incremental merges and
+            live queries all use the model's metric.
+        memory_budget_mb (float): Memory budget of one block of the blocked engine.
+        n_jobs (int | None): Processes of the blocked engine; defaults to the CPU count.
+        batch_size (int): Number of titles queried per kneighbors call by the
+            index engine.
+    """
+
+    neighbor_indices_file_path: str = os.path.join("artifacts", "neighbor_indices.npy")
+    neighbor_distances_file_path: str = os.path.join(
+        "artifacts", "neighbor_distances.npy"
+    )
+    report_file_path: str = os.path.join(
+        "artifacts", "neighbor_precomputation_report.json"
+    )
+    top_k: int = 20
+    engine: str | None = None
+    metric: str | None = None
+    memory_budget_mb: float = 256
+    n_jobs: int | None = None
+    batch_size: int = 256
+
+
+class NeighborPrecomputation:
+    """
+    Class for precomputing the top-K neighbors of every title in the catalog.
+    """
+
+    def __init__(self):
+        self.neighbor_precomputation_config = NeighborPrecomputationConfig()
+
+    def resolve_engine(self, model):
+        """
+        Engine and metric of the neighbor table of a fitted model.
+
+        Args:
+            model: The fitted neighbor index the table is computed for.
+
+        Returns:
+            Tuple[str, str]: The configured engine, or the one following the
+            model's backend, and the model's metric.
+
+        Raises:
+            ValueError: If the engine is unknown or the configured metric is not
+                the model's.
+        """
+        config = self.neighbor_precomputation_config
+        metric = index_metric(model)
+        if config.metric is not None and config.metric != metric:
+            raise ValueError(
+                f"Metric '{config.metric}' does not match the '{metric}' "
+                "distance of the trained model."
+            )
+        engine = config.engine
+        if engine is None:
+            engine = "index" if isinstance(model, IVFIndex) else "blocked"
+        if engine not in ("blocked", "index"):
+            raise ValueError(
+                f"Unknown engine '{engine}', expected 'blocked' or 'index'."
+            )
+        return engine, metric
+
+    def _index_neighbors(self, model, features, n_neighbors):
+        """
+        Query the trained model for every title in blocks of ``batch_size``.
+        """
+        n_titles = features.shape[0]
+        batch_size = self.neighbor_precomputation_config.batch_size
+        neighbor_indices = np.empty((n_titles, n_neighbors), dtype=np.int32)
+        neighbor_distances = np.empty((n_titles, n_neighbors), dtype=np.float32)
+        for start in range(0, n_titles, batch_size):
+            stop = min(start + batch_size, n_titles)
+            distances, indices = model.kneighbors(
+                features[start:stop], n_neighbors=n_neighbors
+            )
+            neighbor_indices[start:stop] = indices
+            neighbor_distances[start:stop] = distances
+        return neighbor_indices, neighbor_distances
+
+    @instrumented("neighbor_precomputation")
+    def initiate_neighbor_precomputation(self, model_path, features_path):
+        """
+        Compute the nearest neighbors of every title.
+
+        The engine and the metric follow the trained model unless configured. The
+        "blocked" engine computes exact all-pairs distances in row blocks
+        sized by ``memory_budget_mb``, spread over ``n_jobs`` processes, keeping
+        only each block's top-K so the full titles x titles matrix is never
+        materialized; the time and peak memory of every block are saved as a
+        report. The "index" engine queries the trained model in blocks of
+        ``batch_size`` rows instead, so approximate backends keep the neighbors
+        their live queries return. The results are saved as an int32 index
+        table and a float32 distance table with ``top_k + 1`` columns, nearest
+        first (the queried title itself usually comes first).
+
+        Args:
+            model_path (str): Path to the trained nearest neighbors model.
+            features_path (str): Path to the features the model was fitted on, the
+                user-book matrix (.pkl) or the title embeddings (.npy).
+
+        Returns:
+            Tuple[str, str]: Paths of the neighbor indices and neighbor distances files.
+
+        Raises:
+            CustomException: If an exception occurs during neighbor precomputation,
+                including a configured metric other than the model's.
+        """
+        try:
+            config = self.neighbor_precomputation_config
+            logging.info("Loading the title features")
+            with instrument("load_features") as step:
+                features = load_index_features(features_path)
+                step.rows_out = features.shape[0]
+
+            n_titles = features.shape[0]
+            n_neighbors = min(config.top_k + 1, n_titles)
+
+            model = load_object(model_path)
+            engine, metric = self.resolve_engine(model)
+
+            started = time.perf_counter()
+            if engine == "blocked":
+                # The exact engine only needs the features
+                del model
+                logging.info(
+                    f"Computing {n_neighbors} exact {metric} neighbors for "
+                    f"{n_titles} titles in blocks of {config.memory_budget_mb} MB"
+                )
+                with instrument("all_pairs_top_k", rows_in=n_titles) as step:
+                    neighbor_indices, neighbor_distances, blocks = all_pairs_top_k(
+                        features,
+                        n_neighbors,
+                        metric=metric,
+                        memory_budget_mb=config.memory_budget_mb,
+                        n_jobs=config.n_jobs,
+                    )
+                    step.rows_out = len(neighbor_indices)
+                    step.extra = {"n_blocks": len(blocks)}
+                for block in blocks:
+                    logging.info(
+                        f"Block {block['block']} (rows {block['start']}:"
+                        f"{block['stop']}) took {block['seconds']:.3f} s, "
+                        f"peak {block['peak_mb']:.1f} MB "
+                        f"(process max RSS {block['max_rss_mb']:.1f} MB)"
+                    )
+            else:
+                logging.info(
+                    f"Querying the trained model for {n_neighbors} neighbors of "
+                    f"{n_titles} titles in batches of {config.batch_size}"
+                )
+                with instrument("index_neighbors", rows_in=n_titles) as step:
+                    neighbor_indices, neighbor_distances = self._index_neighbors(
+                        model, features, n_neighbors
+                    )
+                    step.rows_out = len(neighbor_indices)
+                blocks = []
+            elapsed = time.perf_counter() - started
+            logging.info(f"Neighbor precomputation took {elapsed:.3f} s")
+
+            logging.info("Saving the neighbor indices and distances")
+            save_numpy_array(
+                file_path=config.neighbor_indices_file_path,
+                array=neighbor_indices,
+            )
+            save_numpy_array(
+                file_path=config.neighbor_distances_file_path,
+                array=neighbor_distances,
+            )
+            save_json(
+                file_path=config.report_file_path,
+                obj={
+                    "engine": engine,
+                    "metric": metric,
+                    "n_titles": int(n_titles),
+                    "n_neighbors": int(n_neighbors),
+                    "memory_budget_mb": config.memory_budget_mb,
+                    "n_blocks": len(blocks),
+                    "seconds": elapsed,
+                    "blocks": blocks,
+                },
+            )
+
+            return (
+                config.neighbor_indices_file_path,
+                config.neighbor_distances_file_path,
+            )
+
+        except Exception as e:
+            logging.error("Error occurred during Neighbor Precomputation")
+            raise CustomException(e, sys)
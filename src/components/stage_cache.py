@@ -0,0 +1,353 @@
+from src.utils import load_json, save_json
+
+from src.logger import logging
+from src.exception import CustomException
+from src.instrumentation import instrument
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import dataclasses
+from dataclasses import dataclass
+
+
+def _is_under(path, directory):
+    path, directory = os.path.normpath(path), os.path.normpath(directory)
+    return path == directory or path.startswith(directory + os.sep)
+
+
+def _walk_files(path):
+    """
+    The path itself if it is a file, else every file under it, sorted.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+    )
+
+
+def _restore(result):
+    # JSON turns the tuples of paths stages return into lists
+    return tuple(result) if isinstance(result, list) else result
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """
+    SHA-256 of the content of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class StageCacheConfig:
+    """
+    Configuration class for the stage cache.
+
+    Attributes:
+        cache_dir (str): Directory of the cached outputs, one entry per stage and key.
+        manifests_dir (str): Directory of the manifests of the stages run in place.
+        artifacts_dir (str): Directory the stage configurations write to; their paths
+            under it are redirected into the cache entry of the run.
+        untracked_dirs (tuple): Sub-directories of ``artifacts_dir`` never recorded
+            as outputs of a stage run in place.
+        marker_file_name (str): File written last into a complete entry, with the
+            description of its key and the return value of the stage.
+        hashes_file_name (str): File of the manifests directory remembering the
+            content hash of every fingerprinted file with its size and mtime.
+        force (bool): Run every stage even when its key and outputs are unchanged.
+    """
+
+    cache_dir: str = os.path.join("artifacts", "cache")
+    manifests_dir: str = os.path.join("artifacts", "manifests")
+    artifacts_dir: str = "artifacts"
+    untracked_dirs: tuple = ("cache", "manifests", "versions")
+    marker_file_name: str = "stage.json"
+    hashes_file_name: str = "file_hashes.json"
+    force: bool = False
+
+
+class StageCache:
+    """
+    Class for running pipeline stages once per distinct input and configuration.
+
+    A stage run is keyed by a hash of its configuration fields and its inputs;
+    paths outside the cache are fingerprinted by the size and SHA-256 of their
+    files, so touching a file without changing it does not invalidate anything.
+    Hashes are remembered with the file's size and mtime and only recomputed
+    when these change.
+
+    ``run`` writes the outputs of a run into the cache entry of its key, so the
+    paths a cached stage returns name its key and the stages consuming them are
+    keyed by the whole chain of stages before them. ``run_in_place`` keeps the
+    stage's own output paths and records a manifest of its key and outputs
+    instead.
+    """
+
+    def __init__(self):
+        self.stage_cache_config = StageCacheConfig()
+        self._hashes = None
+
+    def _hashes_path(self):
+        config = self.stage_cache_config
+        return os.path.join(config.manifests_dir, config.hashes_file_name)
+
+    def _file_record(self, file_path):
+        """
+        ``[size, mtime_ns, sha256]`` of a file, hashed only if size or mtime changed.
+        """
+        if self._hashes is None:
+            hashes_path = self._hashes_path()
+            self._hashes = load_json(hashes_path) if os.path.exists(hashes_path) else {}
+        stat = os.stat(file_path)
+        record = self._hashes.get(file_path)
+        if record is None or record[:2] != [stat.st_size, stat.st_mtime_ns]:
+            record = [stat.st_size, stat.st_mtime_ns, file_digest(file_path)]
+            self._hashes[file_path] = record
+        return record
+
+    def _save_hashes(self):
+        if self._hashes is not None:
+            # Forget files that no longer exist
+            self._hashes = {
+                path: record
+                for path, record in self._hashes.items()
+                if os.path.exists(path)
+            }
+            save_json(file_path=self._hashes_path(), obj=self._hashes)
+
+    def _is_output(self, value):
+        config = self.stage_cache_config
+        return (
+            isinstance(value, str)
+            and _is_under(value, config.artifacts_dir)
+            and not _is_under(value, config.cache_dir)
+        )
+
+    def _fingerprint(self, value):
+        # Cached outputs are already named after the key of their stage
+        if (
+            isinstance(value, str)
+            and os.path.exists(value)
+            and not _is_under(value, self.stage_cache_config.cache_dir)
+        ):
+            return {
+                "path": value,
+                "files": [
+                    [os.path.relpath(file_path, value), size, digest]
+                    for file_path in _walk_files(value)
+                    for size, _, digest in [self._file_record(file_path)]
+                ],
+            }
+        return value
+
+    def describe(self, stage, configs, inputs, dependencies=()):
+        """
+        Everything the outputs of a stage run depend on, as JSON-serializable data.
+
+        Output paths of the configurations are left out: they only decide where
+        the outputs are written. Their field names are kept, so a stage that
+        gains an output runs again instead of returning its former result.
+        """
+        return {
+            "stage": stage,
+            "configs": [
+                {
+                    "class": type(config).__name__,
+                    **{
+                        field.name: self._fingerprint(getattr(config, field.name))
+                        for field in dataclasses.fields(config)
+                        if not self._is_output(getattr(config, field.name))
+                    },
+                    "outputs": [
+                        field.name
+                        for field in dataclasses.fields(config)
+                        if self._is_output(getattr(config, field.name))
+                    ],
+                }
+                for config in configs
+            ],
+            "inputs": [self._fingerprint(value) for value in inputs],
+            "dependencies": [self._fingerprint(value) for value in dependencies],
+        }
+
+    def key(self, description):
+        encoded = json.dumps(description, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    def _snapshot(self):
+        """
+        ``{path: (size, mtime_ns)}`` of the tracked files of the artifacts directory.
+        """
+        config = self.stage_cache_config
+        untracked = [
+            os.path.join(config.artifacts_dir, name) for name in config.untracked_dirs
+        ]
+        snapshot = {}
+        for root, dirs, names in os.walk(config.artifacts_dir):
+            dirs[:] = [
+                name for name in dirs if os.path.join(root, name) not in untracked
+            ]
+            for name in names:
+                file_path = os.path.join(root, name)
+                stat = os.stat(file_path)
+                snapshot[file_path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _outputs_intact(self, outputs):
+        for file_path, (size, _, digest) in outputs.items():
+            if not os.path.exists(file_path) or os.path.getsize(file_path) != size:
+                return False
+            if self._file_record(file_path)[2] != digest:
+                return False
+        return True
+
+    def run(self, stage, method, configs, *inputs):
+        """
+        Run a stage, or return the outputs of an earlier run with the same key.
+
+        On a miss, every output path of the configurations is moved under the
+        cache entry of the key before ``method`` runs, and the entry is marked
+        complete once it returns; an entry left incomplete by a failed run is
+        cleared and recomputed.
+
+        Args:
+            stage (str): Name of the stage, e.g. "data_transformation".
+            method (Callable): The stage's ``initiate_*`` method.
+            configs: The configuration dataclass the method reads, or a list of
+                them when it reads several.
+            *inputs: Positional arguments of ``method``.
+
+        Returns:
+            The return value of ``method``, tuples included.
+
+        Raises:
+            CustomException: If the stage fails.
+        """
+        try:
+            config = self.stage_cache_config
+            if dataclasses.is_dataclass(configs):
+                configs = [configs]
+            description = self.describe(stage, configs, inputs)
+            key = self.key(description)
+            entry_dir = os.path.join(config.cache_dir, stage, key)
+            marker_path = os.path.join(entry_dir, config.marker_file_name)
+            self._save_hashes()
+
+            if os.path.exists(marker_path) and not config.force:
+                logging.info(f"Reusing the cached outputs of {stage} ({key})")
+                with instrument(stage) as step:
+                    step.extra = {"reused": key}
+                return _restore(load_json(marker_path)["result"])
+
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            for stage_config in configs:
+                for field in dataclasses.fields(stage_config):
+                    value = getattr(stage_config, field.name)
+                    if self._is_output(value):
+                        setattr(
+                            stage_config,
+                            field.name,
+                            os.path.join(
+                                entry_dir, os.path.relpath(value, config.artifacts_dir)
+                            ),
+                        )
+
+            logging.info(f"Running {stage} into the cache entry {key}")
+            started = time.perf_counter()
+            result = method(*inputs)
+            save_json(
+                file_path=marker_path,
+                obj={
+                    **description,
+                    "key": key,
+                    "seconds": time.perf_counter() - started,
+                    "result": result,
+                },
+            )
+            return result
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def run_in_place(self, stage, method, configs, *inputs, dependencies=()):
+        """
+        Run a stage writing to its own output paths, unless nothing changed.
+
+        The stage is skipped when its manifest holds the same key and every
+        file it wrote last time still has the recorded content. Otherwise it
+        runs, and the files of the artifacts directory it created or modified
+        are recorded with their size, mtime and SHA-256 in
+        ``<manifests_dir>/<stage>.json``, with the fingerprints of its inputs.
+
+        Args:
+            stage (str): Name of the stage, e.g. "data_transformation".
+            method (Callable): The stage's ``initiate_*`` method.
+            configs: The configuration dataclass the method reads, or a list of
+                them when it reads several.
+            *inputs: Positional arguments of ``method``.
+            dependencies (Sequence[str]): Paths the stage reads without taking
+                them as arguments.
+
+        Returns:
+            The return value of ``method``, or the one recorded when skipped.
+
+        Raises:
+            CustomException: If the stage fails.
+        """
+        try:
+            config = self.stage_cache_config
+            if dataclasses.is_dataclass(configs):
+                configs = [configs]
+            description = self.describe(stage, configs, inputs, dependencies)
+            key = self.key(description)
+            manifest_path = os.path.join(config.manifests_dir, f"{stage}.json")
+
+            if os.path.exists(manifest_path) and not config.force:
+                manifest = load_json(manifest_path)
+                if manifest["key"] == key and self._outputs_intact(manifest["outputs"]):
+                    logging.info(
+                        f"Skipping {stage}: inputs and configuration unchanged"
+                    )
+                    self._save_hashes()
+                    with instrument(stage) as step:
+                        step.extra = {"reused": key}
+                    return _restore(manifest["result"])
+                os.remove(manifest_path)
+
+            before = self._snapshot()
+            started = time.perf_counter()
+            result = method(*inputs)
+            seconds = time.perf_counter() - started
+            outputs = {
+                file_path: self._file_record(file_path)
+                for file_path, stat in self._snapshot().items()
+                if before.get(file_path) != stat
+            }
+            save_json(
+                file_path=manifest_path,
+                obj={
+                    **description,
+                    "key": key,
+                    "seconds": seconds,
+                    "result": result,
+                    "input_files": {
+                        file_path: self._file_record(file_path)
+                        for value in (*inputs, *dependencies)
+                        if isinstance(value, str) and os.path.exists(value)
+                        for file_path in _walk_files(value)
+                    },
+                    "outputs": outputs,
+                },
+            )
+            self._save_hashes()
+            return result
+        except Exception as e:
+            raise CustomException(e, sys)
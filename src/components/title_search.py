@@ -0,0 +1,361 @@
+from sklearn.feature_extraction.text import HashingVectorizer
+from src.instrumentation import instrument, instrumented
+from src.utils import (
+    load_columnar_frame,
+    load_csr_matrix,
+    load_numpy_array,
+    load_object,
+    load_string_array,
+    save_csr_matrix,
+    save_numpy_array,
+    save_object,
+    save_string_array,
+)
+
+from src.logger import logging
+from src.exception import CustomException
+
+import os
+import re
+import sys
+import bisect
+import unicodedata
+import numpy as np
+from dataclasses import dataclass
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Files of a title search index, relative to its artifact directory
+TITLE_SEARCH_FILES = (
+    tuple(
+        f"{prefix}_{part}.npy"
+        for prefix in ("search_ngrams", "search_inverted")
+        for part in ("data", "indices", "indptr", "shape")
+    )
+    + tuple(
+        f"{prefix}_{part}.npy"
+        for prefix in ("search_titles", "search_keys")
+        for part in ("blob", "offsets")
+    )
+    + ("search_key_rows.npy", "title_search.pkl")
+)
+
+
+def normalize_title(title):
+    """
+    Search key of a title: case-folded, accents stripped, punctuation removed
+    and whitespace collapsed ("L'Étranger!" -> "l etranger").
+    """
+    decomposed = unicodedata.normalize("NFKD", title.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_NON_WORD.sub(" ", stripped).split())
+
+
+def _ngram_vectorizer(n_features, ngram_size):
+    # Binary, unweighted n-grams of every word padded with spaces
+    return HashingVectorizer(
+        analyzer="char_wb",
+        ngram_range=(ngram_size, ngram_size),
+        preprocessor=normalize_title,
+        n_features=n_features,
+        binary=True,
+        norm=None,
+        alternate_sign=False,
+        dtype=np.float32,
+    )
+
+
+class TitleSearchIndex:
+    """
+    Prefix completion and typo-tolerant matching of catalog titles.
+
+    Prefix queries bisect the sorted search keys of the titles. Fuzzy queries
+    score titles by the Dice coefficient of their character n-grams,
+    ``2 * shared / (query n-grams + title n-grams)``, through an inverted index
+    of the hashed n-grams, so only titles sharing an n-gram with the query are
+    touched.
+
+    Args:
+        titles (Sequence[str]): Title of every row.
+        keys (Sequence[str]): Sorted search keys of the titles.
+        key_rows (np.ndarray): Title row of every sorted key.
+        ngrams (csr_matrix): Binary n-gram rows of the titles.
+        inverted (csr_matrix): ``ngrams.T`` in CSR layout.
+        n_features (int): Number of hashed n-gram columns.
+        ngram_size (int): Length of the character n-grams.
+    """
+
+    def __init__(
+        self, titles, keys, key_rows, ngrams, inverted, n_features, ngram_size
+    ):
+        self.titles = titles
+        self.keys = keys
+        self.key_rows = key_rows
+        self.ngrams = ngrams
+        self.inverted = inverted
+        self.ngram_counts = np.diff(ngrams.indptr)
+        self._vectorizer = _ngram_vectorizer(n_features, ngram_size)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _prefix_range(self, key):
+        low = bisect.bisect_left(self.keys, key)
+        high = bisect.bisect_left(self.keys, key + "\U0010ffff", lo=low)
+        return low, high
+
+    def prefix(self, query, limit=10):
+        """
+        Titles whose search key starts with the query's.
+
+        Returns:
+            list[tuple[int, float]]: Up to ``limit`` ``(row, score)`` pairs,
+            shortest titles first; the score is the share of the title's key
+            the query covers (1.0 for an exact match).
+        """
+        key = normalize_title(query)
+        if not key:
+            return []
+        low, high = self._prefix_range(key)
+        if low == high:
+            return []
+        lengths = np.diff(self.keys.offsets[low : high + 1])
+        positions = np.arange(high - low)
+        if len(positions) > limit:
+            top = np.argpartition(lengths, limit - 1)[:limit]
+            lengths, positions = lengths[top], positions[top]
+        order = np.lexsort((positions, lengths))
+        rows = self.key_rows[low:high][positions[order]]
+        key_length = len(key.encode("utf-8"))
+        return [
+            (int(row), key_length / int(length))
+            for row, length in zip(rows, lengths[order])
+        ]
+
+    def fuzzy(
+        self, query, limit=10, min_similarity=0.3, max_postings=20000, n_candidates=256
+    ):
+        """
+        Titles most similar to the query by character n-grams.
+
+        Candidates are gathered from the posting lists of the query's rarest
+        n-grams, up to ``max_postings`` postings, so common n-grams ("the",
+        "ing") never make a query scan most of the catalog. The
+        ``n_candidates`` sharing most of these n-grams are then scored exactly
+        from their own n-gram rows.
+
+        Returns:
+            list[tuple[int, float]]: Up to ``limit`` ``(row, score)`` pairs
+            reaching ``min_similarity``, by decreasing Dice coefficient (ties by
+            row).
+        """
+        vector = self._vectorizer.transform([query])
+        size = vector.nnz
+        if size == 0:
+            return []
+        indptr, postings = self.inverted.indptr, self.inverted.indices
+        frequencies = indptr[vector.indices + 1] - indptr[vector.indices]
+        order = np.argsort(frequencies, kind="stable")
+        n_rare = max(
+            1,
+            np.searchsorted(np.cumsum(frequencies[order]), max_postings, side="right"),
+        )
+        rare = [
+            postings[indptr[column] : indptr[column + 1]]
+            for column in vector.indices[order[:n_rare]]
+        ]
+        candidates, shared = np.unique(
+            np.concatenate(rare)[:max_postings], return_counts=True
+        )
+        if len(candidates) > n_candidates:
+            partial = shared / (size + self.ngram_counts[candidates])
+            top = np.argpartition(-partial, n_candidates - 1)[:n_candidates]
+            candidates = np.sort(candidates[top])
+
+        # Exact shared n-gram counts from the candidates' own rows
+        starts = self.ngrams.indptr[candidates]
+        lengths = self.ngrams.indptr[candidates + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        hits = np.isin(self.ngrams.indices[positions], vector.indices)
+        shared = np.add.reduceat(hits, offsets)
+
+        scores = 2 * shared / (size + lengths)
+        close = scores >= min_similarity
+        candidates, scores = candidates[close], scores[close]
+        if len(candidates) > limit:
+            # Keep every tie of the limit-th score so ties are broken by row
+            top = scores >= np.partition(scores, len(scores) - limit)[-limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))[:limit]
+        return [
+            (int(row), float(score))
+            for row, score in zip(candidates[order], scores[order])
+        ]
+
+    def search(self, query, limit=10):
+        """
+        Typeahead results of a query: prefix completions, then fuzzy matches.
+
+        Returns:
+            list[dict]: Up to ``limit`` results with the ``title``, its
+            ``match`` kind ("prefix" or "fuzzy") and its ``score`` in [0, 1].
+        """
+        results = [
+            {"title": self.titles[row], "match": "prefix", "score": score}
+            for row, score in self.prefix(query, limit)
+        ]
+        if len(results) < limit:
+            seen = {result["title"] for result in results}
+            for row, score in self.fuzzy(query, limit):
+                title = self.titles[row]
+                if title not in seen:
+                    results.append({"title": title, "match": "fuzzy", "score": score})
+                    if len(results) == limit:
+                        break
+        return results
+
+    def resolve(self, query, min_similarity=0.6):
+        """
+        Catalog title a near-miss query most likely refers to.
+
+        A title with the same search key (differing only in case, accents or
+        punctuation) wins; otherwise the best fuzzy match, if its Dice
+        coefficient reaches ``min_similarity``.
+
+        Returns:
+            str | None: The matched title, or None when nothing is close enough.
+        """
+        key = normalize_title(query)
+        if not key:
+            return None
+        low = bisect.bisect_left(self.keys, key)
+        if low < len(self.keys) and self.keys[low] == key:
+            return self.titles[int(self.key_rows[low])]
+        matches = self.fuzzy(query, limit=1, min_similarity=min_similarity)
+        return self.titles[matches[0][0]] if matches else None
+
+
+def load_title_search(artifact_dir, mmap_mode="r"):
+    """
+    Load the title search index of an artifact directory.
+
+    Returns:
+        TitleSearchIndex | None: The index, or None if it has not been built.
+    """
+    settings_path = os.path.join(artifact_dir, "title_search.pkl")
+    if not os.path.exists(settings_path):
+        logging.warning(f"Title search index missing in {artifact_dir}, skipping")
+        return None
+    return TitleSearchIndex(
+        titles=load_string_array(
+            os.path.join(artifact_dir, "search_titles"), mmap_mode=mmap_mode
+        ),
+        keys=load_string_array(
+            os.path.join(artifact_dir, "search_keys"), mmap_mode=mmap_mode
+        ),
+        key_rows=load_numpy_array(
+            os.path.join(artifact_dir, "search_key_rows.npy"), mmap_mode=mmap_mode
+        ),
+        ngrams=load_csr_matrix(
+            os.path.join(artifact_dir, "search_ngrams"), mmap_mode=mmap_mode
+        ),
+        inverted=load_csr_matrix(
+            os.path.join(artifact_dir, "search_inverted"), mmap_mode=mmap_mode
+        ),
+        **load_object(settings_path),
+    )
+
+
+@dataclass
+class TitleSearchConfig:
+    """
+    Configuration class for the title search index.
+
+    Attributes:
+        artifacts_dir (str): Directory the index files are written to.
+        n_features (int): Number of hashed n-gram columns.
+        ngram_size (int): Length of the character n-grams.
+    """
+
+    artifacts_dir: str = "artifacts"
+    n_features: int = 2**20
+    ngram_size: int = 3
+
+
+class TitleSearchTrainer:
+    """
+    Class for building the title search index of every catalog title.
+    """
+
+    def __init__(self):
+        self.title_search_config = TitleSearchConfig()
+
+    @instrumented("title_search")
+    def initiate_title_search(self, books_data_path):
+        """
+        Build the prefix and n-gram search index of the catalog titles.
+
+        It covers every title of the books data, like the content index, since
+        every catalog title can be recommended.
+
+        Args:
+            books_data_path (str): Directory of the columnar books data.
+
+        Returns:
+            str: Directory the index was written to.
+
+        Raises:
+            CustomException: If an exception occurs while building the index.
+        """
+        try:
+            config = self.title_search_config
+            artifacts_dir = config.artifacts_dir
+
+            logging.info("Reading the titles for the title search index")
+            with instrument("read_titles") as step:
+                titles = (
+                    load_columnar_frame(books_data_path, columns=["title"])["title"]
+                    .dropna()
+                    .drop_duplicates()
+                    .tolist()
+                )
+                step.rows_out = len(titles)
+
+            logging.info(f"Indexing {len(titles)} titles for search")
+            with instrument("sort_keys", rows_in=len(titles)):
+                keys = [normalize_title(title) for title in titles]
+                key_rows = np.array(
+                    sorted(range(len(keys)), key=keys.__getitem__), dtype=np.int32
+                )
+
+            with instrument("ngrams", rows_in=len(titles)) as step:
+                vectorizer = _ngram_vectorizer(config.n_features, config.ngram_size)
+                ngrams = vectorizer.transform(titles).tocsr()
+                inverted = ngrams.T.tocsr()
+                step.extra = {"nnz": int(ngrams.nnz)}
+
+            logging.info("Saving the title search index")
+            with instrument("save_artifacts"):
+                save_string_array(os.path.join(artifacts_dir, "search_titles"), titles)
+                save_string_array(
+                    os.path.join(artifacts_dir, "search_keys"),
+                    [keys[row] for row in key_rows],
+                )
+                save_numpy_array(
+                    os.path.join(artifacts_dir, "search_key_rows.npy"), key_rows
+                )
+                save_csr_matrix(os.path.join(artifacts_dir, "search_ngrams"), ngrams)
+                save_csr_matrix(
+                    os.path.join(artifacts_dir, "search_inverted"), inverted
+                )
+                save_object(
+                    os.path.join(artifacts_dir, "title_search.pkl"),
+                    {"n_features": config.n_features, "ngram_size": config.ngram_size},
+                )
+
+            return artifacts_dir
+
+        except Exception as e:
+            logging.error("Error occurred during Title Search building")
+            raise CustomException(e, sys)
@@ -0,0 +1,328 @@
+"""
+Structured timing and memory instrumentation of pipeline steps.
+
+Components wrap their named steps in ``instrument``:
+
+    with instrument("merge_books", rows_in=len(ratings_df)) as step:
+        merged = ratings_df.merge(books_df, on="ISBN")
+        step.rows_out = len(merged)
+
+and whole stages with the ``instrumented`` decorator. Each step records its
+wall time, CPU time (of this process and of reaped worker processes), its peak
+resident memory above the resident memory it started with (sampled by a
+background thread), the peak Python-tracked memory it allocated (when memory
+tracing is on), the process max RSS and its input/output row counts.
+Nested steps are named after their parents ("data_transformation/merge_books").
+The steps of a run are collected by ``run_recorder`` and saved as a JSON run
+report.
+"""
+
+import functools
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.logger import logging
+from src.utils import save_json
+
+# Set INSTRUMENT_TRACE_MEMORY=1 to track peak memory with tracemalloc; it is off
+# by default because it slows down code allocating many small Python objects
+TRACE_MEMORY = os.environ.get("INSTRUMENT_TRACE_MEMORY", "0") != "0"
+
+# Seconds between two samples of the resident memory while steps run
+RSS_SAMPLE_SECONDS = float(os.environ.get("INSTRUMENT_RSS_SAMPLE_SECONDS", "0.01"))
+
+
+def max_rss_mb():
+    """
+    Maximum resident set size this process reached, in MB.
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return max_rss / 1e6
+    return max_rss / 1e3
+
+
+def _rss_mb():
+    """
+    Current resident set size of this process in MB.
+
+    Read from ``/proc``; where it is unavailable, the process max RSS stands in,
+    so a step's peak is how far it raised the process high-water mark.
+    """
+    try:
+        with open("/proc/self/statm") as file_obj:
+            pages = int(file_obj.read().split()[1])
+    except OSError:
+        return max_rss_mb()
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def _children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class StepMetrics:
+    """
+    Measurements of one instrumented step.
+
+    ``rows_in`` and ``rows_out`` may be set inside the ``with`` block once the
+    step's input and output sizes are known; any other detail worth reporting
+    goes into ``extra``.
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.extra = {}
+        self.status = "running"
+        self.error = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.children_cpu_seconds = None
+        self.peak_mb = None
+        self.traced_peak_mb = None
+        self.memory_delta_mb = None
+        self.max_rss_mb = None
+        # Absolute resident and tracemalloc sizes while the step runs
+        self._rss_start = 0.0
+        self._rss_peak = 0.0
+        self._traced_start = 0
+        self._traced_peak = 0
+
+    def as_dict(self):
+        metrics = {
+            "name": self.name,
+            "status": self.status,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "children_cpu_seconds": self.children_cpu_seconds,
+            "peak_mb": self.peak_mb,
+            "traced_peak_mb": self.traced_peak_mb,
+            "memory_delta_mb": self.memory_delta_mb,
+            "max_rss_mb": self.max_rss_mb,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+        }
+        if self.extra:
+            metrics["extra"] = self.extra
+        if self.error is not None:
+            metrics["error"] = self.error
+        return metrics
+
+
+class RunRecorder:
+    """
+    Collects the instrumented steps of one pipeline run.
+
+    Args:
+        trace_memory (bool): Track the peak memory of every step with tracemalloc.
+        rss_sample_seconds (float): Interval between two samples of the resident
+            memory while steps run.
+    """
+
+    def __init__(
+        self, trace_memory=TRACE_MEMORY, rss_sample_seconds=RSS_SAMPLE_SECONDS
+    ):
+        self.trace_memory = trace_memory
+        self.rss_sample_seconds = rss_sample_seconds
+        self._sampler = None
+        self._sampler_stopped = threading.Event()
+        # Forked workers do not inherit the sampler thread
+        os.register_at_fork(after_in_child=self._forget_sampler)
+        self.start_run()
+
+    def start_run(self, name="run"):
+        """
+        Forget the recorded steps and start a new run.
+        """
+        self.name = name
+        self.steps = []
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._started = time.perf_counter()
+        self._stack = []
+        self._owns_tracing = False
+
+    def _sample_rss(self):
+        # Raise the resident peak of every running step until the outermost ends
+        while not self._sampler_stopped.wait(self.rss_sample_seconds):
+            rss = _rss_mb()
+            for metrics in list(self._stack):
+                metrics._rss_peak = max(metrics._rss_peak, rss)
+
+    def _forget_sampler(self):
+        self._sampler = None
+        self._sampler_stopped = threading.Event()
+
+    def _start_sampler(self):
+        self._sampler_stopped.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_rss, name="instrument-rss", daemon=True
+        )
+        self._sampler.start()
+
+    def _stop_sampler(self):
+        self._sampler_stopped.set()
+        self._sampler.join()
+        self._sampler = None
+
+    @contextmanager
+    def step(self, name, rows_in=None):
+        """
+        Measure the enclosed block as the step ``name``.
+
+        Yields:
+            StepMetrics: The step's metrics, to set ``rows_in``/``rows_out`` on.
+        """
+        parent = self._stack[-1] if self._stack else None
+        metrics = StepMetrics(
+            f"{parent.name}/{name}" if parent is not None else name, rows_in
+        )
+        self.steps.append(metrics)
+        metrics._rss_start = metrics._rss_peak = _rss_mb()
+
+        tracing = self.trace_memory
+        if tracing and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        if tracing:
+            # Fold the parent's peak so far before resetting it for this step
+            if parent is not None:
+                parent._traced_peak = max(
+                    parent._traced_peak, tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+            metrics._traced_start = metrics._traced_peak = (
+                tracemalloc.get_traced_memory()[0]
+            )
+
+        self._stack.append(metrics)
+        if self._sampler is None:
+            self._start_sampler()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        children_cpu_started = _children_cpu_seconds()
+        try:
+            yield metrics
+            metrics.status = "ok"
+        except BaseException as e:
+            metrics.status = "failed"
+            metrics.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            metrics.wall_seconds = time.perf_counter() - started
+            metrics.cpu_seconds = time.process_time() - cpu_started
+            metrics.children_cpu_seconds = (
+                _children_cpu_seconds() - children_cpu_started
+            )
+            metrics.max_rss_mb = max_rss_mb()
+            self._stack.pop()
+            if not self._stack:
+                self._stop_sampler()
+            rss_peak = max(metrics._rss_peak, _rss_mb())
+            metrics.peak_mb = rss_peak - metrics._rss_start
+            if parent is not None:
+                parent._rss_peak = max(parent._rss_peak, rss_peak)
+
+            # Another user (e.g. the blocked neighbor engine) may have stopped it
+            if tracing and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(metrics._traced_peak, peak)
+                metrics.traced_peak_mb = (peak - metrics._traced_start) / 1e6
+                metrics.memory_delta_mb = (current - metrics._traced_start) / 1e6
+                if parent is not None:
+                    parent._traced_peak = max(parent._traced_peak, peak)
+            if tracing and not self._stack and self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+
+            logging.info(
+                f"Step {metrics.name} {metrics.status} in "
+                f"{metrics.wall_seconds:.3f} s (CPU {metrics.cpu_seconds:.3f} s"
+                + f", peak {metrics.peak_mb:.1f} MB"
+                + (
+                    f", traced peak {metrics.traced_peak_mb:.1f} MB"
+                    if metrics.traced_peak_mb is not None
+                    else ""
+                )
+                + f", max RSS {metrics.max_rss_mb:.1f} MB"
+                + (
+                    f", rows {metrics.rows_in} -> {metrics.rows_out}"
+                    if metrics.rows_in is not None or metrics.rows_out is not None
+                    else ""
+                )
+                + ")"
+            )
+
+    def report(self):
+        """
+        Return the run as a JSON-serializable dict.
+        """
+        failed = any(step.status == "failed" for step in self.steps)
+        return {
+            "run": self.name,
+            "started_at": self.started_at,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "status": "failed" if failed else "ok",
+            "wall_seconds": time.perf_counter() - self._started,
+            "max_rss_mb": max_rss_mb(),
+            "trace_memory": self.trace_memory,
+            "pid": os.getpid(),
+            "python": sys.version.split()[0],
+            "steps": [step.as_dict() for step in self.steps],
+        }
+
+    def save(self, file_path):
+        """
+        Save the run report as JSON.
+
+        Args:
+            file_path (str): Path of the report file.
+        """
+        save_json(file_path=file_path, obj=self.report())
+        logging.info(f"Run report saved to {file_path}")
+
+
+# Recorder shared by every component of the running pipeline
+run_recorder = RunRecorder()
+
+
+def instrument(name, rows_in=None):
+    """
+    Context manager measuring a named step of the current run.
+
+    Args:
+        name (str): Step name, prefixed with the enclosing step's name.
+        rows_in (int, optional): Number of input rows, if known upfront.
+
+    Returns:
+        ContextManager[StepMetrics]: Yields the step's metrics.
+    """
+    return run_recorder.step(name, rows_in=rows_in)
+
+
+def instrumented(name=None):
+    """
+    Decorator measuring every call of a function as one step.
+
+    Args:
+        name (str, optional): Step name; defaults to the function name.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with instrument(name or function.__name__):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,36 @@
+"""
+Incremental training pipeline.
+
+Folds a file of new ratings into the latest artifact set and writes a new
+versioned artifact set under ./artifacts/versions, recomputing neighbors only
+for the titles the new ratings touched. Run the full training pipeline first.
+"""
+
+import argparse
+
+from src.components.incremental_update import IncrementalUpdate
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description="Refresh the recommendation artifacts with new ratings."
+    )
+    parser.add_argument(
+        "--delta",
+        required=True,
+        help="Ratings file with the new ratings, in the raw ratings.csv format.",
+    )
+    parser.add_argument(
+        "--base",
+        default=None,
+        help="Artifact set to update (defaults to the latest version).",
+    )
+    args = parser.parse_args()
+
+    incremental_update = IncrementalUpdate()
+    version_dir = incremental_update.initiate_incremental_update(args.delta, args.base)
+    print(f"New artifact version written to {version_dir}")
+
+
+if __name__ == "__main__":
+    run()
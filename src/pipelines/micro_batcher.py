@@ -0,0 +1,196 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(RuntimeError):
+    """
+    Raised when the scoring executor already holds ``max_queue_size`` requests.
+    """
+
+
+class ScoringCancelledError(RuntimeError):
+    """
+    Raised for requests whose batch was cancelled, or never sent, because the
+    scoring executor shut down.
+    """
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent recommendation requests into vectorized batch calls.
+
+    Requests submitted from the event loop are grouped by number of
+    recommendations; a group is flushed ``max_wait_ms`` after its first request
+    or as soon as it holds ``max_batch_size`` requests, and scored with a single
+    ``batch_fn`` call on a dedicated thread pool, so the event loop never runs
+    neighbor search itself. At most ``max_queue_size`` requests may be waiting
+    or running; beyond that ``submit`` and ``run`` fail fast with QueueFullError.
+    Requests still waiting when the batcher shuts down fail with
+    ScoringCancelledError.
+
+    Args:
+        batch_fn (callable): ``batch_fn(titles, n_recommendations)`` returning one
+            result per title, or the exception to raise for that title.
+        max_workers (int): Threads of the scoring executor.
+        max_queue_size (int): Maximum number of requests waiting or running.
+        max_batch_size (int): Maximum number of requests per batch call.
+        max_wait_ms (float): How long the first request of a batch waits for others.
+    """
+
+    def __init__(
+        self,
+        batch_fn,
+        max_workers=4,
+        max_queue_size=256,
+        max_batch_size=64,
+        max_wait_ms=2.0,
+    ):
+        self.batch_fn = batch_fn
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scoring"
+        )
+        self._pending = {}
+        self._flush_handles = {}
+        self.in_flight = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.rejected = 0
+
+    async def submit(self, title, n_recommendations):
+        """
+        Score one title as part of the next batch and return its result.
+
+        Raises:
+            QueueFullError: If ``max_queue_size`` requests are already queued.
+            ScoringCancelledError: If the batcher shut down before scoring it.
+            Exception: The exception ``batch_fn`` returned for this title.
+        """
+        self._reserve()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(self._release)
+
+        batch = self._pending.setdefault(n_recommendations, [])
+        batch.append((title, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(n_recommendations)
+        elif n_recommendations not in self._flush_handles:
+            self._flush_handles[n_recommendations] = loop.call_later(
+                self.max_wait_ms / 1000, self._flush, n_recommendations
+            )
+        return await future
+
+    async def run(self, fn, *args):
+        """
+        Run a single ``fn(*args)`` call on the scoring executor, outside any batch.
+
+        The call counts toward ``max_queue_size`` like a batched request.
+
+        Raises:
+            QueueFullError: If ``max_queue_size`` requests are already queued.
+        """
+        self._reserve()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+        finally:
+            self._release()
+
+    def _reserve(self):
+        if self.in_flight >= self.max_queue_size:
+            self.rejected += 1
+            raise QueueFullError(
+                f"Scoring queue is full ({self.max_queue_size} requests)."
+            )
+        self.in_flight += 1
+
+    def _release(self, _=None):
+        self.in_flight -= 1
+
+    def _flush(self, n_recommendations):
+        """
+        Send the pending group of ``n_recommendations`` to the executor.
+        """
+        handle = self._flush_handles.pop(n_recommendations, None)
+        if handle is not None:
+            handle.cancel()
+        batch = [
+            (title, future)
+            for title, future in self._pending.pop(n_recommendations, [])
+            if not future.done()  # Skip requests cancelled while waiting
+        ]
+        if not batch:
+            return
+
+        self.batches += 1
+        self.batched_requests += len(batch)
+        titles = [title for title, _ in batch]
+        try:
+            scoring = asyncio.get_running_loop().run_in_executor(
+                self._executor, self.batch_fn, titles, n_recommendations
+            )
+        except RuntimeError:  # The executor shut down
+            self._fail(batch)
+            return
+        scoring.add_done_callback(lambda done: self._resolve(batch, done))
+
+    @staticmethod
+    def _fail(batch):
+        """
+        Fail every waiting request of a batch that will not be scored.
+        """
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(
+                    ScoringCancelledError(
+                        "Scoring was cancelled: the scoring executor shut down."
+                    )
+                )
+
+    @classmethod
+    def _resolve(cls, batch, scoring):
+        """
+        Hand every request of a finished batch its own result or exception.
+        """
+        # exception() itself raises CancelledError on a cancelled future
+        if scoring.cancelled():
+            cls._fail(batch)
+            return
+        error = scoring.exception()
+        results = scoring.result() if error is None else [error] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        """
+        Return the queue and batching counters.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "max_queue_size": self.max_queue_size,
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        """
+        Stop the executor, failing the requests still waiting to be scored.
+        """
+        for handle in self._flush_handles.values():
+            handle.cancel()
+        self._flush_handles.clear()
+        for batch in self._pending.values():
+            self._fail(batch)
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,11 +1,32 @@
-
 import argparse
 import os
+import threading
+import time
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+from src.components.artifact_registry import latest_version_dir
+from src.components.content_index import load_content_index
+from src.components.data_preprocessing import rating_weights
+from src.components.neighbor_index import attach_index, detach_index
+from src.components.title_search import load_title_search
 from src.logger import logging
-from src.utils import load_object
+from src.pipelines.request_metrics import request_metrics
+from src.utils import (
+    build_sorted_lookup,
+    load_json,
+    load_object,
+    load_numpy_array,
+    load_csr_matrix,
+    load_sorted_lookup,
+    load_string_array,
+    save_csr_matrix,
+    save_object,
+    save_sorted_lookup,
+    save_string_array,
+)
 
 
 def _load_with_fallback(primary: Path, fallback: Path | None = None):
@@ -23,93 +44,924 @@ def _load_with_fallback(primary: Path, fallback: Path | None = None):
         )
         return load_object(fallback)
 
+
+def _load_optional_array(path: Path, mmap_mode=None):
+    """
+    Load an optional .npy artifact, returning None when it has not been built.
+    """
+    if not path.exists():
+        logging.warning("Optional artifact %s missing, skipping", path)
+        return None
+    return load_numpy_array(path, mmap_mode=mmap_mode)
+
+
 # Allow overriding artifact location (defaults to ./artifacts)
 ARTIFACT_DIR = Path(os.environ.get("ARTIFACT_DIR", "artifacts"))
+# Lowest n-gram similarity at which a misspelled title resolves to a catalog title
+TITLE_MATCH_MIN_SIMILARITY = float(os.environ.get("TITLE_MATCH_MIN_SIMILARITY", "0.6"))
+# Similar titles every rated title votes for in personalized recommendations
+USER_SIMILAR_TITLES = int(os.environ.get("USER_SIMILAR_TITLES", "20"))
 
-logging.info("Loading trained model")
-model = load_object(ARTIFACT_DIR / "model.pkl")
 
-logging.info("Load books title object")
-books_title = _load_with_fallback(
-    ARTIFACT_DIR / "books_title.pkl", ARTIFACT_DIR / "books_name.pkl"
-)
+def _load_user_matrix(artifact_dir: Path, title_to_row, user_to_column):
+    """
+    Load the user-by-title rating matrix, building it from the final ratings
+    (``rating_x``) for artifact sets saved before it was.
+    """
+    if (artifact_dir / "user_matrix_indptr.npy").exists():
+        return load_csr_matrix(artifact_dir / "user_matrix", mmap_mode="r")
+    final_rating = load_object(artifact_dir / "ratings.pkl")
+    rows = user_to_column.get_indexer(final_rating["user_id"].to_numpy())
+    columns = title_to_row.get_indexer(final_rating["title"].to_numpy())
+    known = (rows >= 0) & (columns >= 0)
+    return coo_matrix(
+        (
+            rating_weights(final_rating["rating_x"].to_numpy()[known]),
+            (rows[known], columns[known]),
+        ),
+        shape=(len(user_to_column), len(title_to_row)),
+    ).tocsr()
+
+
+def _build_lookups(titles, title_to_poster, user_ids):
+    """
+    Build the title to row lookup, the poster URL of every row and the user id
+    to column lookup in memory.
+    """
+    return (
+        build_sorted_lookup(titles, strings=True),
+        [title_to_poster.get(title, "") for title in titles],
+        build_sorted_lookup(user_ids),
+    )
+
+
+def _save_lookups(artifact_dir: Path, titles, title_to_poster, user_ids):
+    """
+    Save the lookups of ``_build_lookups`` as memory-mappable arrays.
+    """
+    save_sorted_lookup(artifact_dir / "books_title_lookup", titles, strings=True)
+    save_string_array(
+        artifact_dir / "books_poster", [title_to_poster.get(title) for title in titles]
+    )
+    save_sorted_lookup(artifact_dir / "user_ids_lookup", user_ids)
+
 
-logging.info("Loading book matrix")
-book_pivot = load_object(ARTIFACT_DIR / "book_pivot.pkl")
+def _load_lookups(artifact_dir: Path, titles):
+    """
+    Load the title to row lookup, the poster URL of every row and the user id
+    to column lookup.
+
+    They are memory-mapped, so every worker shares them; artifact sets saved
+    before the arrays existed build them from the pickled indexes instead.
+    """
+    if (artifact_dir / "books_title_lookup_rows.npy").exists():
+        return (
+            load_sorted_lookup(artifact_dir / "books_title_lookup", strings=titles),
+            load_string_array(artifact_dir / "books_poster"),
+            load_sorted_lookup(artifact_dir / "user_ids_lookup"),
+        )
+    logging.warning("Lookup arrays missing in %s, building them", artifact_dir)
+    return _build_lookups(
+        titles,
+        load_object(artifact_dir / "title_index.pkl")["title_to_poster"],
+        load_object(artifact_dir / "user_ids.pkl"),
+    )
 
-logging.info("Loading ratings")
-final_rating = load_object(ARTIFACT_DIR / "ratings.pkl")
 
+def _build_title_index(titles, ratings):
+    """
+    Build the title to row and title to first poster URL hash indexes.
 
-def fetch_poster(suggestion, query_title):
-    book_name = []
-    ids_index = []
-    poster_url = []
+    Used for artifact directories trained before ``title_index.pkl`` existed.
+    """
+    first_posters = ratings.drop_duplicates("title").set_index("title")["url"]
+    return {
+        "title_to_row": {title: row for row, title in enumerate(titles)},
+        "title_to_poster": first_posters.dropna().to_dict(),
+    }
+
+
+def _load_model_info(artifact_dir: Path):
+    """
+    Load how the model was trained; older artifacts always used the sparse matrix.
+    """
+    path = artifact_dir / "model_info.json"
+    if not path.exists():
+        return {"feature_space": "sparse", "index_backend": "brute"}
+    return load_json(path)
+
+
+def _artifact_version(artifact_dir: Path) -> str:
+    """
+    Identify an artifact set: the manifest version of a versioned artifact
+    directory, otherwise the modification time of its model files.
+    """
+    manifest_path = artifact_dir / "manifest.json"
+    if manifest_path.exists():
+        return str(load_json(manifest_path)["version"])
+    mtimes = [
+        path.stat().st_mtime_ns
+        for path in (artifact_dir / "model_spec.pkl", artifact_dir / "model.pkl")
+        if path.exists()
+    ]
+    return str(max(mtimes, default=0))
+
+
+def _mmap_artifacts_available(artifact_dir: Path) -> bool:
+    """
+    Check whether the memory-mappable serving artifacts have been built.
+    """
+    return all(
+        path.exists()
+        for path in (
+            artifact_dir / "model_spec.pkl",
+            artifact_dir / "book_matrix_indptr.npy",
+            artifact_dir / "books_title_offsets.npy",
+            artifact_dir / "title_index.pkl",
+        )
+    )
 
-    for book_id in suggestion:
-        book_name.append(book_pivot.index[book_id])
 
-    for name in book_name[0]:
-        if name == query_title:
-            continue  # Skip the queried title itself
-        ids = np.where(final_rating["title"] == name)[0]
-        if ids.size == 0:
-            logging.warning("Poster not found for title '%s'", name)
-            continue
-        ids_index.append(ids[0])
+def prepare_mmap_artifacts(artifact_dir: Path) -> bool:
+    """
+    Write the memory-mappable serving layout for a pickle-only artifact set.
 
-    for idx in ids_index:
-        url = final_rating.iloc[idx]['url']
-        poster_url.append(url)
+    Artifact sets from before the memory-mapped layout make every worker
+    unpickle its own model, pivot table and ratings. Converting them once lets
+    all workers map the same files instead.
 
-    return poster_url
+    Args:
+        artifact_dir (Path): Directory of the trained artifacts.
 
+    Returns:
+        bool: Whether files were written; False when the layout already exists.
+    """
+    artifact_dir = Path(artifact_dir)
+    if _mmap_artifacts_available(artifact_dir):
+        if (artifact_dir / "books_title_lookup_rows.npy").exists():
+            return False
+        logging.info("Writing the lookup arrays of %s", artifact_dir)
+        _save_lookups(
+            artifact_dir,
+            list(load_string_array(artifact_dir / "books_title")),
+            load_object(artifact_dir / "title_index.pkl")["title_to_poster"],
+            load_object(artifact_dir / "user_ids.pkl"),
+        )
+        return True
 
-def recommend_book(book_name):
-    if book_name not in book_pivot.index:
-        raise ValueError(f"Book '{book_name}' not found in catalog.")
+    logging.info("Writing the memory-mappable layout of %s", artifact_dir)
+    model = load_object(artifact_dir / "model.pkl")
+    books_title = _load_with_fallback(
+        artifact_dir / "books_title.pkl", artifact_dir / "books_name.pkl"
+    )
+    book_pivot = load_object(artifact_dir / "book_pivot.pkl")
+    save_csr_matrix(artifact_dir / "book_matrix", csr_matrix(book_pivot.values))
+    user_ids = book_pivot.columns.to_numpy()
+    del book_pivot
 
-    books_list = []
-    book_id_arr = np.where(book_pivot.index == book_name)[0]
-    if book_id_arr.size == 0:
-        raise ValueError(f"Book '{book_name}' not found in catalog.")
-    book_id = book_id_arr[0]
-    distance, suggestion = model.kneighbors(
-        book_pivot.iloc[book_id, :].values.reshape(1, -1), n_neighbors=6
+    final_rating = load_object(artifact_dir / "ratings.pkl")
+    title_index = _build_title_index(books_title, final_rating)
+    save_object(artifact_dir / "title_index.pkl", title_index)
+    del final_rating
+    _save_lookups(
+        artifact_dir, list(books_title), title_index["title_to_poster"], user_ids
     )
 
-    poster_url = fetch_poster(suggestion, book_name)
-    
-    for i in range(len(suggestion)):
-            books = book_pivot.index[suggestion[i]]
-            for j in books:
-                if j != book_name:
-                    books_list.append(j)
-    return books_list , poster_url   
+    save_string_array(artifact_dir / "books_title", books_title)
+    # Written last: its presence marks the layout as complete
+    save_object(artifact_dir / "model_spec.pkl", detach_index(model))
+    return True
+
+
+class RecommenderArtifacts:
+    """
+    Everything needed to answer recommendations from one artifact directory.
+
+    Loading happens in the constructor and the wall time of every artifact is
+    recorded in ``load_timings`` (seconds), so slow cold starts can be traced
+    to the artifact that dominates them. Instances are never mutated after
+    loading, so a request keeps a consistent view of the model it started with.
+
+    Args:
+        artifact_dir (Path): Directory of the trained artifacts.
+    """
+
+    def __init__(self, artifact_dir: Path):
+        self.artifact_dir = Path(artifact_dir)
+        self.load_timings = {}
+        started = time.perf_counter()
+
+        if _mmap_artifacts_available(self.artifact_dir):
+            self._load_mmap()
+        else:
+            self._load_pickles()
+
+        self.artifact_version = _artifact_version(self.artifact_dir)
+
+        # Mapped read-only, so every worker shares the page-cache copy
+        neighbor_indices = self._timed(
+            "neighbor_indices",
+            _load_optional_array,
+            self.artifact_dir / "neighbor_indices.npy",
+            mmap_mode="r",
+        )
+        if neighbor_indices is not None and len(neighbor_indices) != len(
+            self.books_title
+        ):
+            logging.warning(
+                "Neighbor table does not match the book matrix, ignoring it"
+            )
+            neighbor_indices = None
+        self.neighbor_indices = neighbor_indices
+        self.neighbor_distances = (
+            self._timed(
+                "neighbor_distances",
+                _load_optional_array,
+                self.artifact_dir / "neighbor_distances.npy",
+                mmap_mode="r",
+            )
+            if neighbor_indices is not None
+            else None
+        )
+
+        # Ratings of every user, for personalized recommendations
+        self.user_matrix = self._timed(
+            "user_matrix",
+            _load_user_matrix,
+            self.artifact_dir,
+            self.title_to_row,
+            self.user_to_column,
+        )
+
+        # Content-based fallback for catalog titles outside the user-book matrix
+        self.content_index = self._timed(
+            "content_index", load_content_index, self.artifact_dir
+        )
+        # Prefix and fuzzy matching of catalog titles
+        self.title_search = self._timed(
+            "title_search", load_title_search, self.artifact_dir
+        )
+
+        self.load_seconds = time.perf_counter() - started
+        logging.info(
+            "Loaded artifact version %s from %s in %.3f s (%s)",
+            self.artifact_version,
+            self.artifact_dir,
+            self.load_seconds,
+            ", ".join(
+                f"{name} {seconds:.3f} s" for name, seconds in self.load_timings.items()
+            ),
+        )
+
+    def _timed(self, name, load, *args, **kwargs):
+        """
+        Run one artifact loader and record how long it took.
+        """
+        logging.info("Loading %s", name)
+        started = time.perf_counter()
+        value = load(*args, **kwargs)
+        self.load_timings[name] = time.perf_counter() - started
+        return value
+
+    def _load_mmap(self):
+        # Memory-mapped arrays are shared through the page cache by every worker
+        artifact_dir = self.artifact_dir
+        model_info = _load_model_info(artifact_dir)
+        if model_info["feature_space"] == "embeddings":
+            self.features = self._timed(
+                "item_embeddings",
+                load_numpy_array,
+                artifact_dir / "item_embeddings.npy",
+                mmap_mode="r",
+            )
+        else:
+            self.features = self._timed(
+                "book_matrix",
+                load_csr_matrix,
+                artifact_dir / "book_matrix",
+                mmap_mode="r",
+            )
+
+        self.books_title = self._timed(
+            "books_title", load_string_array, artifact_dir / "books_title"
+        )
+        self.title_to_row, self.books_poster, self.user_to_column = self._timed(
+            "lookups", _load_lookups, artifact_dir, self.books_title
+        )
+
+        # Attaching the model to the memory-mapped features
+        model_spec = self._timed(
+            "model_spec", load_object, artifact_dir / "model_spec.pkl"
+        )
+        self.model = self._timed(
+            "model_attach", attach_index, model_spec, self.features
+        )
+
+    def _load_pickles(self):
+        artifact_dir = self.artifact_dir
+        self.model = self._timed("model", load_object, artifact_dir / "model.pkl")
+        self.books_title = self._timed(
+            "books_title",
+            _load_with_fallback,
+            artifact_dir / "books_title.pkl",
+            artifact_dir / "books_name.pkl",
+        )
+
+        book_pivot = self._timed(
+            "book_pivot", load_object, artifact_dir / "book_pivot.pkl"
+        )
+        self.features = csr_matrix(book_pivot.values)
+        user_ids = book_pivot.columns.to_numpy()
+        del book_pivot
+
+        final_rating = self._timed("ratings", load_object, artifact_dir / "ratings.pkl")
+        title_index = self._timed(
+            "title_index", _build_title_index, self.books_title, final_rating
+        )
+        del final_rating
+        self.title_to_row, self.books_poster, self.user_to_column = self._timed(
+            "lookups",
+            _build_lookups,
+            self.books_title,
+            title_index["title_to_poster"],
+            user_ids,
+        )
+
+    def validate(self):
+        """
+        Sanity-check a freshly loaded artifact set before it serves traffic.
+
+        Raises:
+            ValueError: If the artifacts are empty or inconsistent.
+        """
+        n_titles = len(self.books_title)
+        if n_titles == 0:
+            raise ValueError(f"Artifact set {self.artifact_dir} has no titles.")
+        if self.features.shape[0] != n_titles:
+            raise ValueError(
+                f"Artifact set {self.artifact_dir} has {self.features.shape[0]} "
+                f"feature rows for {n_titles} titles."
+            )
+        n_users = len(self.user_to_column)
+        if self.user_matrix.shape != (n_users, n_titles):
+            raise ValueError(
+                f"Artifact set {self.artifact_dir} has a {self.user_matrix.shape} "
+                f"user matrix for {n_users} users and {n_titles} titles."
+            )
+        if len(self.title_to_row) != n_titles or len(self.books_poster) != n_titles:
+            raise ValueError(
+                f"Artifact set {self.artifact_dir} has lookups that do not match "
+                f"its {n_titles} titles."
+            )
+        content_index = self.content_index
+        if content_index is not None and not (
+            len(content_index.titles)
+            == content_index.matrix.shape[0]
+            == content_index.inverted.shape[1]
+        ):
+            raise ValueError(
+                f"Artifact set {self.artifact_dir} has an inconsistent content index."
+            )
+        title_search = self.title_search
+        if title_search is not None and not (
+            len(title_search.titles)
+            == len(title_search.keys)
+            == title_search.ngrams.shape[0]
+            == title_search.inverted.shape[1]
+        ):
+            raise ValueError(
+                f"Artifact set {self.artifact_dir} has an inconsistent title search index."
+            )
+        # One query touches the model, the titles and the mapped pages
+        recommendations, _ = self.recommend_book(self.books_title[0])
+        if not recommendations and n_titles > 1:
+            raise ValueError(f"Artifact set {self.artifact_dir} returned no neighbors.")
+
+    def fetch_poster(self, suggestion, query_title):
+        poster_url = []
+
+        for book_id in suggestion[0]:
+            name = self.books_title[book_id]
+            if name == query_title:
+                continue  # Skip the queried title itself
+            url = self.books_poster[book_id]
+            if not url:
+                logging.warning("Poster not found for title '%s'", name)
+                continue
+            poster_url.append(url)
+
+        return poster_url
+
+    def _find_neighbors(self, book_ids, n_neighbors):
+        """
+        Return the neighbor rows of titles, shaped like ``model.kneighbors`` output.
+
+        Served from the precomputed neighbor table when it holds enough columns,
+        otherwise falls back to a single live kneighbors query over all rows.
+        """
+        book_ids = np.asarray(book_ids)
+        if (
+            self.neighbor_indices is not None
+            and n_neighbors <= self.neighbor_indices.shape[1]
+        ):
+            return self.neighbor_indices[book_ids, :n_neighbors]
+
+        _, suggestion = self.model.kneighbors(
+            self.features[book_ids], n_neighbors=n_neighbors
+        )
+        return suggestion
+
+    def _format_recommendations(self, book_name, suggestion):
+        """
+        Turn one row of neighbor ids into recommended titles and poster URLs.
+        """
+        books_list = []
+        with request_metrics.phase("fetch_poster"):
+            poster_url = self.fetch_poster(suggestion.reshape(1, -1), book_name)
+
+        for neighbor_id in suggestion:
+            title = self.books_title[neighbor_id]
+            if title != book_name:
+                books_list.append(title)
+        return books_list, poster_url
+
+    def _content_recommendations(self, book_names, n_recommendations):
+        """
+        Recommend books for titles outside the user-book matrix by content.
+
+        Returns:
+            list: Per title, the ``(recommendations, poster_urls)`` of its most
+            similar catalog titles, or the ValueError for a title missing from
+            the catalog (or of every title when no content index was built).
+        """
+        content_index = self.content_index
+        results = [None] * len(book_names)
+        found = []
+        with request_metrics.phase("title_lookup"):
+            for position, book_name in enumerate(book_names):
+                row = (
+                    content_index.title_to_row.get(book_name)
+                    if content_index is not None
+                    else None
+                )
+                if row is None:
+                    results[position] = ValueError(
+                        f"Book '{book_name}' not found in catalog."
+                    )
+                else:
+                    found.append((position, row))
+
+        if found:
+            with request_metrics.phase("content_search"):
+                neighbors = content_index.kneighbors(
+                    [row for _, row in found], n_recommendations
+                )
+            for (position, _), rows in zip(found, neighbors):
+                with request_metrics.phase("fetch_poster"):
+                    poster_urls = (content_index.posters[row] for row in rows)
+                    poster_url = [url for url in poster_urls if url]
+                results[position] = (
+                    [content_index.titles[row] for row in rows],
+                    poster_url,
+                )
+        return results
+
+    def _user_row(self, user_id):
+        return self.user_to_column.get(user_id)
+
+    def _similar_titles(self, book_ids):
+        """
+        Most similar titles of titles and their similarity, 1 / (1 + distance).
+
+        Served from the precomputed neighbor table, otherwise from a live
+        kneighbors query.
+        """
+        n_similar = min(USER_SIMILAR_TITLES, len(self.books_title))
+        if self.neighbor_distances is not None:
+            n_similar = min(n_similar, self.neighbor_indices.shape[1])
+            neighbors = self.neighbor_indices[book_ids, :n_similar]
+            distances = self.neighbor_distances[book_ids, :n_similar]
+        else:
+            distances, neighbors = self.model.kneighbors(
+                self.features[book_ids], n_neighbors=n_similar
+            )
+        return neighbors, 1 / (1 + distances)
+
+    def recommend_for_user(self, user_id, n_recommendations=5):
+        """
+        Recommend books a user has not rated yet.
+
+        Every title the user rated votes for its most similar titles with the
+        user's own rating of it (see ``rating_weights``) times their
+        similarity. The votes are summed with one sparse matrix-vector product
+        over the neighbor lists of the rated titles only, so no title-by-title
+        similarity matrix is built.
+
+        Args:
+            user_id: ID of a user of the user-book matrix.
+            n_recommendations (int): Number of books to recommend.
+
+        Returns:
+            tuple: ``(recommendations, poster_urls)`` by decreasing score (ties
+            by title row), like ``recommend_book``.
+
+        Raises:
+            ValueError: If the user is not in the user-book matrix.
+        """
+        with request_metrics.phase("user_lookup"):
+            row = self._user_row(user_id)
+            if row is None:
+                raise ValueError(f"User '{user_id}' not found.")
+            start, stop = self.user_matrix.indptr[row], self.user_matrix.indptr[row + 1]
+            rated = np.asarray(self.user_matrix.indices[start:stop])
+            ratings = np.asarray(self.user_matrix.data[start:stop], dtype=np.float32)
+
+        with request_metrics.phase("neighbor_search"):
+            neighbors, similarities = self._similar_titles(rated)
+            n_rated, n_similar = neighbors.shape
+            votes = csr_matrix(
+                (
+                    similarities.ravel(),
+                    neighbors.ravel(),
+                    np.arange(0, n_rated * n_similar + 1, n_similar),
+                ),
+                shape=(n_rated, len(self.books_title)),
+            )
+            scores = votes.T @ ratings
+            scores[rated] = 0
+            candidates = np.flatnonzero(scores > 0)
+            scores = scores[candidates]
+            if len(candidates) > n_recommendations:
+                # Keep every tie of the last kept score so ties are broken by row
+                kth = np.partition(scores, len(scores) - n_recommendations)
+                top = scores >= kth[len(scores) - n_recommendations]
+                candidates, scores = candidates[top], scores[top]
+            order = np.lexsort((candidates, -scores))[:n_recommendations]
+
+        return self._format_recommendations(None, candidates[order])
+
+    def search_titles(self, query, limit=10):
+        """
+        Typeahead search of catalog titles; see ``TitleSearchIndex.search``.
+
+        Returns:
+            list[dict]: The matches, empty when no search index was built.
+        """
+        if self.title_search is None:
+            return []
+        with request_metrics.phase("title_search"):
+            return self.title_search.search(query, limit)
+
+    def resolve_title(self, book_name, min_similarity=TITLE_MATCH_MIN_SIMILARITY):
+        """
+        Catalog title a query refers to: the query itself when it is a known
+        title, else its closest match in the title search index.
+
+        Returns:
+            str | None: The title, or None when nothing is close enough.
+        """
+        content_index = self.content_index
+        if book_name in self.title_to_row or (
+            content_index is not None and book_name in content_index.title_to_row
+        ):
+            return book_name
+        if self.title_search is None:
+            return None
+        with request_metrics.phase("title_search"):
+            return self.title_search.resolve(book_name, min_similarity)
+
+    def recommend_book(self, book_name, n_recommendations=5):
+        with request_metrics.phase("title_lookup"):
+            book_id = self.title_to_row.get(book_name)
+        if book_id is None:
+            # Titles without enough ratings fall back to the content index
+            result = self._content_recommendations([book_name], n_recommendations)[0]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with request_metrics.phase("neighbor_search"):
+            suggestion = self._find_neighbors([book_id], n_recommendations + 1)
+        return self._format_recommendations(book_name, suggestion[0])
+
+    def recommend_books(self, book_names, n_recommendations=5):
+        """
+        Recommend books for many titles with one vectorized neighbor lookup.
+
+        Args:
+            book_names (list[str]): Exact titles to query.
+            n_recommendations (int): Number of recommendations per title.
+
+        Returns:
+            list: One entry per input title, in order. Each entry is either the
+            ``(recommendations, poster_urls)`` tuple ``recommend_book`` returns
+            (from the content index for titles outside the user-book matrix), or
+            the ValueError raised for a title missing from the catalog.
+        """
+        results = [None] * len(book_names)
+        found = []
+        missing = []
+        with request_metrics.phase("title_lookup"):
+            for position, book_name in enumerate(book_names):
+                book_id = self.title_to_row.get(book_name)
+                if book_id is None:
+                    missing.append(position)
+                else:
+                    found.append((position, book_id))
+
+        # Titles without enough ratings fall back to the content index
+        if missing:
+            fallbacks = self._content_recommendations(
+                [book_names[position] for position in missing], n_recommendations
+            )
+            for position, result in zip(missing, fallbacks):
+                results[position] = result
+
+        if found:
+            with request_metrics.phase("neighbor_search"):
+                suggestions = self._find_neighbors(
+                    [book_id for _, book_id in found], n_recommendations + 1
+                )
+            for (position, _), suggestion in zip(found, suggestions):
+                results[position] = self._format_recommendations(
+                    book_names[position], suggestion
+                )
+        return results
+
+
+class RecommenderService:
+    """
+    Lazily loaded recommender over the latest artifact version.
+
+    Nothing is read at construction time. ``start_loading`` loads the artifacts
+    on a background thread so a server can answer liveness probes right away
+    and report readiness once loading finished; any call that needs the
+    artifacts before then loads them (or waits for the background load).
+
+    ``artifact_dir`` is either a plain artifact set or a directory with
+    published versions under ``versions/``, in which case the latest complete
+    version is served. ``reload`` (called directly or by the watcher thread of
+    ``start_watching``) loads and validates a newer version next to the current
+    one and then swaps the reference; requests already running keep the
+    snapshot they started with, which is released once they finish.
+
+    Args:
+        artifact_dir (Path): Directory of the trained artifacts or their versions.
+    """
+
+    def __init__(self, artifact_dir: Path = ARTIFACT_DIR):
+        self.artifact_dir = Path(artifact_dir)
+        self._artifacts = None
+        self._error = None
+        self._reload_error = None
+        self._rejected_dir = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.reloads = 0
+
+    def _latest_dir(self) -> Path:
+        return Path(latest_version_dir(str(self.artifact_dir)))
+
+    def load(self):
+        """
+        Load the artifacts unless they are loaded already, and return them.
+
+        Raises:
+            Exception: Whatever the artifact loading raised.
+        """
+        with self._lock:
+            if self._artifacts is None:
+                try:
+                    artifacts = RecommenderArtifacts(self._latest_dir())
+                    artifacts.validate()
+                    self._artifacts = artifacts
+                    self._error = None
+                except Exception as exc:
+                    logging.exception(
+                        "Failed to load artifacts from %s", self.artifact_dir
+                    )
+                    self._error = exc
+                    raise
+            return self._artifacts
+
+    def reload(self, artifact_dir: Path | None = None) -> bool:
+        """
+        Swap in the latest artifact version, or ``artifact_dir`` when given.
+
+        The new version is loaded and validated while the current one keeps
+        serving; on failure the current one stays in place.
+
+        Returns:
+            bool: Whether a new artifact set was swapped in.
+
+        Raises:
+            Exception: Whatever loading or validating the new version raised.
+        """
+        with self._lock:
+            target = Path(artifact_dir) if artifact_dir else self._latest_dir()
+            current = self._artifacts
+            if (
+                artifact_dir is None
+                and current is not None
+                and target == current.artifact_dir
+                and _artifact_version(target) == current.artifact_version
+            ):
+                return False
+
+            try:
+                artifacts = RecommenderArtifacts(target)
+                artifacts.validate()
+            except Exception as exc:
+                logging.exception("Rejected artifact set %s", target)
+                self._reload_error = exc
+                self._rejected_dir = target
+                raise
+
+            # A single reference assignment; readers see the old or the new set
+            self._artifacts = artifacts
+            self._error = None
+            self._reload_error = None
+            self.reloads += 1
+            logging.info(
+                "Swapped to artifact version %s (was %s)",
+                artifacts.artifact_version,
+                current.artifact_version if current is not None else None,
+            )
+            return True
+
+    def start_loading(self):
+        """
+        Load the artifacts on a daemon thread; a no-op once started.
+        """
+        with self._lock:
+            if self._thread is not None or self._artifacts is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._load_in_background, name="artifact-loader", daemon=True
+            )
+            self._thread.start()
+
+    def _load_in_background(self):
+        try:
+            self.load()
+        except Exception:
+            pass  # Recorded in self._error and reported by status()
+
+    def start_watching(self, interval_seconds: float):
+        """
+        Poll for new artifact versions every ``interval_seconds`` and reload.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch,
+            args=(interval_seconds,),
+            name="artifact-watcher",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval_seconds):
+        while not self._stop_watching.wait(interval_seconds):
+            if self._artifacts is None:
+                continue  # The initial load has not finished yet
+            if self._latest_dir() == self._rejected_dir:
+                continue  # Already rejected; wait for a newer version
+            try:
+                self.reload()
+            except Exception:
+                pass  # Recorded in self._reload_error and reported by status()
+
+    @property
+    def artifacts(self) -> RecommenderArtifacts:
+        artifacts = self._artifacts
+        return artifacts if artifacts is not None else self.load()
+
+    @property
+    def ready(self) -> bool:
+        return self._artifacts is not None
+
+    @property
+    def artifact_version(self) -> str | None:
+        artifacts = self._artifacts
+        return artifacts.artifact_version if artifacts is not None else None
+
+    def status(self) -> dict:
+        """
+        Readiness details: loading state, artifact version and load timings.
+        """
+        artifacts = self._artifacts
+        if artifacts is not None:
+            status = {
+                "status": "ready",
+                "artifact_dir": str(artifacts.artifact_dir),
+                "artifact_version": artifacts.artifact_version,
+                "load_seconds": artifacts.load_seconds,
+                "load_timings": artifacts.load_timings,
+                "reloads": self.reloads,
+            }
+            if self._reload_error is not None:
+                status["reload_error"] = str(self._reload_error)
+            return status
+        if self._error is not None:
+            return {"status": "failed", "error": str(self._error)}
+        return {"status": "loading" if self._thread is not None else "not_loaded"}
+
+    def recommend_book(self, book_name, n_recommendations=5):
+        return self.artifacts.recommend_book(book_name, n_recommendations)
+
+    def recommend_books(self, book_names, n_recommendations=5):
+        return self.artifacts.recommend_books(book_names, n_recommendations)
+
+    def recommend_for_user(self, user_id, n_recommendations=5):
+        return self.artifacts.recommend_for_user(user_id, n_recommendations)
+
+    def search_titles(self, query, limit=10):
+        return self.artifacts.search_titles(query, limit)
+
+    def resolve_title(self, book_name):
+        return self.artifacts.resolve_title(book_name)
+
+
+# Shared service of the module-level helpers; loads on first use
+service = RecommenderService()
+
+
+def recommend_book(book_name, n_recommendations=5):
+    return service.recommend_book(book_name, n_recommendations)
+
+
+def recommend_books(book_names, n_recommendations=5):
+    """
+    Recommend books for many titles; see ``RecommenderArtifacts.recommend_books``.
+    """
+    return service.recommend_books(book_names, n_recommendations)
+
+
+def recommend_for_user(user_id, n_recommendations=5):
+    """
+    Recommend unread books to a user; see
+    ``RecommenderArtifacts.recommend_for_user``.
+    """
+    return service.recommend_for_user(user_id, n_recommendations)
+
+
+def search_titles(query, limit=10):
+    """
+    Prefix and fuzzy search of catalog titles; see
+    ``RecommenderArtifacts.search_titles``.
+    """
+    return service.search_titles(query, limit)
+
+
+def resolve_title(book_name):
+    """
+    Catalog title a possibly misspelled query refers to, or None; see
+    ``RecommenderArtifacts.resolve_title``.
+    """
+    return service.resolve_title(book_name)
 
 
 def _cli():
     parser = argparse.ArgumentParser(
         description="Query similar books using the trained recommendation model."
     )
-    parser.add_argument(
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument(
         "--book",
-        required=True,
-        help="Exact book title to search for (must exist in the pivot table).",
+        help="Exact book title to search for (must exist in the catalog).",
+    )
+    query.add_argument(
+        "--user",
+        type=int,
+        help="User ID to recommend unread books to (must exist in the pivot table).",
     )
     args = parser.parse_args()
+    target = f"'{args.book}'" if args.book is not None else f"user {args.user}"
 
     try:
-        recommendations, poster_urls = recommend_book(args.book)
+        if args.book is not None:
+            recommendations, poster_urls = recommend_book(args.book)
+        else:
+            recommendations, poster_urls = recommend_for_user(args.user)
     except Exception as exc:  # broad on purpose for CLI use
         logging.exception("Failed to generate recommendations")
         raise SystemExit(f"Error generating recommendations: {exc}") from exc
 
     if not recommendations:
-        print(f"No recommendations found for '{args.book}'.")
+        print(f"No recommendations found for {target}.")
         return
 
-    print(f"Recommendations for '{args.book}':")
+    print(f"Recommendations for {target}:")
     for idx, title in enumerate(recommendations, start=1):
         poster = poster_urls[idx - 1] if idx - 1 < len(poster_urls) else ""
         line = f"{idx}. {title}"
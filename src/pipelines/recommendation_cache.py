@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """
+    Bounded LRU cache of recommendation results with a time-to-live.
+
+    Entries are keyed on ``(title, n_recommendations)``. The cache remembers the
+    artifact version its entries were computed with and empties itself as soon
+    as ``version_fn`` reports a different one, so a new model never serves
+    results of the previous one. Counters of hits, misses, evictions,
+    expirations and invalidations are kept for the metrics endpoint.
+
+    Args:
+        max_size (int): Maximum number of cached entries; 0 disables caching.
+        ttl_seconds (float | None): Lifetime of an entry, or None to keep
+            entries until they are evicted.
+        version_fn (callable, optional): Returns the current artifact version.
+        clock (callable): Monotonic clock, in seconds.
+    """
+
+    def __init__(
+        self, max_size=1024, ttl_seconds=300.0, version_fn=None, clock=time.monotonic
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn or (lambda: None)
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self):
+        """
+        Drop every entry when the artifact version changed; caller holds the lock.
+        """
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+        return version
+
+    def get(self, key):
+        """
+        Return the cached value of ``key``, or None on a miss.
+        """
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, version=None):
+        """
+        Store ``value``, evicting the least recently used entry when full.
+
+        Values computed with an artifact version that is no longer current are
+        not stored.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            current = self._check_version()
+            if version is not None and version != current:
+                return
+            expires_at = (
+                self.clock() + self.ttl_seconds
+                if self.ttl_seconds is not None
+                else None
+            )
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Return the cache counters and current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
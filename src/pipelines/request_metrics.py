@@ -0,0 +1,245 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Latency histograms keep one counter per bucket plus a sum and a count, so an
+observation is a bisect and three additions under a lock; quantiles such as
+p99 are derived by Prometheus (``histogram_quantile``) from the buckets.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from 100 us (a neighbor table lookup) to 10 s
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class LatencyHistogram:
+    """
+    Thread-safe cumulative latency histogram.
+
+    Args:
+        buckets (tuple): Sorted bucket upper bounds in seconds.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def snapshot(self):
+        """
+        Return the cumulative bucket counts, the sum and the count.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class LabeledHistogram:
+    """
+    A family of latency histograms, one per combination of label values.
+    """
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    values, LatencyHistogram(self.buckets)
+                )
+        return child
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for values, child in sorted(self._children.items()):
+            cumulative, total, count = child.snapshot()
+            bounds = [str(bound) for bound in child.buckets] + ["+Inf"]
+            for bound, bucket_count in zip(bounds, cumulative):
+                labels = _labels(self.label_names, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class LabeledCounter:
+    """
+    A family of counters, one per combination of label values.
+    """
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        for label_values, value in values:
+            lines.append(
+                f"{self.name}{_labels(self.label_names, label_values)} {value}"
+            )
+        return lines
+
+
+class RequestMetrics:
+    """
+    Request latency, per-phase latency and status code counters of the API.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.request_duration = LabeledHistogram(
+            "http_request_duration_seconds",
+            "Latency of HTTP requests from receipt to the last response byte.",
+            ("method", "path"),
+            buckets,
+        )
+        self.requests = LabeledCounter(
+            "http_requests_total",
+            "HTTP requests by method, route and status code.",
+            ("method", "path", "status"),
+        )
+        self.phase_duration = LabeledHistogram(
+            "recommendation_phase_duration_seconds",
+            "Latency of one call of a recommendation phase: title_lookup or "
+            "user_lookup, neighbor_search and content_search per (batched) "
+            "scoring call, title_search per search or title resolution, "
+            "fetch_poster per title, serialization per response.",
+            ("phase",),
+            buckets,
+        )
+
+    def observe_request(self, method, path, status, seconds):
+        self.request_duration.labels(method, path).observe(seconds)
+        self.requests.inc(method, path, str(status))
+
+    def observe_phase(self, phase, seconds):
+        self.phase_duration.labels(phase).observe(seconds)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block as one call of the phase ``name``.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(name, time.perf_counter() - started)
+
+    def render(self):
+        """
+        Return the Prometheus text lines of every metric.
+        """
+        return (
+            self.request_duration.render()
+            + self.requests.render()
+            + self.phase_duration.render()
+        )
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request and counting its status code.
+
+    Requests are labelled with their route template (``/users/{user_id}``
+    rather than the raw path) to keep the number of series bounded; requests
+    matching no route are labelled ``unmatched``.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500  # Reported if the app fails before sending a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.metrics.observe_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                time.perf_counter() - started,
+            )
+
+
+# Shared by the API and the prediction pipeline's phase timers
+request_metrics = RequestMetrics()
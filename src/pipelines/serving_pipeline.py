@@ -0,0 +1,67 @@
+"""
+Multi-process serving launcher.
+
+Prepares the memory-mappable artifacts once in the parent process, reads them
+into the page cache, and starts uvicorn workers for ``app:app``. Every worker
+maps the same read-only files, so the model, matrix, titles and neighbor table
+are held once in memory whatever the number of workers.
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import uvicorn
+
+from src.components.artifact_registry import latest_version_dir
+from src.logger import logging
+from src.pipelines.prediction_pipeline import ARTIFACT_DIR, prepare_mmap_artifacts
+
+
+def warm_page_cache(artifact_dir: Path, chunk_size=1 << 20) -> int:
+    """
+    Read every .npy file of an artifact set once so workers start on cached pages.
+
+    Returns:
+        int: Number of bytes read.
+    """
+    n_bytes = 0
+    for path in sorted(Path(artifact_dir).glob("*.npy")):
+        with open(path, "rb") as file_obj:
+            while chunk := file_obj.read(chunk_size):
+                n_bytes += len(chunk)
+    return n_bytes
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description="Serve the recommendation API from several worker processes."
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("SERVING_WORKERS", str(os.cpu_count() or 1))),
+        help="Number of uvicorn worker processes (defaults to the CPU count).",
+    )
+    args = parser.parse_args()
+
+    artifact_dir = Path(latest_version_dir(str(ARTIFACT_DIR)))
+    if prepare_mmap_artifacts(artifact_dir):
+        logging.info("Converted %s to the memory-mappable layout", artifact_dir)
+    n_bytes = warm_page_cache(artifact_dir)
+    logging.info(
+        "Warmed %.1f MB of shared artifacts in %s", n_bytes / 1e6, artifact_dir
+    )
+
+    # /admin/reload only reaches the worker that answers it; with several
+    # workers each one polls for new versions instead
+    if args.workers > 1:
+        os.environ.setdefault("ARTIFACT_WATCH_INTERVAL", "10")
+
+    uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,166 @@
+"""
+Parameter sweep pipeline.
+
+Evaluates every combination of preprocessing thresholds and model settings
+with the offline evaluation stage and writes one report row per combination.
+Every stage runs through the stage cache under ./artifacts/cache, so the raw
+CSVs are ingested once, a threshold pair is transformed once, and rerunning a
+sweep only computes the combinations it has not seen.
+"""
+
+import argparse
+import itertools
+import os
+
+from src.components.data_ingestion import DataIngestion
+from src.components.data_preprocessing import DataTransformation
+from src.components.model_evaluation import ModelEvaluation
+from src.components.stage_cache import StageCache
+from src.instrumentation import run_recorder
+from src.logger import logging
+from src.utils import load_json, save_json
+
+SWEEP_REPORT_FILE_PATH = os.path.join("artifacts", "sweep_report.json")
+RUN_REPORT_FILE_PATH = os.path.join("artifacts", "sweep_run_report.json")
+
+
+def evaluate_combination(cache, params):
+    """
+    Ingest, transform and evaluate one combination through the stage cache.
+
+    Args:
+        cache (StageCache): The cache every stage runs through.
+        params (dict): ``min_user_ratings``, ``min_book_ratings``,
+            ``index_backend``, ``feature_space`` and ``rank`` (None outside
+            the embeddings feature space).
+
+    Returns:
+        dict: The evaluation report of the combination.
+    """
+    ingestion = DataIngestion()
+    books, users, ratings = cache.run(
+        "data_ingestion", ingestion.initiate_data_ingestion, ingestion.ingestion_config
+    )
+
+    transformation = DataTransformation()
+    transformation_config = transformation.data_transformation_config
+    transformation_config.min_user_ratings = params["min_user_ratings"]
+    transformation_config.min_book_ratings = params["min_book_ratings"]
+    _, _, _, user_rating_matrix = cache.run(
+        "data_transformation",
+        transformation.initiate_data_transformation,
+        transformation_config,
+        books,
+        users,
+        ratings,
+    )
+
+    evaluation = ModelEvaluation()
+    training_config = evaluation.model_trainer.model_training_config
+    training_config.index_backend = params["index_backend"]
+    training_config.feature_space = params["feature_space"]
+    embedding_config = evaluation.embedding_trainer.embedding_training_config
+    if params["rank"] is not None:
+        embedding_config.rank = params["rank"]
+    report_path = cache.run(
+        "model_evaluation",
+        evaluation.initiate_model_evaluation,
+        [
+            evaluation.model_evaluation_config,
+            training_config,
+            embedding_config,
+            evaluation.neighbor_precomputation.neighbor_precomputation_config,
+        ],
+        user_rating_matrix,
+    )
+    return load_json(report_path)
+
+
+def run_sweep(grid, cache=None):
+    """
+    Evaluate every combination of a parameter grid.
+
+    Args:
+        grid (dict): Candidate values of every parameter of
+            ``evaluate_combination``.
+        cache (StageCache, optional): The cache stages run through.
+
+    Returns:
+        list[dict]: The ``params`` of every combination with its evaluation
+        ``report``, or the ``error`` that stopped it.
+    """
+    cache = cache or StageCache()
+    results, seen = [], set()
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid, values))
+        # The rank only changes combinations searching the embeddings
+        if params["feature_space"] != "embeddings":
+            params["rank"] = None
+        if tuple(params.values()) in seen:
+            continue
+        seen.add(tuple(params.values()))
+        logging.info(f"Evaluating the combination {params}")
+        try:
+            results.append(
+                {"params": params, "report": evaluate_combination(cache, params)}
+            )
+        except Exception as exc:
+            logging.error(f"Combination {params} failed: {exc}")
+            results.append({"params": params, "error": str(exc)})
+    return results
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description="Evaluate combinations of thresholds and model settings."
+    )
+    parser.add_argument("--min-user-ratings", type=int, nargs="+", default=[200])
+    parser.add_argument("--min-book-ratings", type=int, nargs="+", default=[50])
+    parser.add_argument(
+        "--index-backend", nargs="+", default=["brute"], choices=["brute", "ivf"]
+    )
+    parser.add_argument(
+        "--feature-space",
+        nargs="+",
+        default=["sparse"],
+        choices=["sparse", "embeddings"],
+    )
+    parser.add_argument(
+        "--rank", type=int, nargs="+", default=[64], help="Embedding ranks."
+    )
+    parser.add_argument("--output", default=SWEEP_REPORT_FILE_PATH)
+    args = parser.parse_args()
+
+    run_recorder.start_run("sweep")
+    try:
+        results = run_sweep(
+            {
+                "min_user_ratings": args.min_user_ratings,
+                "min_book_ratings": args.min_book_ratings,
+                "index_backend": args.index_backend,
+                "feature_space": args.feature_space,
+                "rank": args.rank,
+            }
+        )
+        save_json(file_path=args.output, obj=results)
+    finally:
+        run_recorder.save(RUN_REPORT_FILE_PATH)
+
+    for result in results:
+        report = result.get("report", {})
+        metrics = {
+            key: report[key]
+            for key in (
+                "recall_at_k",
+                "ndcg_at_k",
+                "catalog_coverage",
+                "neighbor_queries_per_second",
+            )
+            if key in report
+        }
+        print(result["params"], metrics or result.get("error"))
+    print(f"Sweep report written to {args.output}")
+
+
+if __name__ == "__main__":
+    run()
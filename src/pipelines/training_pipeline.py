@@ -1,20 +1,146 @@
-import os, sys
+import os
+import argparse
 from src.logger import logging
-from src.exception import CustomException
-
-import pandas as pd
 
+from src.components.artifact_registry import ArtifactRegistry
+from src.components.content_index import ContentIndexTrainer
 from src.components.data_ingestion import DataIngestion
 from src.components.data_preprocessing import DataTransformation
+from src.components.embedding_preparation import EmbeddingTrainer
+from src.components.incremental_update import IncrementalUpdate
+from src.components.model_evaluation import ModelEvaluation
 from src.components.model_preparation import ModelTrainer
+from src.components.neighbor_precomputation import NeighborPrecomputation
+from src.components.stage_cache import StageCache
+from src.components.title_search import TitleSearchTrainer
+from src.instrumentation import run_recorder
+
+# Per-step time, memory and row counts of the last training run
+RUN_REPORT_FILE_PATH = os.path.join("artifacts", "training_run_report.json")
 
 if __name__ == "__main__":
-    obj = DataIngestion()
-    books_df, users_df, ratings_df = obj.initiate_data_ingestion()
-    # print(books_df, users_df, ratings_df)
-    data_transformation = DataTransformation()
-    ratings, pivot_table, books_title = data_transformation.initiate_data_transformation(
-        books_df, users_df, ratings_df
+    parser = argparse.ArgumentParser(
+        description="Train the recommender and publish its serving artifacts."
     )
-    model_trainer = ModelTrainer()
-    model_trainer.initiate_model_training(pivot_table)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rerun every stage, even when its inputs and configuration are unchanged.",
+    )
+    args = parser.parse_args()
+
+    # A stage is skipped when its manifest shows the same inputs and
+    # configuration as its last run and its outputs are intact
+    stage_cache = StageCache()
+    stage_cache.stage_cache_config.force = args.force
+    run_recorder.start_run("training")
+    try:
+        obj = DataIngestion()
+        books_df, users_df, ratings_df = stage_cache.run_in_place(
+            "data_ingestion", obj.initiate_data_ingestion, obj.ingestion_config
+        )
+        data_transformation = DataTransformation()
+        (
+            ratings,
+            user_book_matrix,
+            books_title,
+            user_rating_matrix,
+        ) = stage_cache.run_in_place(
+            "data_transformation",
+            data_transformation.initiate_data_transformation,
+            data_transformation.data_transformation_config,
+            books_df,
+            users_df,
+            ratings_df,
+        )
+        # Rating counts and waiting ratings that incremental updates fold
+        # new ratings into
+        incremental_update = IncrementalUpdate()
+        stage_cache.run_in_place(
+            "incremental_state",
+            incremental_update.initiate_incremental_state,
+            incremental_update.incremental_update_config,
+            books_df,
+            ratings_df,
+            data_transformation.data_transformation_config.min_user_ratings,
+            data_transformation.data_transformation_config.min_book_ratings,
+        )
+        # Content-based fallback index of every catalog title
+        content_index_trainer = ContentIndexTrainer()
+        stage_cache.run_in_place(
+            "content_index",
+            content_index_trainer.initiate_content_index,
+            content_index_trainer.content_index_config,
+            books_df,
+        )
+        # Prefix and fuzzy search index of every catalog title
+        title_search_trainer = TitleSearchTrainer()
+        stage_cache.run_in_place(
+            "title_search",
+            title_search_trainer.initiate_title_search,
+            title_search_trainer.title_search_config,
+            books_df,
+        )
+        model_trainer = ModelTrainer()
+        item_embeddings = None
+        if model_trainer.model_training_config.feature_space == "embeddings":
+            embedding_trainer = EmbeddingTrainer()
+            item_embeddings = stage_cache.run_in_place(
+                "embedding_training",
+                embedding_trainer.initiate_embedding_training,
+                embedding_trainer.embedding_training_config,
+                user_book_matrix,
+            )
+        model_path = stage_cache.run_in_place(
+            "model_training",
+            model_trainer.initiate_model_training,
+            model_trainer.model_training_config,
+            user_book_matrix,
+            user_rating_matrix,
+            item_embeddings,
+        )
+        # Recall@K, NDCG@K, coverage and throughput on held-out ratings, with
+        # the settings of the trained model
+        # The evaluation computes its neighbor table with the engine and metric
+        # of the served one
+        neighbor_precomputation = NeighborPrecomputation()
+        model_evaluation = ModelEvaluation()
+        model_evaluation.model_trainer = model_trainer
+        model_evaluation.neighbor_precomputation = neighbor_precomputation
+        evaluation_configs = [
+            model_evaluation.model_evaluation_config,
+            model_trainer.model_training_config,
+            neighbor_precomputation.neighbor_precomputation_config,
+        ]
+        if model_trainer.model_training_config.feature_space == "embeddings":
+            model_evaluation.embedding_trainer = embedding_trainer
+            evaluation_configs.append(embedding_trainer.embedding_training_config)
+        stage_cache.run_in_place(
+            "model_evaluation",
+            model_evaluation.initiate_model_evaluation,
+            evaluation_configs,
+            user_rating_matrix,
+        )
+        stage_cache.run_in_place(
+            "neighbor_precomputation",
+            neighbor_precomputation.initiate_neighbor_precomputation,
+            neighbor_precomputation.neighbor_precomputation_config,
+            model_path,
+            item_embeddings or user_book_matrix,
+        )
+        # Publishing the serving artifacts as a new version the API can hot-swap
+        # to; unchanged serving artifacts are not published again
+        artifact_registry = ArtifactRegistry()
+        registry_config = artifact_registry.artifact_registry_config
+        stage_cache.run_in_place(
+            "artifact_publication",
+            artifact_registry.initiate_artifact_publication,
+            registry_config,
+            dependencies=[
+                os.path.join(registry_config.artifacts_dir, file_name)
+                for file_name in registry_config.serving_files
+            ],
+        )
+    finally:
+        # Saved even when a stage fails, to show where the run stopped
+        run_recorder.save(RUN_REPORT_FILE_PATH)
@@ -1,8 +1,12 @@
 import os
 import sys
+import json
 import pickle
+import hashlib
+import shutil
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 from src.logger import logging
 from src.exception import CustomException
 
@@ -51,3 +55,560 @@ def load_object(file_path):
 
     except Exception as e:
         raise CustomException(e, sys)
+
+
+def save_numpy_array(file_path, array):
+    """
+    Save a NumPy array to a .npy file.
+
+    Args:
+        file_path (str): Path to the file where the array will be saved.
+        array (np.ndarray): The array to be saved.
+
+    Raises:
+        CustomException: If an exception occurs during array saving.
+    """
+    try:
+        dir_path = os.path.dirname(file_path)
+
+        # Create the directory if it doesn't exist
+        os.makedirs(dir_path, exist_ok=True)
+
+        with open(file_path, "wb") as file_obj:
+            np.save(file_obj, array, allow_pickle=False)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_numpy_array(file_path, mmap_mode=None):
+    """
+    Load a NumPy array from a .npy file.
+
+    Args:
+        file_path (str): The file path of the array to load.
+        mmap_mode (str, optional): Memory-map mode passed to ``np.load``.
+
+    Returns:
+        np.ndarray: The loaded array.
+
+    Raises:
+        CustomException: If an error occurs while loading the array.
+    """
+    try:
+        return np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def save_csr_matrix(file_prefix, matrix):
+    """
+    Save a CSR matrix as separate .npy arrays so it can be memory-mapped.
+
+    Writes ``<file_prefix>_data.npy``, ``<file_prefix>_indices.npy``,
+    ``<file_prefix>_indptr.npy`` and ``<file_prefix>_shape.npy``.
+
+    Args:
+        file_prefix (str): Path prefix of the files to write.
+        matrix (scipy.sparse.csr_matrix): The matrix to be saved.
+
+    Raises:
+        CustomException: If an exception occurs during matrix saving.
+    """
+    try:
+        matrix = csr_matrix(matrix)
+        save_numpy_array(f"{file_prefix}_data.npy", matrix.data)
+        save_numpy_array(f"{file_prefix}_indices.npy", matrix.indices)
+        save_numpy_array(f"{file_prefix}_indptr.npy", matrix.indptr)
+        save_numpy_array(f"{file_prefix}_shape.npy", np.asarray(matrix.shape))
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_csr_matrix(file_prefix, mmap_mode="r"):
+    """
+    Load a CSR matrix written by ``save_csr_matrix``.
+
+    With the default ``mmap_mode="r"`` the arrays are memory-mapped read-only,
+    so every process opening the same files shares one page-cache copy.
+
+    Args:
+        file_prefix (str): Path prefix of the files to read.
+        mmap_mode (str, optional): Memory-map mode passed to ``np.load``.
+
+    Returns:
+        scipy.sparse.csr_matrix: The loaded matrix.
+
+    Raises:
+        CustomException: If an error occurs while loading the matrix.
+    """
+    try:
+        data = load_numpy_array(f"{file_prefix}_data.npy", mmap_mode=mmap_mode)
+        indices = load_numpy_array(f"{file_prefix}_indices.npy", mmap_mode=mmap_mode)
+        indptr = load_numpy_array(f"{file_prefix}_indptr.npy", mmap_mode=mmap_mode)
+        shape = tuple(load_numpy_array(f"{file_prefix}_shape.npy"))
+        return csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+class StringArray:
+    """
+    Read-only sequence of strings stored as one UTF-8 blob plus an offsets array.
+
+    String ``i`` is ``blob[offsets[i]:offsets[i + 1]]``; it is only decoded when
+    accessed, so a memory-mapped blob is never copied as a whole.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.blob[start:stop]).decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def save_string_array(file_prefix, strings):
+    """
+    Save a sequence of strings as an offset-indexed UTF-8 blob.
+
+    Writes ``<file_prefix>_blob.npy`` (uint8) and ``<file_prefix>_offsets.npy`` (int64).
+    Missing values are stored as empty strings.
+
+    Args:
+        file_prefix (str): Path prefix of the files to write.
+        strings (Iterable[str]): The strings to be saved.
+
+    Raises:
+        CustomException: If an exception occurs during saving.
+    """
+    try:
+        encoded = [
+            (value if isinstance(value, str) else "").encode("utf-8")
+            for value in strings
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        save_numpy_array(f"{file_prefix}_blob.npy", blob)
+        save_numpy_array(f"{file_prefix}_offsets.npy", offsets)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_string_array(file_prefix, mmap_mode="r"):
+    """
+    Load a string array written by ``save_string_array``.
+
+    Args:
+        file_prefix (str): Path prefix of the files to read.
+        mmap_mode (str, optional): Memory-map mode passed to ``np.load``.
+
+    Returns:
+        StringArray: Lazily decoded sequence of strings.
+
+    Raises:
+        CustomException: If an error occurs while loading the strings.
+    """
+    try:
+        blob = load_numpy_array(f"{file_prefix}_blob.npy", mmap_mode=mmap_mode)
+        offsets = load_numpy_array(f"{file_prefix}_offsets.npy", mmap_mode=mmap_mode)
+        return StringArray(blob, offsets)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def string_hash(value):
+    """
+    Stable signed 64-bit hash of a string's UTF-8 bytes (BLAKE2b).
+    """
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class SortedLookup:
+    """
+    Read-only map from values to their position, over sorted arrays.
+
+    ``keys`` holds the sorted int64 keys and ``rows`` the position of every
+    key, so a lookup is one ``np.searchsorted`` and both arrays can be
+    memory-mapped. Strings are keyed by ``string_hash`` and checked against
+    ``strings``, the sequence the lookup was built from, so a hash collision
+    never returns the wrong position.
+
+    Args:
+        keys (np.ndarray): Sorted keys.
+        rows (np.ndarray): Position of every key.
+        strings (Sequence[str], optional): The looked-up strings; None for
+            integer values.
+    """
+
+    def __init__(self, keys, rows, strings=None):
+        self.keys = keys
+        self.rows = rows
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, value, default=None):
+        if self.strings is None:
+            key = value
+        elif isinstance(value, str):
+            key = string_hash(value)
+        else:
+            return default
+        position = int(np.searchsorted(self.keys, key))
+        # Equal keys are adjacent; only strings can share one
+        while position < len(self.keys) and self.keys[position] == key:
+            row = int(self.rows[position])
+            if self.strings is None or self.strings[row] == value:
+                return row
+            position += 1
+        return default
+
+    def __getitem__(self, value):
+        row = self.get(value)
+        if row is None:
+            raise KeyError(value)
+        return row
+
+    def __contains__(self, value):
+        return self.get(value) is not None
+
+    def get_indexer(self, values):
+        """
+        Positions of many values, -1 for the missing ones.
+        """
+        if self.strings is not None or len(self.keys) == 0:
+            return np.fromiter(
+                (self.get(value, -1) for value in values),
+                dtype=np.int64,
+                count=len(values),
+            )
+        values = np.asarray(values)
+        positions = np.minimum(np.searchsorted(self.keys, values), len(self.keys) - 1)
+        return np.where(self.keys[positions] == values, self.rows[positions], -1)
+
+
+def build_sorted_lookup(values, strings=False):
+    """
+    Build a ``SortedLookup`` of values in memory.
+
+    Args:
+        values (Sequence): Integers, or strings when ``strings`` is set.
+        strings (bool): Whether the values are strings, keyed by their hash.
+
+    Returns:
+        SortedLookup: Lookup of every value's first position.
+    """
+    if strings:
+        values = list(values)
+        keys = np.fromiter(
+            (string_hash(value) for value in values), dtype=np.int64, count=len(values)
+        )
+    else:
+        keys = np.asarray(values)
+    # Stable, so the first of equal values is found first
+    rows = np.argsort(keys, kind="stable")
+    return SortedLookup(keys[rows], rows, values if strings else None)
+
+
+def save_sorted_lookup(file_prefix, values, strings=False):
+    """
+    Save a lookup of values to their position as memory-mappable arrays.
+
+    Writes ``<file_prefix>_keys.npy`` (sorted keys) and ``<file_prefix>_rows.npy``
+    (int64 positions). String values are not stored; pass their sequence to
+    ``load_sorted_lookup``.
+
+    Args:
+        file_prefix (str): Path prefix of the files to write.
+        values (Sequence): Integers, or strings when ``strings`` is set.
+        strings (bool): Whether the values are strings, keyed by their hash.
+
+    Raises:
+        CustomException: If an exception occurs during saving.
+    """
+    try:
+        lookup = build_sorted_lookup(values, strings=strings)
+        save_numpy_array(f"{file_prefix}_keys.npy", lookup.keys)
+        save_numpy_array(f"{file_prefix}_rows.npy", lookup.rows.astype(np.int64))
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_sorted_lookup(file_prefix, strings=None, mmap_mode="r"):
+    """
+    Load a lookup written by ``save_sorted_lookup``.
+
+    Args:
+        file_prefix (str): Path prefix of the files to read.
+        strings (Sequence[str], optional): The strings the lookup was saved
+            from, e.g. a ``StringArray``; None for integer values.
+        mmap_mode (str, optional): Memory-map mode passed to ``np.load``.
+
+    Returns:
+        SortedLookup: The loaded lookup.
+
+    Raises:
+        CustomException: If an error occurs while loading the lookup.
+    """
+    try:
+        return SortedLookup(
+            load_numpy_array(f"{file_prefix}_keys.npy", mmap_mode=mmap_mode),
+            load_numpy_array(f"{file_prefix}_rows.npy", mmap_mode=mmap_mode),
+            strings,
+        )
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def save_json(file_path, obj):
+    """
+    Save a JSON-serializable object to a file.
+
+    Args:
+        file_path (str): Path to the file where the object will be saved.
+        obj: The object to be saved.
+
+    Raises:
+        CustomException: If an exception occurs during object saving.
+    """
+    try:
+        dir_path = os.path.dirname(file_path)
+
+        # Create the directory if it doesn't exist
+        os.makedirs(dir_path, exist_ok=True)
+
+        with open(file_path, "w") as file_obj:
+            json.dump(obj, file_obj, indent=2)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_json(file_path):
+    """
+    Load a JSON object from a file.
+
+    Args:
+        file_path (str): The file path of the object to load.
+
+    Returns:
+        The loaded object.
+
+    Raises:
+        CustomException: If an error occurs while loading the object.
+    """
+    try:
+        with open(file_path, "r") as file_obj:
+            return json.load(file_obj)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+class CategoryEncoder:
+    """
+    Assigns stable int32 codes to string values seen across many chunks.
+
+    Missing values are encoded as the empty string.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.categories = []
+
+    def encode(self, values):
+        values = pd.Series(values, dtype=object).fillna("")
+        for value in pd.unique(values):
+            if value not in self.codes:
+                self.codes[value] = len(self.categories)
+                self.categories.append(value)
+        return values.map(self.codes).to_numpy(dtype=np.int32)
+
+
+class ColumnarWriter:
+    """
+    Streams DataFrame chunks to disk as one .npy file per column.
+
+    Numeric columns become ``<column>.npy``; string columns are stored like
+    ``save_string_array`` (``<column>_blob.npy`` and ``<column>_offsets.npy``);
+    category columns store int32 codes and reference a shared categories file
+    written by the caller. Chunks are appended to raw part files, so memory
+    stays bounded by the chunk size, and every part file gets its .npy header
+    on ``close``. Part files left in ``dir_path`` by an interrupted writer are
+    removed on creation. A ``schema.json`` records the column order and kinds.
+
+    Args:
+        dir_path (str): Directory of the columnar dataset.
+        category_columns (dict, optional): Column name to the file prefix of its
+            categories, relative to ``dir_path``.
+    """
+
+    def __init__(self, dir_path, category_columns=None):
+        self.dir_path = dir_path
+        self.category_columns = category_columns or {}
+        self.schema = None
+        self.lengths = {}
+        os.makedirs(dir_path, exist_ok=True)
+        # Part files of an interrupted run would prefix the new rows
+        for file_name in os.listdir(dir_path):
+            if file_name.endswith(".npy.part"):
+                os.remove(os.path.join(dir_path, file_name))
+
+    def _part_path(self, name):
+        return os.path.join(self.dir_path, f"{name}.npy.part")
+
+    def _append(self, name, array):
+        array = np.ascontiguousarray(array)
+        with open(self._part_path(name), "ab") as file_obj:
+            file_obj.write(array.tobytes())
+        self.lengths[name] = self.lengths.get(name, 0) + len(array)
+
+    def write(self, chunk):
+        """
+        Append a chunk with the same columns as the first one.
+        """
+        try:
+            if self.schema is None:
+                self.schema = {"columns": []}
+                for name, dtype in chunk.dtypes.items():
+                    if name in self.category_columns:
+                        column = {
+                            "name": name,
+                            "kind": "category",
+                            "dtype": "int32",
+                            "categories": self.category_columns[name],
+                        }
+                    elif pd.api.types.is_numeric_dtype(dtype):
+                        column = {"name": name, "kind": "numeric", "dtype": str(dtype)}
+                    else:
+                        column = {"name": name, "kind": "string", "dtype": "uint8"}
+                        self._append(f"{name}_offsets", np.zeros(1, dtype=np.int64))
+                    self.schema["columns"].append(column)
+
+            for column in self.schema["columns"]:
+                name = column["name"]
+                if column["kind"] != "string":
+                    self._append(name, chunk[name].to_numpy(dtype=column["dtype"]))
+                    continue
+
+                encoded = [
+                    value.encode("utf-8") if isinstance(value, str) else b""
+                    for value in chunk[name]
+                ]
+                lengths = np.fromiter(
+                    map(len, encoded), dtype=np.int64, count=len(encoded)
+                )
+                start = self.lengths.get(f"{name}_blob", 0)
+                self._append(
+                    f"{name}_blob", np.frombuffer(b"".join(encoded), dtype=np.uint8)
+                )
+                self._append(f"{name}_offsets", start + np.cumsum(lengths))
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def close(self):
+        """
+        Turn the part files into .npy files and write the schema.
+        """
+        try:
+            dtypes = {}
+            for column in self.schema["columns"]:
+                if column["kind"] == "string":
+                    dtypes[f"{column['name']}_blob"] = np.uint8
+                    dtypes[f"{column['name']}_offsets"] = np.int64
+                else:
+                    dtypes[column["name"]] = np.dtype(column["dtype"])
+
+            for name, dtype in dtypes.items():
+                part_path = self._part_path(name)
+                if not os.path.exists(part_path):
+                    open(part_path, "wb").close()
+                header = {
+                    "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                    "fortran_order": False,
+                    "shape": (self.lengths.get(name, 0),),
+                }
+                with open(os.path.join(self.dir_path, f"{name}.npy"), "wb") as file_obj:
+                    np.lib.format.write_array_header_1_0(file_obj, header)
+                    with open(part_path, "rb") as part_obj:
+                        shutil.copyfileobj(part_obj, file_obj)
+                os.remove(part_path)
+
+            save_json(os.path.join(self.dir_path, "schema.json"), self.schema)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def load_columnar_frame(dir_path, columns=None):
+    """
+    Load a dataset written by ``ColumnarWriter`` as a DataFrame.
+
+    Numeric columns keep their stored dtypes, string columns are decoded with
+    empty strings read back as missing values, and category columns become
+    pandas Categoricals sharing their categories file.
+
+    Args:
+        dir_path (str): Directory of the columnar dataset.
+        columns (list[str], optional): Subset of columns to load.
+
+    Returns:
+        pd.DataFrame: The loaded dataset.
+
+    Raises:
+        CustomException: If an error occurs while loading the dataset.
+    """
+    try:
+        schema = load_json(os.path.join(dir_path, "schema.json"))
+        categories_cache = {}
+        data = {}
+        for column in schema["columns"]:
+            name = column["name"]
+            if columns is not None and name not in columns:
+                continue
+
+            prefix = os.path.join(dir_path, name)
+            if column["kind"] == "numeric":
+                data[name] = load_numpy_array(f"{prefix}.npy")
+            elif column["kind"] == "string":
+                values = pd.Series(
+                    list(load_string_array(prefix, mmap_mode=None)), dtype=object
+                )
+                data[name] = values.mask(values == "")
+            else:
+                categories_prefix = os.path.normpath(
+                    os.path.join(dir_path, column["categories"])
+                )
+                if categories_prefix not in categories_cache:
+                    categories_cache[categories_prefix] = pd.Index(
+                        list(load_string_array(categories_prefix, mmap_mode=None))
+                    )
+                data[name] = pd.Categorical.from_codes(
+                    load_numpy_array(f"{prefix}.npy"),
+                    categories=categories_cache[categories_prefix],
+                )
+        return pd.DataFrame(data)
+
+    except Exception as e:
+        raise CustomException(e, sys)
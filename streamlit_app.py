@@ -1,7 +1,8 @@
 """
 Streamlit UI for interacting with the FastAPI recommendation service.
 
-Set API_URL env var to point at the FastAPI endpoint (default http://localhost:18000/recommend).
+Set API_URL env var to point at the FastAPI endpoint (default http://localhost:18000/recommend)
+and SEARCH_URL at its title search (default http://localhost:18000/search).
 """
 import os
 from typing import List, Optional
@@ -12,6 +13,7 @@ import streamlit as st
 # Config
 # Default to local Docker host mapping (compose maps 18000:8000).
 API_URL = os.environ.get("API_URL", "http://localhost:18000/recommend")
+SEARCH_URL = os.environ.get("SEARCH_URL", "http://localhost:18000/search")
 
 
 def render_header():
@@ -69,6 +71,16 @@ def render_results(book: str, recs: List[str], posters: List[Optional[str]]):
             )
 
 
+def suggest_titles(query: str, limit: int = 5) -> List[str]:
+    """Closest catalog titles of a query, or [] if the search is unavailable."""
+    try:
+        resp = requests.get(SEARCH_URL, params={"q": query, "limit": limit}, timeout=5)
+        resp.raise_for_status()
+    except Exception:  # suggestions are best effort
+        return []
+    return [match["title"] for match in resp.json().get("results", [])]
+
+
 def main():
     render_header()
     st.write("")
@@ -77,7 +89,7 @@ def main():
         book_title = st.text_input(
             "Book title",
             placeholder="e.g., A Bend in the Road",
-            help="Use an exact title from the catalog.",
+            help="Misspelled titles are matched to the closest catalog title.",
         )
         submitted = st.form_submit_button("Recommend", use_container_width=True)
 
@@ -99,11 +111,18 @@ def main():
             if not recs:
                 st.info(f"No recommendations found for “{book_title}”.")
             else:
-                render_results(data["book"], recs, posters)
+                if data.get("resolved_book"):
+                    st.caption(f"Showing results for “{data['resolved_book']}”.")
+                render_results(data.get("resolved_book") or data["book"], recs, posters)
         else:
             detail = resp.json().get("detail", "Unknown error")
             if resp.status_code == 404:
                 st.warning(detail)
+                suggestions = suggest_titles(book_title)
+                if suggestions:
+                    st.write(
+                        "Did you mean: " + ", ".join(f"“{s}”" for s in suggestions)
+                    )
             else:
                 st.error(f"API error ({resp.status_code}): {detail}")
 
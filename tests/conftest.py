@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.components.artifact_registry import ArtifactRegistry
+from src.components.data_ingestion import DataIngestion
+from src.components.data_preprocessing import DataTransformation
+from src.components.incremental_update import IncrementalUpdate
+from src.components.model_preparation import ModelTrainer
+from src.components.neighbor_precomputation import NeighborPrecomputation
+
+# Thresholds small enough for the synthetic data
+MIN_USER_RATINGS = 5
+MIN_BOOK_RATINGS = 4
+TOP_K = 5
+
+
+def make_books(n_books=30, n_titles=24):
+    """
+    Raw books rows; ISBNs past ``n_titles`` repeat earlier titles.
+    """
+    isbns = [f"{index:010d}" for index in range(n_books)]
+    return pd.DataFrame(
+        {
+            "ISBN": isbns,
+            "Book-Title": [f"Title {index % n_titles}" for index in range(n_books)],
+            "Book-Author": "Author",
+            "Year-Of-Publication": 2000,
+            "Publisher": "Publisher",
+            "Image-URL-S": [f"http://img/{isbn}-S.jpg" for isbn in isbns],
+            "Image-URL-M": [f"http://img/{isbn}-M.jpg" for isbn in isbns],
+            "Image-URL-L": [f"http://img/{isbn}-L.jpg" for isbn in isbns],
+        }
+    )
+
+
+def make_ratings(rng, user_ids, ratings_per_user, isbns):
+    """
+    Raw ratings rows of every user, a few of them for ISBNs outside the catalog.
+    """
+    rows = []
+    for user_id, n_ratings in zip(user_ids, ratings_per_user):
+        for isbn in rng.choice(isbns, size=n_ratings):
+            rows.append((user_id, isbn, int(rng.integers(0, 11))))
+        if rng.random() < 0.2:
+            rows.append((user_id, "9999999999", 5))
+    return pd.DataFrame(rows, columns=["User-ID", "ISBN", "Book-Rating"])
+
+
+def write_raw_data(data_dir, books, ratings):
+    """
+    Raw CSV files in the Book-Crossing layout, latin-1 encoded like the dataset.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    books.to_csv(
+        os.path.join(data_dir, "books.csv"), sep=";", index=False, encoding="latin-1"
+    )
+    users = pd.DataFrame(
+        {
+            "User-ID": sorted(set(ratings["User-ID"])),
+            "Location": "somewhere",
+            "Age": 30.0,
+        }
+    )
+    users.to_csv(
+        os.path.join(data_dir, "users.csv"), sep=";", index=False, encoding="latin-1"
+    )
+    ratings.to_csv(
+        os.path.join(data_dir, "ratings.csv"), sep=";", index=False, encoding="latin-1"
+    )
+
+
+def run_training(n_jobs=1):
+    """
+    Run the training stages into ./artifacts and publish a version.
+    """
+    books, _, ratings = DataIngestion().initiate_data_ingestion()
+
+    transformation = DataTransformation()
+    transformation.data_transformation_config.min_user_ratings = MIN_USER_RATINGS
+    transformation.data_transformation_config.min_book_ratings = MIN_BOOK_RATINGS
+    _, user_book_matrix, _, user_rating_matrix = (
+        transformation.initiate_data_transformation(books, None, ratings)
+    )
+
+    IncrementalUpdate().initiate_incremental_state(
+        books, ratings, MIN_USER_RATINGS, MIN_BOOK_RATINGS
+    )
+
+    model_path = ModelTrainer().initiate_model_training(
+        user_book_matrix, user_rating_matrix
+    )
+    neighbor_precomputation = NeighborPrecomputation()
+    neighbor_precomputation.neighbor_precomputation_config.top_k = TOP_K
+    neighbor_precomputation.neighbor_precomputation_config.n_jobs = n_jobs
+    neighbor_precomputation.initiate_neighbor_precomputation(
+        model_path, user_book_matrix
+    )
+    return ArtifactRegistry().initiate_artifact_publication()
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
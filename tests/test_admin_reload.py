@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as api
+from src.pipelines import prediction_pipeline
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(prediction_pipeline.service, "start_loading", lambda: None)
+    monkeypatch.setattr(prediction_pipeline.service, "reload", lambda: True)
+    monkeypatch.setattr(
+        prediction_pipeline.service, "status", lambda: {"status": "ready"}
+    )
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    monkeypatch.delenv("ALLOW_UNAUTHENTICATED_RELOAD", raising=False)
+    with TestClient(api.app) as client:
+        yield client
+
+
+def test_reload_is_refused_without_a_configured_token(client, monkeypatch):
+    response = client.post("/admin/reload")
+    assert response.status_code == 403
+    assert "ADMIN_TOKEN" in response.json()["detail"]
+
+    monkeypatch.setenv("ALLOW_UNAUTHENTICATED_RELOAD", "1")
+    assert client.post("/admin/reload").json() == {
+        "reloaded": True,
+        "status": "ready",
+    }
+
+
+def test_reload_requires_the_configured_token(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    monkeypatch.setenv("ALLOW_UNAUTHENTICATED_RELOAD", "1")
+    assert client.post("/admin/reload").status_code == 403
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+
+    response = client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["reloaded"] is True
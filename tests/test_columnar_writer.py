@@ -0,0 +1,21 @@
+import pandas as pd
+
+from src.utils import ColumnarWriter, load_columnar_frame
+
+
+def test_rerun_after_an_interrupted_write_keeps_only_the_new_rows(tmp_path):
+    dir_path = str(tmp_path / "ratings")
+    # Interrupted before close: only part files are left behind
+    interrupted = ColumnarWriter(dir_path)
+    interrupted.write(pd.DataFrame({"rating": [1, 2, 3], "ISBN": ["x", "y", "z"]}))
+
+    writer = ColumnarWriter(dir_path)
+    writer.write(pd.DataFrame({"rating": [7], "ISBN": ["a"]}))
+    writer.write(pd.DataFrame({"rating": [8], "ISBN": [None]}))
+    writer.close()
+
+    frame = load_columnar_frame(dir_path)
+    assert frame["rating"].tolist() == [7, 8]
+    assert frame["ISBN"].tolist()[0] == "a"
+    assert frame["ISBN"].isna().tolist() == [False, True]
+    assert not list(tmp_path.rglob("*.part"))
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from conftest import (
+    MIN_BOOK_RATINGS,
+    MIN_USER_RATINGS,
+    make_books,
+    make_ratings,
+    write_raw_data,
+)
+from src.components.data_ingestion import DataIngestion
+from src.components.data_preprocessing import DataTransformation, rating_weights
+from src.utils import load_columnar_frame, load_object
+
+
+def _merge_reference(books_df, ratings_df):
+    """
+    Final ratings and matrix entries the way the pandas merges produced them.
+    """
+    user_counts = ratings_df["user_id"].value_counts()
+    active_users = user_counts[user_counts > MIN_USER_RATINGS].index
+    ratings_df = ratings_df[ratings_df["user_id"].isin(active_users)]
+
+    merged = ratings_df.merge(books_df, on="ISBN")
+    title_counts = merged.groupby("title").rating.count().reset_index()
+    final_ratings_df = merged.merge(title_counts, on="title")
+    final_ratings_df = final_ratings_df[
+        final_ratings_df["rating_y"] >= MIN_BOOK_RATINGS
+    ]
+    final_ratings_df.drop_duplicates(["title", "user_id"], inplace=True)
+
+    matrix = final_ratings_df.pivot_table(
+        columns="user_id", index="title", values="rating_y", fill_value=0
+    )
+    rating_matrix = final_ratings_df.assign(
+        weight=rating_weights(final_ratings_df["rating_x"])
+    ).pivot_table(columns="user_id", index="title", values="weight", fill_value=0)
+    return final_ratings_df, matrix, rating_matrix
+
+
+def test_code_filters_match_the_merge_path(tmp_path, monkeypatch, rng):
+    books = make_books(n_books=90, n_titles=80)
+    # A book without a title never joins a title count
+    books.loc[5, "Book-Title"] = None
+    user_ids = np.arange(1, 41)
+    ratings = make_ratings(
+        rng, user_ids, rng.integers(1, 16, size=len(user_ids)), books["ISBN"]
+    )
+    # Repeated (title, user) pairs, through the same and through another ISBN
+    repeats = ratings.sample(frac=0.1, random_state=0)
+    ratings = pd.concat([ratings, repeats], ignore_index=True)
+
+    monkeypatch.chdir(tmp_path)
+    write_raw_data("Data", books, ratings)
+    books_path, users_path, ratings_path = DataIngestion().initiate_data_ingestion()
+
+    transformation = DataTransformation()
+    config = transformation.data_transformation_config
+    config.min_user_ratings = MIN_USER_RATINGS
+    config.min_book_ratings = MIN_BOOK_RATINGS
+    ratings_file, matrix_file, titles_file, rating_matrix_file = (
+        transformation.initiate_data_transformation(
+            books_path, users_path, ratings_path
+        )
+    )
+
+    expected_ratings, expected_matrix, expected_rating_matrix = _merge_reference(
+        load_columnar_frame(books_path), load_columnar_frame(ratings_path)
+    )
+    assert len(expected_ratings) > 0
+
+    final_ratings = load_object(ratings_file)
+    pd.testing.assert_frame_equal(final_ratings, expected_ratings)
+
+    matrix = load_object(matrix_file)
+    assert list(load_object(titles_file)) == list(expected_matrix.index)
+    assert list(load_object(config.user_ids_object_file_path)) == list(
+        expected_matrix.columns
+    )
+    np.testing.assert_array_equal(matrix.toarray(), expected_matrix.to_numpy())
+    # The users' own ratings, not the title rating counts, on the same entries
+    rating_matrix = load_object(rating_matrix_file)
+    np.testing.assert_array_equal(
+        rating_matrix.toarray(), expected_rating_matrix.to_numpy()
+    )
+    assert (rating_matrix != 0).toarray().tolist() == (matrix != 0).toarray().tolist()
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import (
+    MIN_BOOK_RATINGS,
+    MIN_USER_RATINGS,
+    make_books,
+    make_ratings,
+    run_training,
+    write_raw_data,
+)
+from src.components.incremental_update import IncrementalUpdate
+from src.utils import load_csr_matrix, load_json, load_numpy_array, load_object
+
+
+def _matrix_entries(matrix, titles, user_ids):
+    matrix = matrix.tocoo()
+    return pd.DataFrame(
+        {
+            "title": np.asarray(titles, dtype=object)[matrix.row],
+            "user_id": np.asarray(user_ids)[matrix.col],
+            "value": matrix.data,
+        }
+    ).sort_values(["title", "user_id"], ignore_index=True)
+
+
+def _neighbors(artifact_dir, titles):
+    indices = load_numpy_array(os.path.join(artifact_dir, "neighbor_indices.npy"))
+    distances = load_numpy_array(os.path.join(artifact_dir, "neighbor_distances.npy"))
+    titles = np.asarray(titles, dtype=object)
+    return {
+        title: (titles[row_indices], row_distances)
+        for title, row_indices, row_distances in zip(titles, indices, distances)
+    }
+
+
+def test_incremental_update_matches_full_retrain(tmp_path, monkeypatch, rng):
+    books = make_books(n_books=90, n_titles=80)
+    isbns = books["ISBN"].to_numpy()
+    # Active and inactive users, some of them crossing the threshold in the delta
+    base = make_ratings(rng, np.arange(1, 81), rng.integers(2, 20, size=80), isbns)
+    delta = pd.concat(
+        [
+            make_ratings(rng, np.arange(1, 81, 8), rng.integers(1, 4, size=10), isbns),
+            # New users, active right away
+            make_ratings(rng, [100, 101], [6, 6], isbns),
+        ],
+        ignore_index=True,
+    )
+
+    os.makedirs(tmp_path / "incremental")
+    monkeypatch.chdir(tmp_path / "incremental")
+    write_raw_data("Data", books, base)
+    run_training()
+    delta_path = str(tmp_path / "delta.csv")
+    delta.to_csv(delta_path, sep=";", index=False)
+
+    # The update reads the thresholds of the training run from its state
+    incremental_update = IncrementalUpdate()
+    version_dir = os.path.abspath(
+        incremental_update.initiate_incremental_update(delta_path)
+    )
+    manifest = load_json(os.path.join(version_dir, "manifest.json"))
+    assert manifest["touched_titles"] > 0
+    assert manifest["new_titles"] > 0
+    assert manifest["new_users"] > 0
+    state = load_object(os.path.join(version_dir, "incremental_state.pkl"))
+    assert (state["min_user_ratings"], state["min_book_ratings"]) == (
+        MIN_USER_RATINGS,
+        MIN_BOOK_RATINGS,
+    )
+
+    os.makedirs(tmp_path / "full")
+    monkeypatch.chdir(tmp_path / "full")
+    write_raw_data("Data", books, pd.concat([base, delta], ignore_index=True))
+    full_dir = os.path.abspath(run_training())
+
+    incremental_titles = list(load_object(os.path.join(version_dir, "books_title.pkl")))
+    full_titles = list(load_object(os.path.join(full_dir, "books_title.pkl")))
+    assert sorted(incremental_titles) == sorted(full_titles)
+
+    # Same entries, up to the order of the rows and columns
+    pd.testing.assert_frame_equal(
+        _matrix_entries(
+            load_csr_matrix(os.path.join(version_dir, "book_matrix")),
+            incremental_titles,
+            load_object(os.path.join(version_dir, "user_ids.pkl")),
+        ),
+        _matrix_entries(
+            load_csr_matrix(os.path.join(full_dir, "book_matrix")),
+            full_titles,
+            load_object(os.path.join(full_dir, "user_ids.pkl")),
+        ),
+    )
+
+    # Same users' own ratings
+    pd.testing.assert_frame_equal(
+        _matrix_entries(
+            load_csr_matrix(os.path.join(version_dir, "user_matrix")).T,
+            incremental_titles,
+            load_object(os.path.join(version_dir, "user_ids.pkl")),
+        ),
+        _matrix_entries(
+            load_csr_matrix(os.path.join(full_dir, "user_matrix")).T,
+            full_titles,
+            load_object(os.path.join(full_dir, "user_ids.pkl")),
+        ),
+    )
+
+    # Same neighbor distances; titles may only differ among ties at the cutoff
+    incremental_neighbors = _neighbors(version_dir, incremental_titles)
+    full_neighbors = _neighbors(full_dir, full_titles)
+    for title, (full_ids, full_distances) in full_neighbors.items():
+        ids, distances = incremental_neighbors[title]
+        np.testing.assert_allclose(distances, full_distances, rtol=1e-5, atol=1e-4)
+        inside = full_distances < full_distances[-1] - 1e-4
+        assert set(ids[inside]) == set(full_ids[inside])
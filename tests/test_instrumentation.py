@@ -0,0 +1,43 @@
+import sys
+import time
+
+import numpy as np
+
+import src.instrumentation
+from src.instrumentation import RunRecorder, max_rss_mb
+
+
+def test_steps_record_their_peak_memory_by_default():
+    recorder = RunRecorder(trace_memory=False, rss_sample_seconds=0.001)
+    with recorder.step("outer") as outer:
+        with recorder.step("allocate") as step:
+            block = np.ones(10_000_000)
+            time.sleep(0.05)
+            del block
+    assert recorder._sampler is None
+
+    # 80 MB were resident while the step ran, and were freed before it ended
+    assert step.peak_mb > 60
+    assert outer.peak_mb >= step.peak_mb
+    assert step.traced_peak_mb is None
+    assert recorder.report()["steps"][1]["peak_mb"] == step.peak_mb
+
+
+def test_traced_peak_is_opt_in():
+    recorder = RunRecorder(trace_memory=True)
+    with recorder.step("allocate") as step:
+        block = [str(value) for value in range(100_000)]
+        del block
+    assert step.traced_peak_mb > 1
+    assert step.peak_mb is not None
+
+
+def test_max_rss_units_follow_the_platform(monkeypatch):
+    class Usage:
+        ru_maxrss = 2_000_000
+
+    monkeypatch.setattr(src.instrumentation.resource, "getrusage", lambda who: Usage)
+    monkeypatch.setattr(sys, "platform", "darwin")
+    assert max_rss_mb() == 2
+    monkeypatch.setattr(sys, "platform", "linux")
+    assert max_rss_mb() == 2000
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as api
+from src.pipelines import prediction_pipeline
+from src.pipelines.micro_batcher import (
+    MicroBatcher,
+    QueueFullError,
+    ScoringCancelledError,
+)
+
+
+def test_concurrent_requests_are_grouped_by_number_of_recommendations():
+    calls = []
+
+    def batch_fn(titles, n_recommendations):
+        calls.append((sorted(titles), n_recommendations))
+        return [
+            KeyError(title) if title == "missing" else (title, n_recommendations)
+            for title in titles
+        ]
+
+    async def main():
+        batcher = MicroBatcher(batch_fn, max_workers=1, max_wait_ms=20)
+        try:
+            requests = [("a", 5), ("b", 5), ("c", 3), ("missing", 5), ("d", 3)]
+            return await asyncio.gather(
+                *(batcher.submit(title, n) for title, n in requests),
+                return_exceptions=True,
+            )
+        finally:
+            batcher.shutdown()
+
+    results = asyncio.run(main())
+
+    # One call per number of recommendations
+    assert len(calls) == 2
+    assert dict((n, titles) for titles, n in calls) == {
+        5: ["a", "b", "missing"],
+        3: ["c", "d"],
+    }
+    assert results[:3] == [("a", 5), ("b", 5), ("c", 3)]
+    assert isinstance(results[3], KeyError)
+    assert results[4] == ("d", 3)
+
+
+def test_full_queue_rejects_submissions_and_single_calls():
+    release = threading.Event()
+
+    def batch_fn(titles, n_recommendations):
+        release.wait(timeout=5)
+        return titles
+
+    async def main():
+        batcher = MicroBatcher(batch_fn, max_workers=1, max_queue_size=2, max_wait_ms=0)
+        try:
+            waiting = [asyncio.ensure_future(batcher.submit(t, 5)) for t in "ab"]
+            await asyncio.sleep(0.01)
+            with pytest.raises(QueueFullError):
+                await batcher.submit("c", 5)
+            with pytest.raises(QueueFullError):
+                await batcher.run(str.upper, "c")
+            release.set()
+            results = await asyncio.gather(*waiting)
+            # Capacity is released once the requests are answered
+            return results, await batcher.run(str.upper, "c"), batcher.stats()
+        finally:
+            batcher.shutdown()
+
+    results, resolved, stats = asyncio.run(main())
+
+    assert results == ["a", "b"]
+    assert resolved == "C"
+    assert stats["rejected"] == 2
+    assert stats["in_flight"] == 0
+
+
+def test_shutdown_fails_the_requests_it_cancels():
+    release = threading.Event()
+
+    def batch_fn(titles, n_recommendations):
+        release.wait(timeout=5)
+        return titles
+
+    async def main():
+        batcher = MicroBatcher(batch_fn, max_workers=1, max_wait_ms=0)
+        running = asyncio.ensure_future(batcher.submit("a", 5))
+        # Queued behind the running batch, then cancelled by the shutdown
+        queued = asyncio.ensure_future(batcher.submit("b", 3))
+        await asyncio.sleep(0.01)
+        batcher.max_wait_ms = 1000
+        # Still waiting for its batch to be flushed
+        waiting = asyncio.ensure_future(batcher.submit("c", 5))
+        await asyncio.sleep(0.01)
+        batcher.shutdown()
+        release.set()
+        results = await asyncio.wait_for(
+            asyncio.gather(running, queued, waiting, return_exceptions=True), 1
+        )
+        # Batches flushed after the shutdown are failed too
+        batcher.max_wait_ms = 0
+        with pytest.raises(ScoringCancelledError):
+            await asyncio.wait_for(batcher.submit("d", 5), 1)
+        return results, batcher.stats()
+
+    (result, *cancelled), stats = asyncio.run(main())
+
+    assert result == "a"
+    assert all(isinstance(error, ScoringCancelledError) for error in cancelled)
+    assert stats["in_flight"] == 0
+
+
+@pytest.fixture
+def client_factory(monkeypatch):
+    monkeypatch.setattr(prediction_pipeline.service, "start_loading", lambda: None)
+    monkeypatch.setattr(
+        prediction_pipeline,
+        "recommend_books",
+        lambda titles, n_recommendations: [
+            ([f"{title} sequel"], ["http://img/poster.jpg"]) for title in titles
+        ],
+    )
+    api.recommendation_cache.clear()
+    yield lambda: TestClient(api.app)
+    api.recommendation_cache.clear()
+
+
+def test_every_startup_gets_a_working_scoring_pool(client_factory):
+    for title in ("First", "Second"):
+        with client_factory() as client:
+            response = client.post("/recommend", json={"book": title})
+            assert response.status_code == 200
+            assert response.json()["recommendations"] == [f"{title} sequel"]
+
+
+def test_recommend_answers_503_when_the_scoring_queue_is_full(client_factory):
+    with client_factory() as client:
+        client.app.state.scoring_batcher.max_queue_size = 0
+        response = client.post("/recommend", json={"book": "Uncached"})
+        assert response.status_code == 503
+        metrics = client.get("/metrics").text
+        assert "scoring_rejected_total 1" in metrics
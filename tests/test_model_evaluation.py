@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import make_books, make_ratings, run_training, write_raw_data
+from src.components.model_evaluation import (
+    ModelEvaluation,
+    holdout_split,
+    title_count_matrix,
+)
+from src.components.neighbor_index import attach_index
+from src.utils import load_csr_matrix, load_numpy_array, load_object
+
+
+@pytest.fixture
+def version_dir(tmp_path, monkeypatch, rng):
+    books = make_books(n_books=60, n_titles=50)
+    ratings = make_ratings(
+        rng, np.arange(1, 61), rng.integers(4, 20, size=60), books["ISBN"]
+    )
+    monkeypatch.chdir(tmp_path)
+    write_raw_data("Data", books, ratings)
+    return run_training()
+
+
+def test_training_features_only_count_training_ratings(version_dir):
+    user_matrix = load_object(os.path.join("artifacts", "user_rating_matrix.pkl"))
+    user_matrix = user_matrix.T.tocsr()
+    train, test, _ = holdout_split(user_matrix, 0.5, 2, None, seed=0)
+
+    counts = title_count_matrix(train)
+    assert (counts != 0).toarray().tolist() == (train.T != 0).toarray().tolist()
+    # Every entry holds its title's number of training ratings, which leaves
+    # out the held-out ones
+    n_train = np.diff(counts.indptr)
+    np.testing.assert_array_equal(counts.data, np.repeat(n_train, n_train))
+    n_held_out = np.bincount(test.indices, minlength=test.shape[1])
+    assert n_held_out.sum() > 0
+    np.testing.assert_array_equal(
+        n_train + n_held_out, np.diff(user_matrix.T.tocsr().indptr)
+    )
+
+
+def test_neighbor_table_is_the_served_one(version_dir):
+    # The trained model and its features give the served table back
+    model = attach_index(
+        load_object(os.path.join(version_dir, "model_spec.pkl")),
+        load_csr_matrix(os.path.join(version_dir, "book_matrix")),
+    )
+    features = load_object(os.path.join("artifacts", "user_book_matrix.pkl")).tocsr()
+    served_indices = load_numpy_array(os.path.join(version_dir, "neighbor_indices.npy"))
+    served_distances = load_numpy_array(
+        os.path.join(version_dir, "neighbor_distances.npy")
+    )
+
+    evaluation = ModelEvaluation()
+    evaluation.model_evaluation_config.n_jobs = 1
+    n_neighbors = served_indices.shape[1]
+    indices, distances, engine = evaluation.neighbor_table(model, features, n_neighbors)
+
+    assert engine == "blocked"
+    np.testing.assert_array_equal(indices, served_indices)
+    np.testing.assert_allclose(distances, served_distances, rtol=1e-6)
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from src.components.neighbor_index import truncated_svd
+
+
+@pytest.mark.parametrize(
+    "shape, rank, expected_rank",
+    [((6, 4), 32, 3), ((6, 4), 2, 2), ((1, 4), 8, 1), ((4, 1), 8, 1), ((0, 4), 8, 0)],
+)
+def test_rank_is_clipped_to_the_matrix(rng, shape, rank, expected_rank):
+    matrix = csr_matrix(rng.integers(0, 3, size=shape).astype(np.float64))
+    embeddings, components = truncated_svd(matrix, rank)
+
+    assert embeddings.shape == (shape[0], expected_rank)
+    assert components.shape == (expected_rank, shape[1])
+    singular_values = np.linalg.norm(embeddings, axis=0)
+    expected = np.linalg.svd(matrix.toarray(), compute_uv=False)[:expected_rank]
+    np.testing.assert_allclose(singular_values, expected, rtol=1e-4)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from conftest import (
+    MIN_BOOK_RATINGS,
+    MIN_USER_RATINGS,
+    TOP_K,
+    make_books,
+    make_ratings,
+    write_raw_data,
+)
+from src.components.data_ingestion import DataIngestion
+from src.components.data_preprocessing import DataTransformation
+from src.components.model_preparation import ModelTrainer
+from src.components.neighbor_precomputation import NeighborPrecomputation
+from src.exception import CustomException
+from src.utils import load_json, load_numpy_array, load_object
+
+
+@pytest.fixture
+def training_matrices(tmp_path, monkeypatch, rng):
+    books = make_books(n_books=60, n_titles=50)
+    ratings = make_ratings(
+        rng, np.arange(1, 61), rng.integers(4, 20, size=60), books["ISBN"]
+    )
+    monkeypatch.chdir(tmp_path)
+    write_raw_data("Data", books, ratings)
+    books_path, _, ratings_path = DataIngestion().initiate_data_ingestion()
+
+    transformation = DataTransformation()
+    transformation.data_transformation_config.min_user_ratings = MIN_USER_RATINGS
+    transformation.data_transformation_config.min_book_ratings = MIN_BOOK_RATINGS
+    _, user_book_matrix, _, user_rating_matrix = (
+        transformation.initiate_data_transformation(books_path, None, ratings_path)
+    )
+    return user_book_matrix, user_rating_matrix
+
+
+def _train(matrices, index_backend):
+    trainer = ModelTrainer()
+    config = trainer.model_training_config
+    config.index_backend = index_backend
+    config.ivf_n_probe = 1
+    config.ivf_rank = 4
+    return trainer.initiate_model_training(*matrices)
+
+
+def _precompute(model_path, user_book_matrix, **config):
+    neighbor_precomputation = NeighborPrecomputation()
+    precomputation_config = neighbor_precomputation.neighbor_precomputation_config
+    precomputation_config.top_k = TOP_K
+    precomputation_config.n_jobs = 1
+    for name, value in config.items():
+        setattr(precomputation_config, name, value)
+    indices_path, _ = neighbor_precomputation.initiate_neighbor_precomputation(
+        model_path, user_book_matrix
+    )
+    return load_numpy_array(indices_path), load_json(
+        precomputation_config.report_file_path
+    )
+
+
+def test_engine_follows_the_trained_backend(training_matrices):
+    user_book_matrix = training_matrices[0]
+
+    model_path = _train(training_matrices, "brute")
+    _, report = _precompute(model_path, user_book_matrix)
+    assert (report["engine"], report["metric"]) == ("blocked", "euclidean")
+
+    # The served table of an IVF model holds the neighbors its queries return
+    model_path = _train(training_matrices, "ivf")
+    indices, report = _precompute(model_path, user_book_matrix)
+    assert (report["engine"], report["metric"]) == ("index", "euclidean")
+    model = load_object(model_path)
+    features = load_object(user_book_matrix).tocsr()
+    expected = model.kneighbors(features, n_neighbors=indices.shape[1])[1]
+    np.testing.assert_array_equal(indices, expected)
+
+
+def test_metric_other_than_the_models_is_rejected(training_matrices):
+    model_path = _train(training_matrices, "brute")
+    with pytest.raises(CustomException, match="does not match"):
+        _precompute(model_path, training_matrices[0], metric="cosine")
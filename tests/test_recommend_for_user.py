@@ -0,0 +1,78 @@
+import os
+import shutil
+
+import numpy as np
+
+from conftest import make_books, make_ratings, run_training, write_raw_data
+from src.components.data_preprocessing import rating_weights
+from src.pipelines.prediction_pipeline import RecommenderArtifacts
+from src.utils import load_object
+
+
+def _own_ratings(artifacts, final_ratings, user_id):
+    """
+    ``{title row: weight}`` of a user's own ratings in the final ratings.
+    """
+    rows = final_ratings[final_ratings["user_id"] == user_id]
+    return {
+        artifacts.title_to_row[title]: weight
+        for title, weight in zip(rows["title"], rating_weights(rows["rating_x"]))
+    }
+
+
+def test_users_are_scored_with_their_own_ratings(tmp_path, monkeypatch, rng):
+    books = make_books(n_books=60, n_titles=50)
+    ratings = make_ratings(
+        rng, np.arange(1, 41), rng.integers(4, 20, size=40), books["ISBN"]
+    )
+    monkeypatch.chdir(tmp_path)
+    write_raw_data("Data", books, ratings)
+    version_dir = run_training()
+
+    artifacts = RecommenderArtifacts(version_dir)
+    final_ratings = load_object(os.path.join("artifacts", "ratings.pkl"))
+    user_id = final_ratings["user_id"].value_counts().index[0]
+    own_ratings = _own_ratings(artifacts, final_ratings, user_id)
+    # The title rating counts would give different weights
+    assert set(own_ratings.values()) != set(
+        final_ratings.loc[final_ratings["user_id"] == user_id, "rating_y"]
+    )
+
+    row = artifacts._user_row(user_id)
+    user_row = artifacts.user_matrix[row]
+    assert dict(zip(user_row.indices, user_row.data)) == own_ratings
+
+    # Votes of every rated title for its neighbors, weighted by the rating
+    n_similar = artifacts.neighbor_indices.shape[1]
+    scores = np.zeros(len(artifacts.books_title))
+    for title_row, weight in own_ratings.items():
+        neighbors = artifacts.neighbor_indices[title_row, :n_similar]
+        distances = artifacts.neighbor_distances[title_row, :n_similar]
+        np.add.at(scores, neighbors, weight / (1 + distances.astype(np.float64)))
+    scores[list(own_ratings)] = 0
+    candidates = np.flatnonzero(scores > 0)
+    expected = candidates[np.lexsort((candidates, -scores[candidates]))][:5]
+
+    recommendations, _ = artifacts.recommend_for_user(user_id, 5)
+    assert recommendations == [artifacts.books_title[row] for row in expected]
+
+    # Artifact sets without the user matrix rebuild it from the final ratings
+    legacy_dir = tmp_path / "legacy"
+    shutil.copytree(version_dir, legacy_dir)
+    shutil.copy(os.path.join("artifacts", "ratings.pkl"), legacy_dir)
+    for file_name in os.listdir(legacy_dir):
+        if file_name.startswith("user_matrix_"):
+            os.remove(legacy_dir / file_name)
+    legacy = RecommenderArtifacts(legacy_dir)
+    assert (legacy.user_matrix != artifacts.user_matrix).nnz == 0
+
+    # Older artifact sets without the lookup arrays build them in memory
+    for file_name in os.listdir(legacy_dir):
+        if "_lookup_" in file_name or file_name.startswith("books_poster_"):
+            os.remove(legacy_dir / file_name)
+    legacy = RecommenderArtifacts(legacy_dir)
+    assert legacy.recommend_for_user(user_id, 5) == artifacts.recommend_for_user(
+        user_id, 5
+    )
+    title = artifacts.books_title[0]
+    assert legacy.recommend_book(title) == artifacts.recommend_book(title)
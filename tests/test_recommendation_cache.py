@@ -0,0 +1,62 @@
+from src.pipelines.recommendation_cache import RecommendationCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = RecommendationCache(max_size=4, ttl_seconds=10, clock=clock)
+    cache.put(("Title", 5), ["a"])
+
+    clock.now = 9.9
+    assert cache.get(("Title", 5)) == ["a"]
+    clock.now = 10.0
+    assert cache.get(("Title", 5)) is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RecommendationCache(max_size=2, ttl_seconds=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_version_change_invalidates_entries():
+    version = {"current": "v1"}
+    cache = RecommendationCache(
+        max_size=4, ttl_seconds=None, version_fn=lambda: version["current"]
+    )
+    cache.put("a", 1, version="v1")
+    assert cache.get("a") == 1
+
+    version["current"] = "v2"
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+    # Results computed with the previous version are not stored
+    cache.put("a", 1, version="v1")
+    assert cache.get("a") is None
+    cache.put("a", 2, version="v2")
+    assert cache.get("a") == 2
+
+
+def test_zero_size_disables_caching():
+    cache = RecommendationCache(max_size=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
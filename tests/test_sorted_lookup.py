@@ -0,0 +1,38 @@
+import numpy as np
+
+import src.utils
+from src.utils import (
+    build_sorted_lookup,
+    load_sorted_lookup,
+    load_string_array,
+    save_sorted_lookup,
+    save_string_array,
+)
+
+
+def test_saved_lookup_finds_every_value(tmp_path):
+    titles = ["b", "a", "c", "a"]
+    save_string_array(str(tmp_path / "titles"), titles)
+    save_sorted_lookup(str(tmp_path / "titles_lookup"), titles, strings=True)
+    save_sorted_lookup(str(tmp_path / "ids_lookup"), [30, 10, 20])
+
+    title_lookup = load_sorted_lookup(
+        str(tmp_path / "titles_lookup"), strings=load_string_array(tmp_path / "titles")
+    )
+    assert isinstance(title_lookup.keys, np.memmap)
+    # Repeated values map to their first position
+    assert [title_lookup[title] for title in "abc"] == [1, 0, 2]
+    assert "d" not in title_lookup and title_lookup.get(3) is None
+    np.testing.assert_array_equal(title_lookup.get_indexer(["c", "d"]), [2, -1])
+
+    id_lookup = load_sorted_lookup(str(tmp_path / "ids_lookup"))
+    assert id_lookup.get(20) == 2 and id_lookup.get(25) is None
+    np.testing.assert_array_equal(
+        id_lookup.get_indexer([10, 5, 30, 40]), [1, -1, 0, -1]
+    )
+
+
+def test_string_hash_collisions_are_resolved(monkeypatch):
+    monkeypatch.setattr(src.utils, "string_hash", lambda value: 7)
+    lookup = build_sorted_lookup(["x", "y", "z"], strings=True)
+    assert [lookup.get(title) for title in ["z", "x", "y", "w"]] == [2, 0, 1, None]
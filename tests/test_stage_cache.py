@@ -0,0 +1,115 @@
+import os
+from dataclasses import dataclass
+
+import pytest
+
+from src.components.stage_cache import StageCache
+
+
+@dataclass
+class CountingConfig:
+    scale: int = 2
+    output_file_path: str = os.path.join("artifacts", "counted.txt")
+
+
+class CountingStage:
+    """
+    Stage writing its scaled input to its output file, counting its runs.
+    """
+
+    def __init__(self):
+        self.counting_config = CountingConfig()
+        self.runs = 0
+
+    def initiate_counting(self, input_path):
+        self.runs += 1
+        config = self.counting_config
+        with open(input_path) as file_obj:
+            value = int(file_obj.read()) * config.scale
+        os.makedirs(os.path.dirname(config.output_file_path), exist_ok=True)
+        with open(config.output_file_path, "w") as file_obj:
+            file_obj.write(str(value))
+        return config.output_file_path, value
+
+
+@pytest.fixture
+def input_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("input.txt", "w") as file_obj:
+        file_obj.write("3")
+    return "input.txt"
+
+
+def _run_in_place(stage_cache, stage, input_path):
+    return stage_cache.run_in_place(
+        "counting", stage.initiate_counting, stage.counting_config, input_path
+    )
+
+
+def test_run_in_place_skips_unchanged_stages(input_path):
+    stage = CountingStage()
+    result = _run_in_place(StageCache(), stage, input_path)
+    assert result == (os.path.join("artifacts", "counted.txt"), 6)
+
+    # A new process with the same inputs and configuration skips the stage
+    assert _run_in_place(StageCache(), stage, input_path) == result
+    assert stage.runs == 1
+
+    # Touching the input without changing its content keeps the key
+    os.utime(input_path, ns=(0, 0))
+    _run_in_place(StageCache(), stage, input_path)
+    assert stage.runs == 1
+
+
+def test_run_in_place_reruns_on_changes(input_path):
+    stage = CountingStage()
+    _run_in_place(StageCache(), stage, input_path)
+
+    # A changed input
+    with open(input_path, "w") as file_obj:
+        file_obj.write("4")
+    assert _run_in_place(StageCache(), stage, input_path)[1] == 8
+    assert stage.runs == 2
+
+    # A changed configuration field
+    stage.counting_config.scale = 3
+    assert _run_in_place(StageCache(), stage, input_path)[1] == 12
+    assert stage.runs == 3
+
+    # A tampered output
+    with open(stage.counting_config.output_file_path, "w") as file_obj:
+        file_obj.write("0")
+    _run_in_place(StageCache(), stage, input_path)
+    assert stage.runs == 4
+    with open(stage.counting_config.output_file_path) as file_obj:
+        assert file_obj.read() == "12"
+
+    # A forced run
+    stage_cache = StageCache()
+    stage_cache.stage_cache_config.force = True
+    _run_in_place(stage_cache, stage, input_path)
+    assert stage.runs == 5
+
+
+def test_run_reuses_the_cache_entry_of_its_key(input_path):
+    stage = CountingStage()
+    output_path, value = StageCache().run(
+        "counting", stage.initiate_counting, stage.counting_config, input_path
+    )
+    # Outputs are written into the cache entry of the key
+    assert output_path.startswith(os.path.join("artifacts", "cache", "counting"))
+    assert value == 6
+
+    stage = CountingStage()
+    assert StageCache().run(
+        "counting", stage.initiate_counting, stage.counting_config, input_path
+    ) == (output_path, 6)
+    assert stage.runs == 0
+
+    stage.counting_config.scale = 3
+    other_path, value = StageCache().run(
+        "counting", stage.initiate_counting, stage.counting_config, input_path
+    )
+    assert other_path != output_path
+    assert value == 9
+    assert stage.runs == 1
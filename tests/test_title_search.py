@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from conftest import make_books, write_raw_data
+from src.components.data_ingestion import DataIngestion
+from src.components.title_search import (
+    TitleSearchTrainer,
+    load_title_search,
+    normalize_title,
+)
+
+TITLES = [
+    "Harry Potter and the Chamber of Secrets",
+    "Harry Potter and the Sorcerer's Stone",
+    "Harry Potter",
+    "L'Étranger",
+    "The Lovely Bones: A Novel",
+    "The Da Vinci Code",
+    "Angels & Demons",
+]
+
+
+@pytest.fixture
+def title_search(tmp_path, monkeypatch):
+    # Many titles sharing the common n-grams of "the" and "and"
+    titles = TITLES + [f"The Story and the Tale {index}" for index in range(200)]
+    books = make_books(n_books=len(titles), n_titles=len(titles))
+    books["Book-Title"] = titles
+
+    monkeypatch.chdir(tmp_path)
+    write_raw_data(
+        "Data", books, pd.DataFrame(columns=["User-ID", "ISBN", "Book-Rating"])
+    )
+    books_path, _, _ = DataIngestion().initiate_data_ingestion()
+    artifacts_dir = TitleSearchTrainer().initiate_title_search(books_path)
+    return load_title_search(artifacts_dir)
+
+
+def test_normalize_title_folds_case_accents_and_punctuation():
+    assert normalize_title("L'Étranger!") == "l etranger"
+    assert (
+        normalize_title("  The Lovely   Bones: A Novel ") == "the lovely bones a novel"
+    )
+
+
+def test_prefix_matches_shortest_titles_first(title_search):
+    matches = title_search.prefix("harry POTTER", limit=2)
+    titles = [title_search.titles[row] for row, _ in matches]
+
+    assert titles == ["Harry Potter", "Harry Potter and the Sorcerer's Stone"]
+    # An exact key covers the whole title
+    assert matches[0][1] == 1.0
+    assert 0 < matches[1][1] < 1
+    assert [title_search.titles[row] for row, _ in title_search.prefix("l'etr")] == [
+        "L'Étranger"
+    ]
+    assert title_search.prefix("zzz") == []
+    assert title_search.prefix("!!") == []
+
+
+def test_fuzzy_matches_tolerate_typos(title_search):
+    row, score = title_search.fuzzy("Hary Poter and the Chamber of Secrts")[0]
+    assert title_search.titles[row] == "Harry Potter and the Chamber of Secrets"
+    assert 0.6 < score < 1
+
+    # The rarest n-grams of the query are enough to find it among many titles
+    # sharing its common ones
+    row, _ = title_search.fuzzy("the lovley bones", max_postings=50)[0]
+    assert title_search.titles[row] == "The Lovely Bones: A Novel"
+
+    assert title_search.fuzzy("xqzv wjk") == []
+
+
+def test_search_lists_prefix_completions_before_fuzzy_matches(title_search):
+    results = title_search.search("Harry Potter and the", limit=5)
+
+    assert [result["match"] for result in results] == ["prefix"] * 2 + ["fuzzy"] * 3
+    assert {result["title"] for result in results[:2]} == {
+        "Harry Potter and the Chamber of Secrets",
+        "Harry Potter and the Sorcerer's Stone",
+    }
+    # Fuzzy matches skip the prefix completions
+    assert results[2]["title"] == "Harry Potter"
+    assert len({result["title"] for result in results}) == 5
+
+
+def test_resolve_finds_near_miss_titles(title_search):
+    assert title_search.resolve("the da vinci code!") == "The Da Vinci Code"
+    assert title_search.resolve("Angels and Demons") == "Angels & Demons"
+    assert title_search.resolve("The Lovely Bonez: A Novel") == (
+        "The Lovely Bones: A Novel"
+    )
+    assert title_search.resolve("A completely different book") is None